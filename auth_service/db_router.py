@@ -0,0 +1,156 @@
+import time
+import random
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# Primary pinning
+# ----------------------
+# Set for the rest of a request once it writes, so it reads its own writes.
+_pinned = ContextVar("db_pinned_to_primary", default=False)
+
+RECENT_WRITE_PREFIX = "dbpin:"
+
+
+def reset_pin(**kwargs):
+    """Start every request unpinned (``request_started`` receiver)."""
+    _pinned.set(False)
+
+
+request_started.connect(reset_pin, dispatch_uid="db_router_reset_pin")
+
+
+@contextmanager
+def use_primary():
+    """Send every read inside the block to the primary."""
+    token = _pinned.set(True)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+def mark_recent_write(*keys):
+    """Remember that ``keys`` (e.g. ``user:42``) changed, for the sticky window."""
+    if not getattr(settings, "DATABASE_REPLICAS", None):
+        return
+    ttl = getattr(settings, "REPLICA_STICKY_SECONDS", 15)
+    try:
+        cache.set_many({f"{RECENT_WRITE_PREFIX}{key}": 1 for key in keys}, timeout=ttl)
+    except Exception as e:
+        logger.error(f"Failed to record recent write for {keys}: {e}")
+
+
+def has_recent_write(key) -> bool:
+    if not getattr(settings, "DATABASE_REPLICAS", None):
+        return False
+    try:
+        return cache.get(f"{RECENT_WRITE_PREFIX}{key}") is not None
+    except Exception as e:
+        logger.error(f"Failed to check recent write for {key}: {e}")
+        return True  # fail towards the primary
+
+
+@contextmanager
+def read_your_writes(key):
+    """Read from the primary if ``key`` was written within the sticky window.
+
+    Covers the next requests after a write (e.g. login right after register),
+    when replicas may not have replayed it yet.
+    """
+    if has_recent_write(key):
+        with use_primary():
+            yield
+    else:
+        yield
+
+
+# ----------------------
+# Replica lag
+# ----------------------
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+_lag_lock = threading.Lock()
+_lag_cache = {}  # alias -> (checked_at, lag_seconds)
+
+
+def replica_lag(alias) -> float:
+    """Replication lag of a replica in seconds, re-measured at most every few seconds."""
+    interval = getattr(settings, "REPLICA_LAG_CHECK_SECONDS", 5)
+    now = time.monotonic()
+    cached = _lag_cache.get(alias)
+    if cached and now - cached[0] < interval:
+        return cached[1]
+
+    with _lag_lock:
+        cached = _lag_cache.get(alias)
+        if cached and now - cached[0] < interval:
+            return cached[1]
+        lag = 0.0
+        try:
+            connection = connections[alias]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(LAG_SQL)
+                    lag = float(cursor.fetchone()[0])
+        except Exception as e:
+            logger.warning(f"Replica {alias} lag check failed: {e}")
+            lag = float("inf")
+        _lag_cache[alias] = (now, lag)
+        return lag
+
+
+# ----------------------
+# Router
+# ----------------------
+class PrimaryReplicaRouter:
+    """Send safe reads to healthy replicas and everything else to ``default``.
+
+    Reads go to the primary when the request has already written, inside
+    ``use_primary()``/``read_your_writes()``, or when every replica lags more
+    than ``REPLICA_MAX_LAG_SECONDS``.
+    """
+
+    def _healthy_replicas(self):
+        max_lag = getattr(settings, "REPLICA_MAX_LAG_SECONDS", 5)
+        return [
+            alias for alias in getattr(settings, "DATABASE_REPLICAS", [])
+            if replica_lag(alias) <= max_lag
+        ]
+
+    def db_for_read(self, model, **hints):
+        if _pinned.get():
+            return "default"
+        instance = hints.get("instance")
+        if instance is not None and instance._state.db:
+            return instance._state.db  # follow relations on the same database
+        replicas = self._healthy_replicas()
+        return random.choice(replicas) if replicas else "default"
+
+    def db_for_write(self, model, **hints):
+        _pinned.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *getattr(settings, "DATABASE_REPLICAS", [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
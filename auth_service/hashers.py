@@ -0,0 +1,16 @@
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+from auth_service import metrics
+
+
+class TimedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher that reports its CPU time to the request metrics.
+
+    Keeps the ``pbkdf2_sha256`` algorithm name so existing hashes verify
+    unchanged. ``verify`` and ``harden_runtime`` both go through ``encode``,
+    so timing it covers every hashing path.
+    """
+
+    def encode(self, password, salt, iterations=None):
+        with metrics.track("hasher"):
+            return super().encode(password, salt, iterations)
@@ -20,6 +20,15 @@ def check_db():
         logger.error(f"Database health check failed: {e}")
         return False
 
+def db_pool_stats():
+    """psycopg connection pool statistics per database alias (empty without pooling)"""
+    stats = {}
+    for alias in connections:
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+    return stats
+
 def check_redis():
     """Check Redis connectivity"""
     try:
@@ -103,5 +112,11 @@ def health(request):
         'timestamp': timezone.now().isoformat(),
         'version': getattr(settings, 'VERSION', 'unknown'),
     }
+    try:
+        pools = db_pool_stats()
+        if pools:
+            response_data['database_pools'] = pools
+    except Exception as e:
+        logger.error(f"Database pool stats failed: {e}")
     
     return JsonResponse(response_data, status=200 if critical_services_ok else 503)
\ No newline at end of file
@@ -0,0 +1,175 @@
+import os
+import hmac
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Histogram, generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# Metric definitions
+# ----------------------
+# With PROMETHEUS_MULTIPROC_DIR set (one directory shared by all gunicorn
+# workers) prometheus_client writes every sample to per-process mmap files and
+# the /metrics view aggregates them, so any worker can answer a scrape.
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.075, 0.1,
+    0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55)
+
+REQUEST_LATENCY = Histogram(
+    "auth_request_latency_seconds",
+    "Total time spent handling a request",
+    ["route", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+COMPONENT_LATENCY = Histogram(
+    "auth_request_component_seconds",
+    "Time spent per request in a component (hasher, db, redis, cache, email)",
+    ["route", "component"],
+    buckets=LATENCY_BUCKETS,
+)
+KV_LATENCY = Histogram(
+    "auth_kvstore_operation_seconds",
+    "Latency of key-value store operations (users/kvstore.py)",
+    ["backend", "operation"],
+    buckets=(0.00001, 0.00005, 0.0001, 0.00025, 0.0005) + LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    "auth_request_db_queries",
+    "Number of ORM queries executed per request",
+    ["route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+
+# ----------------------
+# Database pool gauges
+# ----------------------
+class DatabasePoolCollector:
+    """Expose psycopg pool statistics of the scraped worker as gauges."""
+
+    def collect(self):
+        from auth_service.health import db_pool_stats
+
+        families = {}
+        pid = str(os.getpid())
+        try:
+            pools = db_pool_stats()
+        except Exception as e:
+            logger.error(f"Failed to collect database pool stats: {e}")
+            return
+        for alias, stats in pools.items():
+            for name, value in stats.items():
+                name = name.removeprefix("pool_")
+                if name not in families:
+                    families[name] = GaugeMetricFamily(
+                        f"auth_db_pool_{name}", f"psycopg pool statistic {name}", labels=["alias", "pid"],
+                    )
+                families[name].add_metric([alias, pid], value)
+        yield from families.values()
+
+
+POOL_COLLECTOR = DatabasePoolCollector()
+REGISTRY.register(POOL_COLLECTOR)
+
+# ----------------------
+# Per-request breakdown
+# ----------------------
+_local = threading.local()
+
+
+def start_request():
+    """Begin collecting component timings for the current thread's request."""
+    _local.stats = {"components": {}, "queries": 0}
+    return _local.stats
+
+
+def end_request():
+    """Stop collecting and return the stats gathered for the request."""
+    stats = getattr(_local, "stats", None)
+    _local.stats = None
+    return stats
+
+
+def record(component: str, seconds: float):
+    """Add time spent in a component to the current request, if any."""
+    stats = getattr(_local, "stats", None)
+    if stats is not None:
+        components = stats["components"]
+        components[component] = components.get(component, 0.0) + seconds
+
+
+@contextmanager
+def track(component: str):
+    """Time the enclosed block and attribute it to ``component``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(component, time.perf_counter() - start)
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """``connection.execute_wrapper`` hook counting and timing ORM queries."""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats = getattr(_local, "stats", None)
+        if stats is not None:
+            stats["queries"] += 1
+            record("db", time.perf_counter() - start)
+
+
+def observe_request(route: str, method: str, status: int, seconds: float, stats: dict | None):
+    """Publish one finished request to the histograms."""
+    REQUEST_LATENCY.labels(route, method, str(status)).observe(seconds)
+    if stats is None:
+        return
+    for component, spent in stats["components"].items():
+        COMPONENT_LATENCY.labels(route, component).observe(spent)
+    DB_QUERIES.labels(route).observe(stats["queries"])
+
+
+# ----------------------
+# Exposition
+# ----------------------
+def mark_worker_dead(pid: int):
+    """Drop live-gauge files of an exited worker (gunicorn ``child_exit`` hook)."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(pid)
+
+
+def render_metrics() -> bytes:
+    """Render all metrics in Prometheus text format, merging workers if needed."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(POOL_COLLECTOR)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint.
+
+    Requires ``Authorization: Bearer <METRICS_TOKEN>``. Without a token it is
+    only served with DEBUG or METRICS_PUBLIC (a firewalled scrape network).
+    """
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token:
+        if not (settings.DEBUG or getattr(settings, "METRICS_PUBLIC", False)):
+            raise Http404()
+    elif not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
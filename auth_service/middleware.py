@@ -0,0 +1,156 @@
+import time
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+from auth_service import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Record per-route latency plus the hasher/db/redis/email breakdown.
+
+    Must be the first entry in MIDDLEWARE so the total covers the whole stack.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        metrics.start_request()
+        status = 500
+        try:
+            with ExitStack() as stack:
+                for conn in connections.all():
+                    stack.enter_context(conn.execute_wrapper(metrics.db_execute_wrapper))
+                response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            stats = metrics.end_request()
+            try:
+                metrics.observe_request(
+                    self._route(request), request.method, status,
+                    time.perf_counter() - start, stats,
+                )
+            except Exception as e:
+                logger.error(f"Failed to record request metrics: {e}")
+
+    @staticmethod
+    def _route(request):
+        match = getattr(request, "resolver_match", None)
+        if match is None or not match.route:
+            return "unmatched"
+        return match.route
+
+
+class TenantMiddleware:
+    """Run each request inside its tenant (see ``users.tenants``).
+
+    Unknown or disabled tenants get a 400; a tenant with
+    ``rate_limit_per_minute`` set shares that budget across all its routes
+    and gets a 429 once it is spent. Resolution is cached per worker, so a
+    request costs no query here.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from users import tenants
+        from users.utils import check_rate_limit
+
+        tenant = tenants.resolve(request)
+        if tenant is None or not tenant.is_active:
+            return JsonResponse({"detail": "Unknown tenant"}, status=400)
+        with tenants.use_tenant(tenant.slug):
+            budget = tenant.rate_limit_per_minute
+            if budget and not check_rate_limit(tenants.scoped("tenant:budget"), budget, 60):
+                return JsonResponse({"detail": "Tenant rate limit exceeded"}, status=429)
+            request.tenant = tenant.slug
+            return self.get_response(request)
+
+
+class Pipeline:
+    """A sync middleware chain built the same way Django's handler builds one.
+
+    ``wrap(instance, path)`` may replace each middleware instance (and the
+    inner handler, as ``"<view>"``), which is how the timing report in
+    ``benchmarks/middleware.py`` measures every layer.
+    """
+
+    def __init__(self, paths, get_response, wrap=None):
+        self.view_hooks = []
+        self.template_response_hooks = []
+        self.exception_hooks = []
+
+        handler = get_response if wrap is None else wrap(get_response, "<view>")
+        for path in reversed(paths):
+            try:
+                instance = import_string(path)(handler)
+            except MiddlewareNotUsed:
+                continue
+            if hasattr(instance, "process_view"):
+                self.view_hooks.insert(0, instance.process_view)
+            if hasattr(instance, "process_template_response"):
+                self.template_response_hooks.append(instance.process_template_response)
+            if hasattr(instance, "process_exception"):
+                self.exception_hooks.append(instance.process_exception)
+            if wrap is not None:
+                instance = wrap(instance, path)
+            handler = convert_exception_to_response(instance)
+        self.handler = handler
+
+    def __call__(self, request):
+        return self.handler(request)
+
+
+class PipelineRouterMiddleware:
+    """Run a lean middleware chain for API routes and the full one elsewhere.
+
+    The JWT-only API never uses sessions, CSRF, messages or the auth
+    middleware, so requests under ``API_PIPELINE_PREFIXES`` go through
+    ``API_MIDDLEWARE`` while admin, docs and static files keep
+    ``FULL_MIDDLEWARE``. The view/exception/template-response hooks of the
+    selected chain are forwarded, because Django only registers hooks of
+    middleware listed directly in MIDDLEWARE.
+    """
+
+    wrap = None
+
+    def __init__(self, get_response):
+        self.api = Pipeline(settings.API_MIDDLEWARE, get_response, self.wrap)
+        self.full = Pipeline(settings.FULL_MIDDLEWARE, get_response, self.wrap)
+        self.prefixes = tuple(settings.API_PIPELINE_PREFIXES)
+
+    def __call__(self, request):
+        pipeline = self.api if request.path_info.startswith(self.prefixes) else self.full
+        request._middleware_pipeline = pipeline
+        return pipeline(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for hook in request._middleware_pipeline.view_hooks:
+            response = hook(request, view_func, view_args, view_kwargs)
+            if response:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for hook in request._middleware_pipeline.template_response_hooks:
+            response = hook(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for hook in request._middleware_pipeline.exception_hooks:
+            response = hook(request, exception)
+            if response:
+                return response
+        return None
@@ -0,0 +1,46 @@
+"""Fork hooks for pre-forking servers (used by ``gunicorn.conf.py``).
+
+With ``preload_app`` the gunicorn master imports Django, the URLconf and the
+views once and the workers share those pages copy-on-write. Nothing that owns
+a socket may cross the fork: the master closes its database connections
+before forking, and each worker drops the inherited Redis client, connection
+pools and in-process buffers so it opens its own on first use.
+"""
+import gc
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def before_fork():
+    """Master, after the app is loaded: warm imports, close connections, freeze."""
+    from django.db import connections
+    from django.urls import get_resolver
+
+    # Import every view, serializer and schema now rather than in each worker
+    get_resolver().url_patterns
+    for conn in connections.all(initialized_only=True):
+        conn.close()
+        if hasattr(conn, "close_pool"):
+            conn.close_pool()
+    # Everything allocated so far moves to the permanent generation, so the
+    # collector never touches (and un-shares) those pages in the workers
+    gc.freeze()
+
+
+def after_fork():
+    """Worker, right after the fork: fresh pools and empty buffers."""
+    from django.db import connections
+    from users import anomaly, audit, buffers, kvstore, mail_queue, utils
+
+    for conn in connections.all(initialized_only=True):
+        # Inherited sockets belong to the master; forget them without closing
+        conn.connection = None
+        getattr(conn, "_connection_pools", {}).pop(conn.alias, None)
+    utils._redis_client = None
+    kvstore._redis_store = None
+    kvstore._layered_stores.clear()
+    buffers.discard_all()
+    mail_queue.discard()
+    audit.discard()
+    anomaly.discard()
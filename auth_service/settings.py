@@ -1,8 +1,10 @@
 import os
+import hashlib
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
 import logging
+import tempfile
 from logging.handlers import RotatingFileHandler
 import dj_database_url
 
@@ -20,7 +22,7 @@ ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "localhost,127.0.0.1").split(",")
 DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL:
     DATABASES = {
-        "default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        "default": dj_database_url.parse(DATABASE_URL)
     }
 else:
     # Use PostgreSQL by default (not SQLite) to match requirements
@@ -35,6 +37,63 @@ else:
         }
     }
 
+# Connection reuse. On PostgreSQL each worker process keeps a psycopg 3 pool
+# (DB_POOL=True); otherwise connections persist for DB_CONN_MAX_AGE seconds.
+# Health checks drop dead connections before a request uses them either way.
+DB_POOL = os.getenv("DB_POOL", "True") == "True"
+# Server-side prepared statements: psycopg prepares a query once it has run
+# DB_PREPARE_THRESHOLD times on a connection, so the hot user lookups (by id
+# for JWT auth, by email for login) skip planning. Set DB_PREPARED_STATEMENTS=False
+# behind PgBouncer in transaction mode.
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "True") == "True"
+
+
+def _configure_database(db):
+    db["CONN_HEALTH_CHECKS"] = True
+    db["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", 600))
+    if db["ENGINE"] != "django.db.backends.postgresql":
+        return db
+    options = db.setdefault("OPTIONS", {})
+    if DB_PREPARED_STATEMENTS:
+        options["server_side_binding"] = True
+        options["prepare_threshold"] = int(os.getenv("DB_PREPARE_THRESHOLD", 2))
+    if DB_POOL:
+        db["CONN_MAX_AGE"] = 0  # the pool owns connection lifetime
+        options["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", 1)),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", 4)),
+            "timeout": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+            "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", 300)),
+            "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", 3600)),
+            "name": db.get("NAME") or "default",
+        }
+    return db
+
+
+_configure_database(DATABASES["default"])
+
+# Read replicas (comma-separated URLs). Safe reads are routed to a replica,
+# with read-your-writes stickiness and fallback to the primary on lag.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(","))):
+    _alias = f"replica_{_index}"
+    DATABASES[_alias] = _configure_database(dj_database_url.parse(_url.strip()))
+    DATABASES[_alias]["TEST"] = {"MIRROR": "default"}
+    DATABASE_REPLICAS.append(_alias)
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ["auth_service.db_router.PrimaryReplicaRouter"]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 5))
+REPLICA_LAG_CHECK_SECONDS = float(os.getenv("REPLICA_LAG_CHECK_SECONDS", 5))
+# How long reads about a just-written user stay on the primary
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 15))
+
+# Hash-partitioned users table (PostgreSQL): number of physical partitions,
+# 0 keeps a single table. See users/partitioning.py and `manage.py partition_users`.
+USERS_PARTITIONS = int(os.getenv("USERS_PARTITIONS", 0))
+# Also search the pre-conversion partition on email lookups. New users are
+# always checked against it; turn this off only once it is empty.
+USERS_PARTITION_LEGACY = os.getenv("USERS_PARTITION_LEGACY", "True") == "True"
+
 # ---------------------
 # Redis / Cache Configuration
 # ---------------------
@@ -52,14 +111,31 @@ if REDIS_URL:
         }
     }
 else:
-    # Fallback to local memory cache
+    # No Redis: one cache file in shared memory mapped by every worker on this
+    # host (auth_service/shm_cache.py), so rate limits, lockout counters and
+    # one-time tokens are shared between workers. Sized STRIPES x
+    # SLOTS_PER_STRIPE x SLOT_SIZE bytes (16 MiB by default). The default file
+    # name is derived from the checkout, so two deployments on one host (or a
+    # test run next to a dev server) never share a cache.
+    _shm_dir = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    _shm_name = f"auth-service-cache-{hashlib.sha1(str(BASE_DIR).encode()).hexdigest()[:12]}"
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-            "LOCATION": "auth-service-cache",
+            "BACKEND": "auth_service.shm_cache.SharedMemoryCache",
+            "LOCATION": os.getenv("SHM_CACHE_PATH") or os.path.join(_shm_dir, _shm_name),
+            "OPTIONS": {
+                "STRIPES": int(os.getenv("SHM_CACHE_STRIPES", 256)),
+                "SLOTS_PER_STRIPE": int(os.getenv("SHM_CACHE_SLOTS_PER_STRIPE", 64)),
+                "SLOT_SIZE": int(os.getenv("SHM_CACHE_SLOT_SIZE", 1024)),
+            },
         }
     }
 
+# Per-process LRU layered in front of Redis/the cache (users/kvstore.py) for
+# values that never change once written, e.g. blacklisted tokens
+KVSTORE_LOCAL_MAX_ENTRIES = int(os.getenv("KVSTORE_LOCAL_MAX_ENTRIES", 10000))
+KVSTORE_LOCAL_TTL_SECONDS = int(os.getenv("KVSTORE_LOCAL_TTL_SECONDS", 60))
+
 # ---------------------
 # Installed apps & middleware
 # ---------------------
@@ -78,7 +154,8 @@ INSTALLED_APPS = [
     "users",
 ]
 
-MIDDLEWARE = [
+# Full stack for admin, API docs and static files
+FULL_MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -88,10 +165,36 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+
+# The JWT-only API never touches sessions, CSRF, messages or request.user;
+# the security headers stay
+API_MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+]
+API_PIPELINE_PREFIXES = ("/api/auth/", "/health/", "/metrics")
 
+# LEAN_API_PIPELINE=False runs FULL_MIDDLEWARE for every request
+LEAN_API_PIPELINE = os.getenv("LEAN_API_PIPELINE", "True") == "True"
+MIDDLEWARE = [
+    "auth_service.middleware.RequestMetricsMiddleware",  # keep first: times the whole stack
+    "auth_service.middleware.TenantMiddleware",
 ]
+# Emails are unique per tenant, not globally (users.backends.TenantModelBackend)
+SILENCED_SYSTEM_CHECKS = ["auth.W004"]
+if LEAN_API_PIPELINE:
+    MIDDLEWARE.append("auth_service.middleware.PipelineRouterMiddleware")
+    # The admin checks look for session/auth/messages middleware in MIDDLEWARE;
+    # PipelineRouterMiddleware runs them for every non-API route.
+    SILENCED_SYSTEM_CHECKS += ["admin.E408", "admin.E409", "admin.E410"]
+else:
+    MIDDLEWARE += FULL_MIDDLEWARE
+if not REDIS_URL:
+    # The shared-memory cache is shared and atomic, just not on django_ratelimit's list
+    SILENCED_SYSTEM_CHECKS += ["django_ratelimit.W001"]
 
 ROOT_URLCONF = "auth_service.urls"
 
@@ -117,11 +220,16 @@ WSGI_APPLICATION = "auth_service.wsgi.application"
 # JWT / Auth Configuration
 # ---------------------
 AUTH_USER_MODEL = "users.User"
+AUTHENTICATION_BACKENDS = ["users.backends.TenantModelBackend"]
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.ReplicaAwareJWTAuthentication",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_RENDERER_CLASSES": (
+        "users.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_THROTTLE_RATES": {
         "anon": "5/minute",
         "user": "10/minute"
@@ -132,17 +240,94 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=int(os.getenv("ACCESS_TOKEN_LIFETIME_MIN", 30))),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=int(os.getenv("REFRESH_TOKEN_LIFETIME_DAYS", 7))),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Rotation and reuse detection are handled by users/token_families.py
+    # (Redis-backed families) instead of the SQL token_blacklist app.
     "ROTATE_REFRESH_TOKENS": True,
-    "BLACKLIST_AFTER_ROTATION": True,
+    "BLACKLIST_AFTER_ROTATION": False,
 }
+# Session last-seen timestamps are buffered per worker and written in batches
+SESSION_LAST_SEEN_FLUSH_SECONDS = int(os.getenv("SESSION_LAST_SEEN_FLUSH_SECONDS", 30))
+# last_login is written in batches instead of one UPDATE per login
+LAST_LOGIN_BUFFER = os.getenv("LAST_LOGIN_BUFFER", "True") == "True"
+LAST_LOGIN_FLUSH_SECONDS = int(os.getenv("LAST_LOGIN_FLUSH_SECONDS", 5))
+# Flush from a per-worker daemon thread (False: only at exit / flush_last_login)
+LAST_LOGIN_BACKGROUND = os.getenv("LAST_LOGIN_BACKGROUND", "True") == "True"
+
+# ---------------------
+# Tenants
+# ---------------------
+# Requests pick their tenant from TENANT_HEADER, else from the Host matched
+# against Tenant.domain, else DEFAULT_TENANT (users/tenants.py). Resolved
+# tenants are cached per worker for TENANT_CACHE_SECONDS.
+DEFAULT_TENANT = os.getenv("DEFAULT_TENANT", "default")
+TENANT_HEADER = os.getenv("TENANT_HEADER", "X-Tenant")
+TENANT_CACHE_SECONDS = int(os.getenv("TENANT_CACHE_SECONDS", 60))
+
+# ---------------------
+# One-time tokens
+# ---------------------
+# Lifetimes per token type (users/one_time_tokens.py). OTP codes are discarded
+# after OTP_MAX_ATTEMPTS wrong guesses and at most OTP_MAX_ISSUES_PER_HOUR are
+# sent per email.
+RESET_TOKEN_TTL_SECONDS = int(os.getenv("RESET_TOKEN_TTL_SECONDS", 600))
+# "stored": random reset tokens kept in Redis/cache until used. "signed":
+# self-contained HMAC tokens (users/reset_tokens.py) that need no write to
+# issue and die when the password changes; only used tokens are recorded.
+RESET_TOKEN_MODE = os.getenv("RESET_TOKEN_MODE", "stored")
+VERIFY_EMAIL_TOKEN_TTL_SECONDS = int(os.getenv("VERIFY_EMAIL_TOKEN_TTL_SECONDS", 86400))
+MAGIC_LINK_TTL_SECONDS = int(os.getenv("MAGIC_LINK_TTL_SECONDS", 600))
+OTP_TTL_SECONDS = int(os.getenv("OTP_TTL_SECONDS", 300))
+OTP_MAX_ATTEMPTS = int(os.getenv("OTP_MAX_ATTEMPTS", 5))
+OTP_MAX_ISSUES_PER_HOUR = int(os.getenv("OTP_MAX_ISSUES_PER_HOUR", 5))
+
+# ---------------------
+# Idempotency keys
+# ---------------------
+# Responses to register/forgot-password requests sent with Idempotency-Key are
+# kept this long for retries; the lock covers a request still in flight.
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 30))
+
+# ---------------------
+# Login lockout
+# ---------------------
+# Failures per email / IP within the window before an exponential lockout
+# (base * 2**excess seconds, capped). Past LOGIN_ATTACK_THRESHOLD failures per
+# minute across all accounts the thresholds tighten for the cooldown period.
+LOGIN_FAILURE_WINDOW_SECONDS = int(os.getenv("LOGIN_FAILURE_WINDOW_SECONDS", 900))
+LOGIN_EMAIL_FAILURE_THRESHOLD = int(os.getenv("LOGIN_EMAIL_FAILURE_THRESHOLD", 5))
+LOGIN_IP_FAILURE_THRESHOLD = int(os.getenv("LOGIN_IP_FAILURE_THRESHOLD", 20))
+LOGIN_LOCKOUT_BASE_SECONDS = int(os.getenv("LOGIN_LOCKOUT_BASE_SECONDS", 30))
+LOGIN_LOCKOUT_MAX_SECONDS = int(os.getenv("LOGIN_LOCKOUT_MAX_SECONDS", 3600))
+LOGIN_ATTACK_THRESHOLD = int(os.getenv("LOGIN_ATTACK_THRESHOLD", 300))
+LOGIN_ATTACK_COOLDOWN_SECONDS = int(os.getenv("LOGIN_ATTACK_COOLDOWN_SECONDS", 600))
+
+# ---------------------
+# Password hashing
+# ---------------------
+# Same algorithms as Django's defaults; the PBKDF2 entry only adds timing
+PASSWORD_HASHERS = [
+    "auth_service.hashers.TimedPBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.Argon2PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
 
 # ---------------------
 # Password validators
 # ---------------------
+# Memory-mapped breached/common password index built with
+# `manage.py build_password_index --include-django-common <sources>`. When set
+# it replaces CommonPasswordValidator, which loads its list into every worker;
+# if the file cannot be read, the validator falls back to that list.
+PASSWORD_INDEX_PATH = os.getenv("PASSWORD_INDEX_PATH", "")
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator", "OPTIONS": {"min_length": 8}},
-    {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator"},
+    {"NAME": "users.validators.BreachedPasswordValidator"} if PASSWORD_INDEX_PATH
+    else {"NAME": "django.contrib.auth.password_validation.CommonPasswordValidator"},
     {"NAME": "django.contrib.auth.password_validation.NumericPasswordValidator"},
 ]
 
@@ -202,6 +387,74 @@ EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
 EMAIL_USE_SSL = os.getenv("EMAIL_USE_SSL", "False") == "True"
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "webmaster@localhost")
 FRONTEND_URL = os.getenv("FRONTEND_URL", "").rstrip("/")
+# Views queue mail (users/mail_queue.py); a per-worker thread sends it in
+# batches over one SMTP connection. Turn the thread off when a separate
+# `manage.py send_queued_mail --loop` process does the sending.
+MAIL_QUEUE_BACKGROUND = os.getenv("MAIL_QUEUE_BACKGROUND", "True") == "True"
+MAIL_QUEUE_BATCH_SIZE = int(os.getenv("MAIL_QUEUE_BATCH_SIZE", 50))
+MAIL_QUEUE_FLUSH_SECONDS = float(os.getenv("MAIL_QUEUE_FLUSH_SECONDS", 2))
+
+# ---------------------
+# Email verification
+# ---------------------
+# New accounts get a verification link. With EMAIL_VERIFICATION_REQUIRED
+# password login is refused until it is followed; `manage.py purge_unverified`
+# deletes accounts still unverified after UNVERIFIED_ACCOUNT_TTL_HOURS.
+EMAIL_VERIFICATION_REQUIRED = os.getenv("EMAIL_VERIFICATION_REQUIRED", "False") == "True"
+UNVERIFIED_ACCOUNT_TTL_HOURS = int(os.getenv("UNVERIFIED_ACCOUNT_TTL_HOURS", 72))
+
+# ---------------------
+# Audit events
+# ---------------------
+# Security events (logins, resets, ...) are buffered per worker and written
+# in batches by a background thread (users/audit.py). Up to AUDIT_BUFFER_SIZE
+# events wait while the database is unreachable; beyond that the oldest are
+# dropped. Run `manage.py audit_events maintain` daily to create upcoming
+# monthly partitions (PostgreSQL) and drop events past the retention period.
+AUDIT_BACKGROUND = os.getenv("AUDIT_BACKGROUND", "True") == "True"
+AUDIT_BUFFER_SIZE = int(os.getenv("AUDIT_BUFFER_SIZE", 10000))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", 500))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", 2))
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", 365))
+AUDIT_PARTITION_MONTHS_AHEAD = int(os.getenv("AUDIT_PARTITION_MONTHS_AHEAD", 3))
+
+# ---------------------
+# Login anomaly detection
+# ---------------------
+# Logins are scored off the request path against small per-user profiles
+# (users/anomaly.py). ANOMALY_ALERT_SCORE records an audit event and mails
+# the user; ANOMALY_STEP_UP_SCORE also revokes the new session and requires a
+# sign-in code or link before the next password login. Country and location
+# come from edge headers (Django META names); leave them unset without a CDN.
+ANOMALY_DETECTION = os.getenv("ANOMALY_DETECTION", "True") == "True"
+ANOMALY_BACKGROUND = os.getenv("ANOMALY_BACKGROUND", "True") == "True"
+ANOMALY_QUEUE_SIZE = int(os.getenv("ANOMALY_QUEUE_SIZE", 10000))
+ANOMALY_LEARNING_LOGINS = int(os.getenv("ANOMALY_LEARNING_LOGINS", 3))
+ANOMALY_ALERT_SCORE = int(os.getenv("ANOMALY_ALERT_SCORE", 2))
+ANOMALY_STEP_UP_SCORE = int(os.getenv("ANOMALY_STEP_UP_SCORE", 4))
+ANOMALY_MAX_TRAVEL_KMH = float(os.getenv("ANOMALY_MAX_TRAVEL_KMH", 1000))
+ANOMALY_MIN_TRAVEL_KM = float(os.getenv("ANOMALY_MIN_TRAVEL_KM", 500))
+ANOMALY_COUNTRY_HEADER = os.getenv("ANOMALY_COUNTRY_HEADER", "HTTP_CF_IPCOUNTRY")
+ANOMALY_LATITUDE_HEADER = os.getenv("ANOMALY_LATITUDE_HEADER", "HTTP_CLOUDFRONT_VIEWER_LATITUDE")
+ANOMALY_LONGITUDE_HEADER = os.getenv("ANOMALY_LONGITUDE_HEADER", "HTTP_CLOUDFRONT_VIEWER_LONGITUDE")
+
+# ---------------------
+# Profile revalidation
+# ---------------------
+# /me answers If-None-Match from a per-user version counter in the shared
+# store (users/user_versions.py). An expired counter only costs one full
+# response, since it is re-seeded from the clock.
+USER_VERSION_TTL_SECONDS = int(os.getenv("USER_VERSION_TTL_SECONDS", 30 * 86400))
+
+# ---------------------
+# Metrics
+# ---------------------
+# Set PROMETHEUS_MULTIPROC_DIR (an empty, writable directory) when running
+# several gunicorn workers so /metrics aggregates all of them. Scrapers send
+# METRICS_TOKEN as a bearer token; without one /metrics answers 404 unless
+# DEBUG or METRICS_PUBLIC (only behind a firewall) is set.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+METRICS_PUBLIC = os.getenv("METRICS_PUBLIC", "False") == "True"
 
 # ---------------------
 # Logging Configuration
@@ -0,0 +1,267 @@
+"""Django cache backend in a shared memory-mapped file, for single-host deployments.
+
+Without Redis every gunicorn worker used to get its own LocMemCache, so rate
+limits, lockout counters and one-time tokens were per worker: a token issued
+by one worker was unknown to the next. This backend keeps the cache in one
+file (``/dev/shm`` by default, i.e. RAM) that every worker maps, so they all
+see the same entries, and an operation is a lock plus a memory access instead
+of a network round trip.
+
+Layout: a header, then ``STRIPES`` independent hash tables ("stripes") of
+``SLOTS_PER_STRIPE`` fixed-size slots each. A key hashes to one stripe and is
+probed linearly inside it, so one stripe lock covers every read-modify-write
+on that key: ``add``, ``incr``, ``touch`` and ``delete`` are atomic across
+processes. The lock is a ``threading.Lock`` (gthread workers) around an
+``fcntl`` byte-range lock on the file (other processes).
+
+Entries carry an absolute expiry. Expired and deleted slots are reused; when a
+stripe is full the entry closest to expiry is evicted. Values that do not fit
+in a slot (``SLOT_SIZE`` minus key and header) are not cached, as with
+memcached's item size limit.
+
+    CACHES = {"default": {
+        "BACKEND": "auth_service.shm_cache.SharedMemoryCache",
+        "LOCATION": "/dev/shm/auth-service-cache",
+        "OPTIONS": {"STRIPES": 256, "SLOTS_PER_STRIPE": 64, "SLOT_SIZE": 1024},
+    }}
+"""
+import os
+import mmap
+import time
+import fcntl
+import pickle
+import struct
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AUTHSHM1"
+HEADER = struct.Struct("<8sIII")  # magic, stripes, slots per stripe, slot size
+HEADER_SIZE = 64
+# state, key length, value length, expires (0: never), key hash
+SLOT = struct.Struct("<BxHIdQ")
+EMPTY, USED, DELETED = 0, 1, 2
+
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class _Table:
+    """One mapped file, shared by every cache instance (thread) of a process."""
+
+    def __init__(self, path: str, stripes: int, slots_per_stripe: int, slot_size: int):
+        self.path = path
+        self.stripes = stripes
+        self.slots_per_stripe = slots_per_stripe
+        self.slot_size = slot_size
+        self.capacity = slot_size - SLOT.size
+        self.size = HEADER_SIZE + stripes * slots_per_stripe * slot_size
+        self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock_range(0, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self.fd).st_size != self.size or os.pread(self.fd, HEADER.size, 0) != self._header():
+                # New file or different geometry: start empty
+                os.ftruncate(self.fd, 0)
+                os.ftruncate(self.fd, self.size)
+                os.pwrite(self.fd, self._header(), 0)
+        finally:
+            self._lock_range(0, fcntl.LOCK_UN)
+        self.map = mmap.mmap(self.fd, self.size)
+        self.reset_thread_locks()
+
+    def _header(self) -> bytes:
+        return HEADER.pack(MAGIC, self.stripes, self.slots_per_stripe, self.slot_size)
+
+    def _lock_range(self, offset: int, operation: int):
+        fcntl.lockf(self.fd, operation, 1, offset)
+
+    def reset_thread_locks(self):
+        # A forked child must not inherit a lock some other thread held
+        self.thread_locks = [threading.Lock() for _ in range(self.stripes)]
+
+    @contextmanager
+    def locked(self, stripe: int):
+        with self.thread_locks[stripe]:
+            self._lock_range(1 + stripe, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                self._lock_range(1 + stripe, fcntl.LOCK_UN)
+
+    def offset(self, index: int) -> int:
+        return HEADER_SIZE + index * self.slot_size
+
+    def read_slot(self, index: int):
+        return SLOT.unpack_from(self.map, self.offset(index))
+
+    def find(self, key: bytes, key_hash: int, now: float):
+        """``(found, free, victim)`` slot indexes for ``key`` in its stripe."""
+        stripe = key_hash % self.stripes
+        base = stripe * self.slots_per_stripe
+        start = (key_hash // self.stripes) % self.slots_per_stripe
+        free = victim = None
+        victim_expires = float("inf")
+        for step in range(self.slots_per_stripe):
+            index = base + (start + step) % self.slots_per_stripe
+            state, key_length, _, expires, slot_hash = self.read_slot(index)
+            if state == EMPTY:
+                return None, index if free is None else free, victim
+            if state == DELETED or (expires and expires <= now):
+                if free is None:
+                    free = index
+                continue
+            if slot_hash == key_hash:
+                start_of_key = self.offset(index) + SLOT.size
+                if self.map[start_of_key:start_of_key + key_length] == key:
+                    return index, free, victim
+            if (expires or float("inf")) < victim_expires or victim is None:
+                victim, victim_expires = index, expires or float("inf")
+        return None, free, victim
+
+    def read_value(self, index: int) -> bytes:
+        _, key_length, value_length, _, _ = self.read_slot(index)
+        start = self.offset(index) + SLOT.size + key_length
+        return self.map[start:start + value_length]
+
+    def write(self, index: int, key: bytes, key_hash: int, value: bytes, expires: float):
+        offset = self.offset(index)
+        body = offset + SLOT.size
+        self.map[body:body + len(key) + len(value)] = key + value
+        SLOT.pack_into(self.map, offset, USED, len(key), len(value), expires, key_hash)
+
+    def set_state(self, index: int, state: int):
+        self.map[self.offset(index)] = state
+
+    def set_expires(self, index: int, expires: float):
+        state, key_length, value_length, _, key_hash = self.read_slot(index)
+        SLOT.pack_into(self.map, self.offset(index), state, key_length, value_length, expires, key_hash)
+
+    def clear(self):
+        stripe_bytes = self.slots_per_stripe * self.slot_size
+        for stripe in range(self.stripes):
+            with self.locked(stripe):
+                start = self.offset(stripe * self.slots_per_stripe)
+                self.map[start:start + stripe_bytes] = bytes(stripe_bytes)
+
+
+def _reset_after_fork():
+    for table in _tables.values():
+        table.reset_thread_locks()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _get_table(path: str, stripes: int, slots_per_stripe: int, slot_size: int) -> _Table:
+    with _tables_lock:
+        table = _tables.get(path)
+        if table is None:
+            table = _tables[path] = _Table(path, stripes, slots_per_stripe, slot_size)
+        return table
+
+
+class SharedMemoryCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self._table = _get_table(
+            location,
+            int(options.get("STRIPES", 256)),
+            int(options.get("SLOTS_PER_STRIPE", 64)),
+            int(options.get("SLOT_SIZE", 1024)),
+        )
+
+    def _expiry(self, timeout) -> float:
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def _slot_key(self, key, version):
+        key = self.make_and_validate_key(key, version=version).encode("utf-8")
+        return key, _key_hash(key)
+
+    def _store(self, key, value, timeout, version, only_if_missing: bool) -> bool:
+        key, key_hash = self._slot_key(key, version)
+        data = pickle.dumps(value, self.pickle_protocol)
+        table = self._table
+        fits = len(key) + len(data) <= table.capacity
+        with table.locked(key_hash % table.stripes):
+            found, free, victim = table.find(key, key_hash, time.time())
+            if found is not None and only_if_missing:
+                return False
+            if not fits:
+                if found is not None:
+                    table.set_state(found, DELETED)  # never serve the old value
+                logger.debug(f"Value for {key!r} ({len(data)} bytes) does not fit a cache slot")
+                return False
+            index = found if found is not None else free if free is not None else victim
+            table.write(index, key, key_hash, data, self._expiry(timeout))
+        return True
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self._store(key, value, timeout, version, only_if_missing=True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._store(key, value, timeout, version, only_if_missing=False)
+
+    def get(self, key, default=None, version=None):
+        key, key_hash = self._slot_key(key, version)
+        table = self._table
+        with table.locked(key_hash % table.stripes):
+            found, _, _ = table.find(key, key_hash, time.time())
+            if found is None:
+                return default
+            data = table.read_value(found)
+        return pickle.loads(data)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, key_hash = self._slot_key(key, version)
+        table = self._table
+        with table.locked(key_hash % table.stripes):
+            found, _, _ = table.find(key, key_hash, time.time())
+            if found is None:
+                return False
+            table.set_expires(found, self._expiry(timeout))
+        return True
+
+    def delete(self, key, version=None):
+        key, key_hash = self._slot_key(key, version)
+        table = self._table
+        with table.locked(key_hash % table.stripes):
+            found, _, _ = table.find(key, key_hash, time.time())
+            if found is None:
+                return False
+            table.set_state(found, DELETED)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        key, key_hash = self._slot_key(key, version)
+        table = self._table
+        with table.locked(key_hash % table.stripes):
+            found, _, _ = table.find(key, key_hash, time.time())
+            if found is None:
+                raise ValueError(f"Key '{key.decode()}' not found")
+            value = pickle.loads(table.read_value(found)) + delta
+            _, _, _, expires, _ = table.read_slot(found)
+            table.write(found, key, key_hash, pickle.dumps(value, self.pickle_protocol), expires)
+        return value
+
+    def has_key(self, key, version=None):
+        key, key_hash = self._slot_key(key, version)
+        table = self._table
+        with table.locked(key_hash % table.stripes):
+            found, _, _ = table.find(key, key_hash, time.time())
+        return found is not None
+
+    def clear(self):
+        self._table.clear()
@@ -0,0 +1,167 @@
+"""Replay a synthetic login log through the login anomaly engine.
+
+Builds --users users, each with a home network, device and city, and a log
+of --events logins: mostly from home, some from a second device or another
+network in the same city, and --anomaly-rate of them from a new device in a
+far-away country minutes after the previous login. The log is streamed
+through three stages:
+
+* rules: evaluate() + learn() on in-memory profiles (the rule cost alone)
+* engine: anomaly.process(), i.e. profile GET/SET in the store plus the rules
+  and actions (fakeredis by default, --redis url, or none for the Django cache)
+* observe: what views.login pays, login_from_request() + observe()
+
+and reports events/sec per stage, plus how many injected anomalies were
+flagged and how many normal logins were (false positives).
+
+    python benchmarks/anomaly_replay.py --users 1000 --events 50000
+"""
+import time
+import random
+import logging
+import argparse
+from types import SimpleNamespace
+
+from harness import setup_django, summarize, save_results
+
+CITIES = [
+    ("DE", 52.52, 13.40), ("FR", 48.86, 2.35), ("US", 40.71, -74.01), ("BR", -23.55, -46.63),
+    ("JP", 35.68, 139.69), ("IN", 19.08, 72.88), ("AU", -33.87, 151.21), ("ZA", -26.20, 28.05),
+]
+AGENTS = [
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) Safari/17.0",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/126.0.0.0",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X) Mobile/15E148",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:126.0) Firefox/126.0",
+]
+
+
+def build_log(users: int, events: int, anomaly_rate: float, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    homes = []
+    for user_id in range(1, users + 1):
+        country, lat, lon = rng.choice(CITIES)
+        homes.append({
+            "user_id": user_id, "country": country, "lat": lat, "lon": lon,
+            "networks": [f"10.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(2)],
+            "agents": rng.sample(AGENTS, 2),
+        })
+    log, clock = [], time.time() - events * 10
+    for _ in range(events):
+        home = rng.choice(homes)
+        clock += rng.uniform(1, 20)
+        entry = {
+            "user_id": home["user_id"], "at": clock, "anomalous": False,
+            "ip": f"{rng.choice(home['networks'])}.{rng.randrange(1, 255)}",
+            "agent": rng.choice(home["agents"]),
+            "country": home["country"], "lat": home["lat"], "lon": home["lon"],
+        }
+        if rng.random() < anomaly_rate:
+            country, lat, lon = rng.choice([c for c in CITIES if c[0] != home["country"]])
+            entry.update(anomalous=True, ip=f"172.{rng.randrange(16, 32)}.{rng.randrange(256)}.9",
+                         agent="python-requests/2.32.3", country=country, lat=lat, lon=lon)
+        log.append(entry)
+    return log
+
+
+def to_login(anomaly, entry: dict):
+    return anomaly.Login(
+        user_id=entry["user_id"], email=f"user{entry['user_id']}@example.com", tenant="default",
+        at=entry["at"], network=anomaly.network_hash(entry["ip"]), device=anomaly.device_hash(entry["agent"]),
+        country=entry["country"], latitude=entry["lat"], longitude=entry["lon"], ip=entry["ip"],
+    )
+
+
+def replay(log: list[dict], step) -> tuple[dict, list]:
+    samples, verdicts = [], []
+    start = time.perf_counter()
+    for entry in log:
+        t0 = time.perf_counter()
+        verdicts.append(step(entry))
+        samples.append(time.perf_counter() - t0)
+    summary = summarize(samples, time.perf_counter() - start)
+    summary["events_per_sec"] = summary.pop("throughput_rps")
+    return summary, verdicts
+
+
+def detection(log: list[dict], scores: list, alert_score: int) -> dict:
+    injected = sum(entry["anomalous"] for entry in log)
+    flagged = [score >= alert_score for score in scores]
+    caught = sum(1 for entry, hit in zip(log, flagged) if hit and entry["anomalous"])
+    false_positives = sum(1 for entry, hit in zip(log, flagged) if hit and not entry["anomalous"])
+    return {"injected": injected, "caught": caught, "false_positives": false_positives}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--anomaly-rate", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--redis", choices=("fake", "url", "none"), default="fake")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django(args.redis)
+    logging.getLogger("users.anomaly").setLevel(logging.ERROR)  # one warning per flagged login
+    from django.conf import settings
+    from django.test import RequestFactory
+    from users import anomaly, audit, mail_queue
+
+    # Actions are queued, not sent; the stages below measure the engine only
+    settings.MAIL_QUEUE_BACKGROUND = False
+    settings.AUDIT_BACKGROUND = False
+    settings.ANOMALY_BACKGROUND = False
+    alert_score = settings.ANOMALY_ALERT_SCORE
+    log = build_log(args.users, args.events, args.anomaly_rate, args.seed)
+    results = {}
+
+    profiles = {}
+
+    def rules_step(entry):
+        login = to_login(anomaly, entry)
+        profile = profiles.setdefault(login.user_id, anomaly.Profile())
+        total = anomaly.score(anomaly.evaluate(profile, login))
+        if total < settings.ANOMALY_STEP_UP_SCORE:  # as process() does
+            anomaly.learn(profile, login)
+        return total
+
+    results["rules"], scores = replay(log, rules_step)
+    results["rules"].update(detection(log, scores, alert_score))
+
+    from django.core.cache import cache
+    cache.clear()
+    from users.utils import get_redis_client
+    if get_redis_client() is not None and args.redis == "fake":
+        get_redis_client().flushdb()
+    results["engine"], verdicts = replay(log, lambda entry: anomaly.process(to_login(anomaly, entry))[1])
+    results["engine"].update(detection(log, verdicts, alert_score))
+    audit.discard()
+    mail_queue.discard()
+
+    factory = RequestFactory()
+    requests = [
+        factory.post("/api/auth/login/", REMOTE_ADDR=entry["ip"], HTTP_USER_AGENT=entry["agent"],
+                     HTTP_CF_IPCOUNTRY=entry["country"])
+        for entry in log
+    ]
+    users = {uid: SimpleNamespace(pk=uid, email=f"user{uid}@example.com") for uid in range(1, args.users + 1)}
+    position = iter(range(len(log)))
+
+    def observe_step(entry):
+        anomaly.observe(anomaly.login_from_request(users[entry["user_id"]], requests[next(position)]))
+
+    results["observe"], _ = replay(log, observe_step)
+    anomaly.discard()
+
+    columns = ["count", "p50_ms", "p99_ms", "events_per_sec", "injected", "caught", "false_positives"]
+    print("stage".ljust(10) + "".join(c.rjust(16) for c in columns))
+    for name, summary in results.items():
+        cells = [summary.get(c, "-") for c in columns]
+        print(name.ljust(10) + "".join((f"{v:.3f}" if isinstance(v, float) else str(v)).rjust(16) for v in cells))
+    path = save_results("anomaly_replay", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
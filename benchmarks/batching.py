@@ -0,0 +1,152 @@
+"""Round trips and latency of multi-key flows, one command at a time vs batched.
+
+Each flow runs against fakeredis (or --redis url) wrapped so every command
+or pipeline counts as one round trip and, with --rtt-ms, sleeps that long
+to stand in for the network. ``sequential`` issues the same helper calls
+one by one (what the views did before ``utils.batch()``); ``batched`` runs
+the production code paths.
+
+    python benchmarks/batching.py --sessions 5 --users 50 --rtt-ms 0.3
+"""
+import time
+import argparse
+
+from harness import setup_django, summarize, save_results, print_table
+
+
+def counting_client(base_client, rtt):
+    """Proxy counting round trips (commands and pipeline executes)."""
+
+    class Pipeline:
+        def __init__(self, pipe):
+            self._pipe = pipe
+
+        def __getattr__(self, name):
+            return getattr(self._pipe, name)
+
+        def execute(self, *args, **kwargs):
+            client.round_trips += 1
+            if rtt:
+                time.sleep(rtt)
+            return self._pipe.execute(*args, **kwargs)
+
+    class Client:
+        round_trips = 0
+
+        def __getattr__(self, name):
+            attr = getattr(base_client, name)
+            if not callable(attr):
+                return attr
+
+            def command(*args, **kwargs):
+                self.round_trips += 1
+                if rtt:
+                    time.sleep(rtt)
+                return attr(*args, **kwargs)
+            return command
+
+        def pipeline(self, *args, **kwargs):
+            return Pipeline(base_client.pipeline(*args, **kwargs))
+
+    client = Client()
+    return client
+
+
+def seed_sessions(client, user_ids, per_user):
+    from users.sessions import _index_key
+    from users.token_families import family_key
+
+    now = time.time()
+    for user_id in user_ids:
+        for n in range(per_user):
+            family_id = f"bench{user_id}x{n}"
+            client.hset(family_key(family_id), mapping={"uid": user_id, "gen": 0, "created": int(now)})
+            client.zadd(_index_key(user_id), {family_id: now})
+
+
+def sequential_logout_all(user_ids):
+    from users import sessions
+    from users.token_families import revoke_family
+
+    for user_id in user_ids:
+        for family_id in sessions._session_ids([user_id])[user_id]:
+            revoke_family(family_id)
+        sessions.get_store().delete(sessions._index_key(user_id))
+
+
+def reset_flow(batched, token, user_id):
+    from users import lockout, utils
+    from users.sessions import revoke_all_sessions
+
+    utils.consume_reset_token(token)
+    if batched:
+        with utils.batch():
+            revoke_all_sessions(user_id)
+            lockout.record_success("bench@example.com", "127.0.0.1")
+    else:
+        sequential_logout_all([user_id])
+        lockout.record_success("bench@example.com", "127.0.0.1")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=5, help="sessions per user")
+    parser.add_argument("--users", type=int, default=20, help="users in the bulk deactivation flow")
+    parser.add_argument("--rtt-ms", type=float, default=0.2, help="simulated network round trip")
+    parser.add_argument("--redis", choices=("fake", "url"), default="fake")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django(args.redis)
+    from users import utils
+    from users.sessions import revoke_all_sessions
+
+    base_client = utils.get_redis_client()
+    client = counting_client(base_client, args.rtt_ms / 1000)
+    utils._redis_client = client
+    bulk_ids = [str(1000 + n) for n in range(args.users)]
+
+    flows = {
+        "reset_password": (
+            lambda batched: reset_flow(batched, "benchtoken", "1"),
+            ["1"],
+        ),
+        "logout_all": (
+            lambda batched: revoke_all_sessions("1") if batched else sequential_logout_all(["1"]),
+            ["1"],
+        ),
+        "bulk_deactivate": (
+            lambda batched: revoke_all_sessions(*bulk_ids) if batched else sequential_logout_all(bulk_ids),
+            bulk_ids,
+        ),
+    }
+
+    results, trips = {}, {}
+    for flow, (run, user_ids) in flows.items():
+        for mode in ("sequential", "batched"):
+            batched = mode == "batched"
+            samples = []
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                seed_sessions(base_client, user_ids, args.sessions)
+                base_client.set("pwdreset:benchtoken", "bench@example.com", ex=600)
+                before = client.round_trips
+                t0 = time.perf_counter()
+                run(batched)
+                samples.append(time.perf_counter() - t0)
+                trips[f"{flow}.{mode}"] = client.round_trips - before
+            results[f"{flow}.{mode}"] = summarize(samples, time.perf_counter() - start)
+
+    print_table(results)
+    print(f"\nround trips per call ({args.sessions} sessions/user, {args.users} users in bulk):")
+    for name, count in trips.items():
+        print(f"  {name:<32}{count:6d}")
+    for name, count in trips.items():
+        results[name]["round_trips"] = count
+    path = save_results("batching", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py baseline.json candidate.json [--metric p95_ms] [--threshold 10]
+
+Exits with status 1 when any case got slower than the threshold (percent).
+"""
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path) as fh:
+        return json.load(fh)
+
+
+def compare(baseline: dict, candidate: dict, metric: str, threshold: float):
+    """Yield ``(case, before, after, change_pct, regressed)`` for shared cases."""
+    higher_is_better = metric == "throughput_rps"
+    for case, before_summary in baseline["results"].items():
+        after_summary = candidate["results"].get(case)
+        if not after_summary or metric not in before_summary or metric not in after_summary:
+            continue
+        before, after = before_summary[metric], after_summary[metric]
+        change = ((after - before) / before * 100) if before else 0.0
+        regressed = (-change if higher_is_better else change) > threshold
+        yield case, before, after, change, regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args()
+
+    baseline, candidate = load(args.baseline), load(args.candidate)
+    print(f"{baseline['benchmark']}: {baseline['commit']} -> {candidate['commit']} ({args.metric})")
+    regressions = 0
+    for case, before, after, change, regressed in compare(baseline, candidate, args.metric, args.threshold):
+        regressions += regressed
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:<32}{before:>12.3f}{after:>12.3f}{change:>+10.1f}%{flag}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Throughput, latency and worker memory of the gunicorn.conf.py profiles.
+
+Starts gunicorn once per profile (benchmark settings, SQLite unless
+BENCH_DATABASE_URL is set) and drives it over HTTP with the load.py flow:
+register and login (hashing-bound), me and forgot_password (I/O-bound).
+Worker memory is the unique set size (private pages) per worker after the
+run, which shows how much the preloaded master still shares copy-on-write;
+it needs Linux (/proc/<pid>/smaps_rollup). Servers run with
+RESET_TOKEN_MODE=signed so reset tokens work across workers without Redis.
+
+    python benchmarks/gunicorn_profiles.py --workers 4 --concurrency 32
+    python benchmarks/gunicorn_profiles.py --profiles mixed --compare-preload
+"""
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import ROOT, setup_django, summarize, save_results, print_table
+from load import HttpClient, Recorder, virtual_user
+
+
+def worker_pids(master_pid):
+    try:
+        with open(f"/proc/{master_pid}/task/{master_pid}/children") as handle:
+            return [int(pid) for pid in handle.read().split()]
+    except OSError:
+        return []
+
+
+def private_kb(pid):
+    """Private (unshared) resident KB of ``pid``, None when unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as handle:
+            fields = dict(line.split(":", 1) for line in handle if ":" in line)
+    except OSError:
+        return None
+    return sum(int(fields.get(name, "0 kB").split()[0]) for name in ("Private_Clean", "Private_Dirty"))
+
+
+def wait_until_ready(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{url}/health/", timeout=2):
+                return
+        except urllib.error.HTTPError:
+            return  # answering, even if a dependency is degraded
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"gunicorn did not come up at {url}")
+
+
+def run_profile(profile, args, preload=True):
+    url = f"http://127.0.0.1:{args.port}"
+    env = {
+        **os.environ,
+        "DJANGO_SETTINGS_MODULE": "benchmarks.settings",
+        "GUNICORN_PROFILE": profile,
+        "GUNICORN_PRELOAD": str(preload),
+        "PORT": str(args.port),
+        "WEB_CONCURRENCY": str(args.workers),
+        "RESET_TOKEN_MODE": "signed",
+    }
+    if args.redis != "url":
+        env.pop("REDIS_URL", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_until_ready(url)
+        recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(virtual_user, lambda: HttpClient(url), recorder, args.iterations, False)
+                for _ in range(args.concurrency)
+            ]
+            for future in futures:
+                future.result()
+        wall = time.perf_counter() - start
+        memory = [kb for kb in map(private_kb, worker_pids(server.pid)) if kb is not None]
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+    samples = [s for values in recorder.samples.values() for s in values]
+    result = summarize(samples, wall)
+    result["errors"] = sum(recorder.errors.values())
+    result["hashing_p95_ms"] = summarize(recorder.samples["login"])["p95_ms"]
+    result["io_p95_ms"] = summarize(recorder.samples["me"])["p95_ms"]
+    if memory:
+        result["worker_private_kb"] = max(memory)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", default=["cpu", "io", "mixed", "asgi"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--iterations", type=int, default=5, help="flows per virtual user")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--compare-preload", action="store_true", help="also run each profile without preload")
+    parser.add_argument("--redis", choices=("url", "none"), default="none")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("none")  # migrates the benchmark database
+
+    results = {}
+    for profile in args.profiles:
+        results[profile] = run_profile(profile, args)
+        if args.compare_preload:
+            results[f"{profile}.no_preload"] = run_profile(profile, args, preload=False)
+
+    print_table(results)
+    print(f"\n{'case':<24}{'errors':>8}{'login p95 ms':>16}{'me p95 ms':>14}{'worker KB':>12}")
+    for name, result in results.items():
+        print(f"{name:<24}{result['errors']:>8}{result['hashing_p95_ms']:>16.1f}"
+              f"{result['io_p95_ms']:>14.1f}{result.get('worker_private_kb', '-'):>12}")
+    path = save_results("gunicorn_profiles", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Shared helpers for the benchmark scripts: Django setup, timing, results."""
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def setup_django(redis: str = "fake"):
+    """Configure Django with the benchmark settings and pick a Redis backend.
+
+    ``redis`` is ``"fake"`` (in-process fakeredis), ``"url"`` (REDIS_URL) or
+    ``"none"`` (Django cache fallback).
+    """
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+    if redis != "url":
+        os.environ.pop("REDIS_URL", None)
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0, interactive=False)
+
+    from users import utils
+    if redis == "fake":
+        import fakeredis
+        utils._redis_client = fakeredis.FakeRedis()
+    elif redis == "url":
+        from django.conf import settings
+        settings.REDIS_URL = os.environ["REDIS_URL"]
+        utils._redis_client = None
+        utils.get_redis_client()
+
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, int(round(pct / 100.0 * len(samples))) - 1))
+    return samples[rank]
+
+
+def summarize(samples, wall_seconds: float | None = None) -> dict:
+    """Latency summary in milliseconds, plus throughput when wall time is known."""
+    ordered = sorted(samples)
+    summary = {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000 if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50) * 1000,
+        "p95_ms": percentile(ordered, 95) * 1000,
+        "p99_ms": percentile(ordered, 99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = len(ordered) / wall_seconds
+    return summary
+
+
+def time_calls(func, iterations: int, warmup: int = 3) -> dict:
+    """Call ``func`` repeatedly and summarize per-call latency."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - t0)
+    return summarize(samples, time.perf_counter() - start)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL,
+        ).decode().strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(name: str, results: dict, params: dict | None = None, output: str | None = None) -> Path:
+    """Write a results document that ``benchmarks/compare.py`` understands."""
+    from django.conf import settings
+
+    commit = git_commit()
+    document = {
+        "benchmark": name,
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "database": settings.DATABASES["default"]["ENGINE"].rsplit(".", 1)[-1],
+        "params": params or {},
+        "results": results,
+    }
+    if output:
+        path = Path(output)
+    else:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        path = RESULTS_DIR / f"{name}-{commit}-{stamp}.json"
+    path.write_text(json.dumps(document, indent=2, sort_keys=True))
+    return path
+
+
+def print_table(results: dict):
+    """Print ``{case: summary}`` as an aligned table."""
+    columns = ["count", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "throughput_rps"]
+    width = max(len(name) for name in results) + 2
+    print("case".ljust(width) + "".join(c.rjust(16) for c in columns))
+    for name, summary in results.items():
+        cells = []
+        for column in columns:
+            value = summary.get(column)
+            cells.append(("-" if value is None else f"{value:.3f}" if isinstance(value, float) else str(value)).rjust(16))
+        print(name.ljust(width) + "".join(cells))
@@ -0,0 +1,154 @@
+"""Load generator for the auth endpoints.
+
+Each virtual user runs register -> login -> me -> forgot_password ->
+reset_password in a loop. By default requests go through Django's WSGI handler
+in-process; pass --url to drive a running server over HTTP instead (reset
+tokens are only returned by servers running with DEBUG=True).
+
+    python benchmarks/load.py --concurrency 8 --iterations 25
+    python benchmarks/load.py --url http://127.0.0.1:8000 --concurrency 32
+"""
+import json
+import time
+import uuid
+import argparse
+import threading
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from harness import setup_django, summarize, save_results, print_table
+
+ENDPOINTS = ("register", "login", "me", "forgot_password", "reset_password")
+PASSWORD = "LoadPass!123"
+
+
+class InProcessClient:
+    def __init__(self):
+        from django.test import Client
+        self.client = Client()
+
+    def request(self, method, path, body=None, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        if method == "GET":
+            response = self.client.get(path, **headers)
+        else:
+            response = self.client.post(path, data=json.dumps(body), content_type="application/json", **headers)
+        return response.status_code, response.content
+
+    def close(self):
+        from django.db import connections
+        connections.close_all()
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+
+    def request(self, method, path, body=None, token=None):
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        req.add_header("Content-Type", "application/json")
+        if token:
+            req.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def close(self):
+        pass
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def call(self, name, client, method, path, body=None, token=None, ok=(200,)):
+        start = time.perf_counter()
+        status, content = client.request(method, path, body, token)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.samples[name].append(elapsed)
+            if status not in ok:
+                self.errors[name] += 1
+        try:
+            return status, json.loads(content) if content else {}
+        except ValueError:
+            return status, {}
+
+
+def virtual_user(make_client, recorder, iterations, in_process):
+    client = make_client()
+    try:
+        for _ in range(iterations):
+            email = f"load-{uuid.uuid4().hex}@example.com"
+            recorder.call("register", client, "POST", "/api/auth/register/", {
+                "email": email, "full_name": "Load User",
+                "password": PASSWORD, "password_confirm": PASSWORD,
+            }, ok=(201,))
+            _, data = recorder.call("login", client, "POST", "/api/auth/login/", {
+                "email": email, "password": PASSWORD,
+            })
+            recorder.call("me", client, "GET", "/api/auth/me/", token=data.get("access"))
+            _, data = recorder.call("forgot_password", client, "POST", "/api/auth/forgot-password/", {
+                "email": email,
+            })
+            token = data.get("token")
+            if token is None and in_process:
+                from users.utils import generate_reset_token
+                token = generate_reset_token(email)
+            if token is None:
+                continue
+            recorder.call("reset_password", client, "POST", "/api/auth/reset-password/", {
+                "token": token, "new_password": PASSWORD + "x", "new_password_confirm": PASSWORD + "x",
+            })
+    finally:
+        client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--iterations", type=int, default=10, help="flows per virtual user")
+    parser.add_argument("--url", help="base URL of a running server (default: in-process)")
+    parser.add_argument("--redis", choices=("fake", "url", "none"), default="fake")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django(args.redis)
+    in_process = not args.url
+    make_client = InProcessClient if in_process else (lambda: HttpClient(args.url))
+
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(virtual_user, make_client, recorder, args.iterations, in_process)
+            for _ in range(args.concurrency)
+        ]
+        for future in futures:
+            future.result()
+    wall = time.perf_counter() - start
+
+    results = {}
+    for name in ENDPOINTS:
+        if recorder.samples[name]:
+            results[name] = summarize(recorder.samples[name], wall)
+            results[name]["errors"] = recorder.errors[name]
+    all_samples = [s for samples in recorder.samples.values() for s in samples]
+    results["total"] = summarize(all_samples, wall)
+    results["total"]["errors"] = sum(recorder.errors.values())
+
+    print_table(results)
+    print(f"\nerrors: {dict(recorder.errors) or 0}")
+    path = save_results("load", results, vars(args), args.output)
+    print(f"results written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Micro-benchmarks for the CPU-heavy building blocks of the auth endpoints.
+
+    python benchmarks/micro.py [--iterations N] [--redis fake|url|none] [--only hashing,jwt]
+"""
+import argparse
+import uuid
+
+from harness import setup_django, time_calls, save_results, print_table
+
+
+def bench_hashing(iterations):
+    from django.contrib.auth.hashers import make_password, check_password
+
+    encoded = make_password("BenchPass!123")
+    return {
+        "hash.make_password": time_calls(lambda: make_password("BenchPass!123"), iterations),
+        "hash.check_password": time_calls(lambda: check_password("BenchPass!123", encoded), iterations),
+    }
+
+
+def bench_jwt(iterations, user):
+    from rest_framework_simplejwt.tokens import RefreshToken, AccessToken
+
+    raw_access = str(RefreshToken.for_user(user).access_token)
+    return {
+        "jwt.encode_pair": time_calls(lambda: str(RefreshToken.for_user(user).access_token), iterations),
+        "jwt.decode_access": time_calls(lambda: AccessToken(raw_access), iterations),
+    }
+
+
+def bench_serializers(iterations, user):
+    from users.serializers import (
+        RegisterSerializer, ForgotPasswordSerializer, ResetPasswordSerializer, UserSerializer,
+    )
+
+    def register():
+        serializer = RegisterSerializer(data={
+            "email": f"bench-{uuid.uuid4().hex}@example.com",
+            "full_name": "Bench User",
+            "password": "BenchPass!123",
+            "password_confirm": "BenchPass!123",
+        })
+        serializer.is_valid()
+
+    def reset():
+        ResetPasswordSerializer(data={
+            "token": "x" * 43,
+            "new_password": "BenchPass!456",
+            "new_password_confirm": "BenchPass!456",
+        }).is_valid()
+
+    return {
+        "serializer.register_validate": time_calls(register, iterations),
+        "serializer.forgot_validate": time_calls(
+            lambda: ForgotPasswordSerializer(data={"email": "bench@example.com"}).is_valid(), iterations),
+        "serializer.reset_validate": time_calls(reset, iterations),
+        "serializer.user_data": time_calls(lambda: UserSerializer(user).data, iterations),
+    }
+
+
+def bench_token_utils(iterations):
+    from users import utils
+
+    def reset_roundtrip():
+        token = utils.generate_reset_token("bench@example.com")
+        utils.validate_reset_token(token)
+        utils.consume_reset_token(token)
+
+    return {
+        "utils.reset_token_roundtrip": time_calls(reset_roundtrip, iterations),
+        "utils.check_rate_limit": time_calls(
+            lambda: utils.check_rate_limit("bench:ratelimit", 10 ** 9, 60), iterations),
+        "utils.is_token_blacklisted": time_calls(
+            lambda: utils.is_token_blacklisted("bench-token"), iterations),
+    }
+
+
+SUITES = ("hashing", "jwt", "serializers", "token_utils")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--hash-iterations", type=int, default=20,
+                        help="iterations for the (slow) hashing and register cases")
+    parser.add_argument("--redis", choices=("fake", "url", "none"), default="fake")
+    parser.add_argument("--only", default=",".join(SUITES))
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django(args.redis)
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email="bench@example.com", defaults={"full_name": "Bench User"})
+
+    selected = set(args.only.split(","))
+    results = {}
+    if "hashing" in selected:
+        results.update(bench_hashing(args.hash_iterations))
+    if "jwt" in selected:
+        results.update(bench_jwt(args.iterations, user))
+    if "serializers" in selected:
+        results.update(bench_serializers(args.hash_iterations, user))
+    if "token_utils" in selected:
+        results.update(bench_token_utils(args.iterations))
+
+    print_table(results)
+    path = save_results("micro", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Per-middleware timing and requests/sec for the lean API pipeline.
+
+Drives GET /api/auth/me/ in-process through three configurations:
+
+  baseline  the original MIDDLEWARE list (duplicated Security/WhiteNoise)
+  full      PipelineRouterMiddleware with every route on FULL_MIDDLEWARE
+  lean      PipelineRouterMiddleware with /api/auth/ on API_MIDDLEWARE
+
+and prints the self time of every middleware layer for full and lean.
+
+    python benchmarks/middleware.py [--requests N] [--rounds N]
+"""
+import time
+import argparse
+from collections import defaultdict
+
+from harness import setup_django, summarize, save_results, print_table
+
+BASELINE_MIDDLEWARE = [
+    "auth_service.middleware.RequestMetricsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "corsheaders.middleware.CorsMiddleware",
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.middleware.common.CommonMiddleware",
+    "django.middleware.csrf.CsrfViewMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+    "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+]
+ROUTED_MIDDLEWARE = [
+    "auth_service.middleware.RequestMetricsMiddleware",
+    "auth_service.middleware.PipelineRouterMiddleware",
+]
+
+
+class LayerTimer:
+    """Wraps every layer of the router's pipelines and accumulates inclusive time."""
+
+    def __init__(self):
+        self.inclusive = defaultdict(float)
+        self.chains = []
+
+    def wrap(self, inner, path):
+        if path == "<view>":  # Pipeline wraps the inner handler first
+            self.chains.append([])
+        chain = len(self.chains) - 1
+        self.chains[chain].insert(0, path)
+
+        def timed(request):
+            start = time.perf_counter()
+            try:
+                return inner(request)
+            finally:
+                self.inclusive[chain, path] += time.perf_counter() - start
+        return timed
+
+    def self_times(self, requests):
+        """Per-layer exclusive time in microseconds per request, for the chain that ran."""
+        chain, order = max(enumerate(self.chains), key=lambda c: self.inclusive[c[0], c[1][0]])
+        report = {}
+        for outer, inner in zip(order, order[1:] + [None]):
+            spent = self.inclusive[chain, outer] - (self.inclusive[chain, inner] if inner else 0.0)
+            report[outer] = spent / requests * 1e6
+        return report
+
+
+def run(client, token, requests):
+    samples = []
+    start = time.perf_counter()
+    for _ in range(requests):
+        t0 = time.perf_counter()
+        response = client.get("/api/auth/me/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        samples.append(time.perf_counter() - t0)
+        assert response.status_code == 200, response.status_code
+    return summarize(samples, time.perf_counter() - start)
+
+
+def best_of(rounds, client_factory, token, requests):
+    """Least noisy of several rounds (highest throughput)."""
+    runs = [run(client_factory(), token, requests) for _ in range(rounds)]
+    return max(runs, key=lambda summary: summary["throughput_rps"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("fake")
+    from django.contrib.auth import get_user_model
+    from django.test import Client, override_settings
+    from rest_framework_simplejwt.tokens import RefreshToken
+    from auth_service.middleware import PipelineRouterMiddleware
+
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email="bench@example.com", defaults={"full_name": "Bench User"})
+    token = str(RefreshToken.for_user(user).access_token)
+
+    results, reports = {}, {}
+    with override_settings(MIDDLEWARE=BASELINE_MIDDLEWARE):
+        run(Client(), token, 50)
+        results["baseline"] = best_of(args.rounds, Client, token, args.requests)
+
+    for mode, prefixes in (("full", ()), ("lean", ("/api/auth/",))):
+        with override_settings(MIDDLEWARE=ROUTED_MIDDLEWARE, API_PIPELINE_PREFIXES=prefixes):
+            run(Client(), token, 50)
+            results[mode] = best_of(args.rounds, Client, token, args.requests)
+            timer = LayerTimer()
+            PipelineRouterMiddleware.wrap = staticmethod(timer.wrap)
+            try:
+                run(Client(), token, args.requests)
+            finally:
+                PipelineRouterMiddleware.wrap = None
+            reports[mode] = timer.self_times(args.requests)
+
+    print_table(results)
+    gain = results["lean"]["throughput_rps"] / results["baseline"]["throughput_rps"] - 1
+    print(f"\nlean vs baseline: {gain:+.1%} requests/sec")
+    for mode, report in reports.items():
+        print(f"\n{mode} pipeline, self time per request (us):")
+        for path, micros in report.items():
+            print(f"  {micros:9.1f}  {path}")
+    path = save_results("middleware", {**results, "layers": reports}, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
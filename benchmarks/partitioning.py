@@ -0,0 +1,111 @@
+"""Insert and lookup throughput: single users table vs the partitioned layout.
+
+Needs PostgreSQL (BENCH_DATABASE_URL=postgres://...). Builds both layouts in a
+scratch schema with the same columns and indexes as users_user, loads --rows
+users in batches, then runs --lookups random email lookups the way
+UserManager.for_email issues them.
+
+    BENCH_DATABASE_URL=postgres://localhost/auth_bench python benchmarks/partitioning.py --rows 200000
+"""
+import time
+import random
+import argparse
+
+from harness import setup_django, summarize, save_results, print_table
+
+SCHEMA = "bench_partitioning"
+
+
+def create_tables(cursor, partitions):
+    from users import partitioning
+
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA}")
+    columns = "id bigint NOT NULL, email varchar(254) NOT NULL, full_name varchar(255) NOT NULL, password varchar(128) NOT NULL"
+    cursor.execute(f"CREATE TABLE {SCHEMA}.flat ({columns}, PRIMARY KEY (id), UNIQUE (email))")
+    cursor.execute(f"CREATE TABLE {SCHEMA}.part ({columns}, PRIMARY KEY (id)) PARTITION BY RANGE (id)")
+    for index, (_, low, high) in enumerate(partitioning.partition_ranges(partitions)):
+        name = f"{SCHEMA}.part_{index:03d}"
+        cursor.execute(f"CREATE TABLE {name} PARTITION OF {SCHEMA}.part FOR VALUES FROM ({low}) TO ({high})")
+        cursor.execute(f"CREATE UNIQUE INDEX ON {name} (email)")
+
+
+def load(cursor, table, rows, batch, id_for):
+    samples = []
+    for start in range(0, rows, batch):
+        values = [
+            (id_for(n, f"user{n}@example.com"), f"user{n}@example.com", "Bench User", "!")
+            for n in range(start, min(rows, start + batch))
+        ]
+        t0 = time.perf_counter()
+        cursor.executemany(f"INSERT INTO {SCHEMA}.{table} VALUES (%s, %s, %s, %s)", values)
+        samples.append((time.perf_counter() - t0) / len(values))
+    return samples
+
+
+def lookups(cursor, table, emails, where):
+    samples = []
+    for email in emails:
+        sql, params = where(email)
+        t0 = time.perf_counter()
+        cursor.execute(f"SELECT id, email, password FROM {SCHEMA}.{table} WHERE {sql}", params)
+        cursor.fetchone()
+        samples.append(time.perf_counter() - t0)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=1000)
+    parser.add_argument("--lookups", type=int, default=5000)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch schema")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("none")
+    from django.db import connection
+    from users import partitioning
+
+    if connection.vendor != "postgresql":
+        raise SystemExit("benchmarks/partitioning.py needs BENCH_DATABASE_URL pointing at PostgreSQL")
+
+    def sharded_id(n, email):
+        return partitioning.shard_id_range(partitioning.shard_for_email(email))[0] + n + 1
+
+    def flat_where(email):
+        return "email = %s", [email]
+
+    def part_where(email):
+        low, high = partitioning.shard_id_range(partitioning.shard_for_email(email))
+        return "email = %s AND id >= %s AND id < %s", [email, low, high]
+
+    emails = [f"user{random.randrange(args.rows)}@example.com" for _ in range(args.lookups)]
+    results = {}
+    with connection.cursor() as cursor:
+        create_tables(cursor, args.partitions)
+        for name, table, id_for in (("insert.flat", "flat", lambda n, email: n + 1),
+                                    ("insert.partitioned", "part", sharded_id)):
+            t0 = time.perf_counter()
+            results[name] = summarize(load(cursor, table, args.rows, args.batch, id_for))
+            results[name]["throughput_rps"] = args.rows / (time.perf_counter() - t0)
+        cursor.execute(f"ANALYZE {SCHEMA}.flat")
+        cursor.execute(f"ANALYZE {SCHEMA}.part")
+
+        for name, table, where in (("lookup.flat", "flat", flat_where), ("lookup.partitioned", "part", part_where)):
+            lookups(cursor, table, emails[:100], where)  # warm up
+            t0 = time.perf_counter()
+            results[name] = summarize(lookups(cursor, table, emails, where), time.perf_counter() - t0)
+
+        if not args.keep:
+            cursor.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+
+    # insert latencies are per row (batch time / batch size); throughput is rows/s
+    print_table(results)
+    path = save_results("partitioning", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
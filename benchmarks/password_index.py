@@ -0,0 +1,164 @@
+"""Breached-password index: build time, lookup latency and per-worker RSS.
+
+Builds an index of --entries synthetic HIBP-style hashes, then compares
+lookups against it with Django's CommonPasswordValidator (a Python set).
+Memory is measured in forked children, like gunicorn workers: the private
+(anonymous) RSS each worker adds, and the shared file-backed RSS the mmap
+uses from the page cache. RSS figures need Linux (/proc/self/status).
+
+    python benchmarks/password_index.py --entries 5000000 --workers 4
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import multiprocessing
+
+from harness import setup_django, summarize, save_results, print_table
+
+
+def rss_kb():
+    """``(anonymous, file-backed)`` resident KB of this process."""
+    values = {}
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    name, value = line.split(":", 1)
+                    values[name] = int(value.split()[0])
+    except OSError:
+        return None, None
+    return values.get("RssAnon"), values.get("RssFile")
+
+
+def write_corpus(path, entries, seed):
+    rng = random.Random(seed)
+    with open(path, "w") as handle:
+        for _ in range(entries):
+            handle.write(f"{rng.getrandbits(160):040X}:{rng.randint(1, 1000)}\n")
+
+
+def probe(index_path, samples, mode, queue):
+    """Child process: load one implementation, do lookups, report RSS growth."""
+    anon_before, file_before = rss_kb()
+    if mode == "mmap":
+        from users.password_index import PasswordIndex
+        index = PasswordIndex(index_path)
+        lookup = index.contains_prefix
+    else:
+        from users.password_index import HEADER, ENTRY_SIZE
+        with open(index_path, "rb") as handle:
+            data = handle.read()
+        index = {
+            int.from_bytes(data[offset:offset + ENTRY_SIZE], "big")
+            for offset in range(HEADER.size, len(data), ENTRY_SIZE)
+        }
+        del data
+        lookup = index.__contains__
+    for prefix in samples:
+        lookup(prefix)
+    anon_after, file_after = rss_kb()
+    if anon_before is None:
+        queue.put(None)
+    else:
+        queue.put((anon_after - anon_before, file_after - file_before))
+
+
+def measure_rss(index_path, samples, mode, workers):
+    context = multiprocessing.get_context("fork")
+    queue = context.Queue()
+    processes = [context.Process(target=probe, args=(index_path, samples, mode, queue)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    if any(report is None for report in reports):
+        return None
+    return {
+        "private_kb_per_worker": max(report[0] for report in reports),
+        "file_backed_kb_per_worker": max(report[1] for report in reports),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=2_000_000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("none")
+    from django.contrib.auth.password_validation import CommonPasswordValidator
+    from django.core.exceptions import ValidationError
+    from users.password_index import PasswordIndex, build_index, password_prefix
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.txt")
+        index_path = os.path.join(directory, "index.bin")
+        write_corpus(corpus, args.entries, args.seed)
+
+        t0 = time.perf_counter()
+        count = build_index([corpus], index_path, chunk_size=args.chunk_size)
+        build_seconds = time.perf_counter() - t0
+        index = PasswordIndex(index_path)
+
+        rng = random.Random(args.seed)
+        hits = []
+        with open(corpus) as handle:
+            for n, line in enumerate(handle):
+                if n % max(1, args.entries // args.lookups) == 0:
+                    hits.append(int(line[:16], 16))
+        misses = [password_prefix(f"not-breached-{rng.random()}") for _ in range(args.lookups)]
+
+        for name, prefixes in (("mmap.lookup_hit", hits), ("mmap.lookup_miss", misses)):
+            samples = []
+            start = time.perf_counter()
+            for prefix in prefixes:
+                t = time.perf_counter()
+                index.contains_prefix(prefix)
+                samples.append(time.perf_counter() - t)
+            results[name] = summarize(samples, time.perf_counter() - start)
+
+        common = CommonPasswordValidator()
+        words = [f"word{n}" for n in range(args.lookups)]
+        samples = []
+        start = time.perf_counter()
+        for word in words:
+            t = time.perf_counter()
+            try:
+                common.validate(word)
+            except ValidationError:
+                pass
+            samples.append(time.perf_counter() - t)
+        results["common_validator.validate"] = summarize(samples, time.perf_counter() - start)
+
+        sample = hits[:args.lookups] + misses[:args.lookups]
+        memory = {}
+        for mode in ("mmap", "set"):
+            report = measure_rss(index_path, sample, mode, args.workers)
+            if report:
+                memory[mode] = report
+        index.close()
+
+    print_table(results)
+    print(f"\nbuilt {count} entries in {build_seconds:.1f}s ({count * 8 / 1e6:.1f} MB on disk)")
+    for mode, report in memory.items():
+        print(
+            f"{mode:>4}: {report['private_kb_per_worker'] / 1024:.1f} MB private, "
+            f"{report['file_backed_kb_per_worker'] / 1024:.1f} MB shared page cache per worker"
+        )
+    results["build"] = {"count": count, "seconds": build_seconds}
+    for mode, report in memory.items():
+        results[f"rss.{mode}"] = report
+    path = save_results("password_index", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
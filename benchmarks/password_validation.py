@@ -0,0 +1,87 @@
+"""Per-request password validation cost: Django's validate_password vs the
+ordered pipeline in users/validators.py, and RegisterSerializer end to end.
+
+Each case is one kind of submitted password. ``legacy`` runs every validator
+without a user (what the serializers did before, so the similarity check was
+a no-op); ``pipeline`` runs cheapest-first with the unsaved user and stops at
+the first failing stage. ``cpu_us`` is process CPU per call.
+
+    python benchmarks/password_validation.py --iterations 2000
+"""
+import time
+import argparse
+
+from harness import setup_django, time_calls, save_results, print_table
+
+CASES = {
+    "valid": "Unusual!Pass-9041",
+    "too_short": "abc",
+    "numeric": "4815162342",
+    "common": "password123",
+    "similar": "benchmarkuser",
+}
+
+
+def with_cpu(func, iterations):
+    summary = time_calls(func, iterations)
+    start = time.process_time()
+    for _ in range(iterations):
+        func()
+    summary["cpu_us"] = (time.process_time() - start) / iterations * 1e6
+    return summary
+
+
+def ignore_errors(func, *args):
+    from django.core.exceptions import ValidationError
+
+    def call():
+        try:
+            func(*args)
+        except ValidationError:
+            pass
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("none")
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.password_validation import validate_password as django_validate
+    from users.serializers import RegisterSerializer
+    from users.validators import validate_password as pipeline_validate
+
+    User = get_user_model()
+    candidate = User(email="benchmark.user@example.com", full_name="Benchmark User")
+    User.objects.filter(email="taken@example.com").delete()
+    User.objects.create_user(email="taken@example.com", password="x", full_name="Taken")
+
+    results = {}
+    for case, password in CASES.items():
+        results[f"legacy.{case}"] = with_cpu(ignore_errors(django_validate, password), args.iterations)
+        results[f"pipeline.{case}"] = with_cpu(
+            ignore_errors(pipeline_validate, password, candidate), args.iterations)
+
+    register_cases = {
+        "valid": ("new@example.com", CASES["valid"], CASES["valid"]),
+        "mismatch": ("new@example.com", CASES["valid"], CASES["valid"] + "x"),
+        "duplicate_email": ("taken@example.com", CASES["valid"], CASES["valid"]),
+        "common": ("new@example.com", CASES["common"], CASES["common"]),
+    }
+    for case, (email, password, confirm) in register_cases.items():
+        data = {"email": email, "full_name": "Benchmark User", "password": password, "password_confirm": confirm}
+        results[f"register.{case}"] = with_cpu(lambda: RegisterSerializer(data=data).is_valid(), args.iterations)
+
+    print_table(results)
+    print("\ncpu_us per call:")
+    for name, summary in results.items():
+        print(f"  {name:<28}{summary['cpu_us']:10.1f}")
+    path = save_results("password_validation", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
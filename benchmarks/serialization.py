@@ -0,0 +1,62 @@
+"""Per-response CPU cost of building the login/me payloads.
+
+Compares UserSerializer + DRF JSONRenderer against serialize_user +
+ORJSONRenderer, and checks the two paths render identical bytes.
+
+    python benchmarks/serialization.py [--iterations N]
+"""
+import argparse
+
+from harness import setup_django, time_calls, save_results, print_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("fake")
+    from django.contrib.auth import get_user_model
+    from rest_framework.renderers import JSONRenderer
+    from users.renderers import ORJSONRenderer
+    from users.serializers import UserSerializer, serialize_user
+
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email="bench@example.com", defaults={"full_name": "Bench User"})
+    user.refresh_from_db()
+
+    drf, fast = JSONRenderer(), ORJSONRenderer()
+    login_extra = {"access": "a" * 220, "refresh": "r" * 220}
+
+    def me_drf():
+        return drf.render(UserSerializer(user).data)
+
+    def me_fast():
+        return fast.render(serialize_user(user))
+
+    def login_drf():
+        return drf.render({**login_extra, "user": UserSerializer(user).data})
+
+    def login_fast():
+        return fast.render({**login_extra, "user": serialize_user(user)})
+
+    assert me_drf() == me_fast(), "me payload differs between paths"
+    assert login_drf() == login_fast(), "login payload differs between paths"
+
+    results = {
+        "me.drf": time_calls(me_drf, args.iterations),
+        "me.fast": time_calls(me_fast, args.iterations),
+        "login.drf": time_calls(login_drf, args.iterations),
+        "login.fast": time_calls(login_fast, args.iterations),
+    }
+    print_table(results)
+    for case in ("me", "login"):
+        before, after = results[f"{case}.drf"]["mean_ms"], results[f"{case}.fast"]["mean_ms"]
+        print(f"{case}: {before * 1000:.1f}us -> {after * 1000:.1f}us per response ({before / after:.1f}x)")
+    path = save_results("serialization", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""Settings for running the benchmark suite fully locally.
+
+Uses SQLite unless BENCH_DATABASE_URL points at a (local) Postgres, disables
+rate limiting so the load generator measures the endpoints rather than the
+limiter, and keeps outgoing mail in memory.
+"""
+import os
+import dj_database_url
+
+from auth_service.settings import *  # noqa: F401,F403
+
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{BASE_DIR / 'benchmarks' / 'bench.sqlite3'}")
+DATABASES = {
+    "default": dj_database_url.parse(BENCH_DATABASE_URL, conn_max_age=600)
+}
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    DATABASES["default"]["OPTIONS"] = {"timeout": 30}
+
+RATELIMIT_ENABLE = False
+EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+DEBUG = False
+ALLOWED_HOSTS = ["*"]
+LOGGING = {"version": 1, "disable_existing_loggers": False, "root": {"level": "WARNING"}}
@@ -0,0 +1,85 @@
+"""Shared-memory cache vs LocMemCache (and Redis with --redis url).
+
+Times get/set/incr/add+delete per backend in one process, then has
+--processes forked workers increment one counter to show which backends
+actually share state (LocMemCache ends at the per-process count).
+
+    python benchmarks/shm_cache.py --iterations 20000 --processes 4
+    REDIS_URL=redis://localhost:6379/0 python benchmarks/shm_cache.py --redis url
+"""
+import os
+import argparse
+import tempfile
+import multiprocessing
+
+from harness import setup_django, time_calls, save_results, print_table
+
+
+def backends(redis, directory):
+    configs = {
+        "shm": {
+            "BACKEND": "auth_service.shm_cache.SharedMemoryCache",
+            "LOCATION": os.path.join(directory, "bench-cache"),
+        },
+        "locmem": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"},
+    }
+    if redis == "url":
+        configs["redis"] = {"BACKEND": "django_redis.cache.RedisCache", "LOCATION": os.environ["REDIS_URL"]}
+    return configs
+
+
+def make_cache(config):
+    from django.core.cache import CacheHandler
+    return CacheHandler({"default": config})["default"]
+
+
+def hammer(config, increments):
+    cache = make_cache(config)
+    for _ in range(increments):
+        cache.incr("bench:shared")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--redis", choices=("url", "none"), default="none")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/)")
+    args = parser.parse_args()
+
+    setup_django("none")
+    results, shared = {}, {}
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if os.path.isdir("/dev/shm") else None) as directory:
+        for name, config in backends(args.redis, directory).items():
+            cache = make_cache(config)
+            cache.clear()
+            cache.set("bench:hot", {"email": "bench@example.com"}, 600)
+            cache.set("bench:counter", 0, 600)
+            results[f"{name}.get"] = time_calls(lambda: cache.get("bench:hot"), args.iterations)
+            results[f"{name}.set"] = time_calls(lambda: cache.set("bench:hot", {"email": "x"}, 600), args.iterations)
+            results[f"{name}.incr"] = time_calls(lambda: cache.incr("bench:counter"), args.iterations)
+            results[f"{name}.add_delete"] = time_calls(
+                lambda: cache.add("bench:once", 1, 600) and cache.delete("bench:once"), args.iterations
+            )
+
+            cache.set("bench:shared", 0, 600)
+            context = multiprocessing.get_context("fork")
+            per_process = max(1, args.iterations // 10)
+            workers = [context.Process(target=hammer, args=(config, per_process)) for _ in range(args.processes)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            shared[name] = (cache.get("bench:shared"), per_process * args.processes)
+            results[f"{name}.get"]["shared_counter"] = shared[name][0]
+
+    print_table(results)
+    print("\ncross-process counter (seen by the parent / expected):")
+    for name, (seen, expected) in shared.items():
+        print(f"  {name:<10}{seen:>10} / {expected}")
+    path = save_results("shm_cache", results, vars(args), args.output)
+    print(f"\nresults written to {path}")
+
+
+if __name__ == "__main__":
+    main()
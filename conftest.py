@@ -1,9 +1,40 @@
 import os
+import shutil
+import tempfile
+import pytest
 import django
 from django.conf import settings
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'auth_service.settings')
 
+_cache_dir = None
+
 def pytest_configure():
+    global _cache_dir
     if not settings.configured:
-        django.setup()
\ No newline at end of file
+        django.setup()
+    # Never map a dev server's shared-memory cache: tests clear it constantly
+    default = settings.CACHES['default']
+    if default['BACKEND'] == 'auth_service.shm_cache.SharedMemoryCache':
+        _cache_dir = tempfile.mkdtemp(prefix='auth-service-test-cache-')
+        default['LOCATION'] = os.path.join(_cache_dir, 'cache')
+
+def pytest_unconfigure():
+    if _cache_dir:
+        shutil.rmtree(_cache_dir, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True)
+def discard_write_behind_buffers():
+    """Keep batched writes from one test out of the next (and out of atexit)."""
+    from django.test import override_settings
+    # Audit events, anomaly checks and last_login are flushed explicitly; a background thread
+    # writing through its own connection would race the test transaction
+    with override_settings(AUDIT_BACKGROUND=False, ANOMALY_BACKGROUND=False, LAST_LOGIN_BACKGROUND=False):
+        yield
+    from users.buffers import discard_all
+    from users import anomaly, audit, mail_queue
+    discard_all()
+    mail_queue.discard()
+    audit.discard()
+    anomaly.discard()
@@ -0,0 +1,78 @@
+"""Gunicorn configuration (loaded automatically from the working directory).
+
+GUNICORN_PROFILE picks worker settings for the workload:
+
+  cpu     sync workers, one per core. Password hashing dominates (login,
+          register, reset), and extra threads would only fight over the GIL.
+  io      gthread workers with many threads. Token refresh, /me, sessions and
+          other Redis/DB-bound routes that mostly wait on the network.
+  mixed   gthread workers with a few threads (default). Hashing requests keep
+          a core busy while the other threads serve I/O-bound ones.
+  asgi    uvicorn workers running auth_service.asgi. The views are sync, so
+          this is mainly for comparison (benchmarks/gunicorn_profiles.py).
+
+WEB_CONCURRENCY, GUNICORN_THREADS, GUNICORN_TIMEOUT, GUNICORN_MAX_REQUESTS and
+GUNICORN_KEEPALIVE override the profile. The app is preloaded in the master
+(GUNICORN_PRELOAD=False turns that off), and workers are recycled after
+max_requests plus jitter so slow leaks and fragmentation stay bounded.
+"""
+import os
+import multiprocessing
+
+cores = multiprocessing.cpu_count()
+
+PROFILES = {
+    "cpu": {"worker_class": "sync", "workers": cores, "threads": 1},
+    "io": {"worker_class": "gthread", "workers": cores, "threads": 16},
+    "mixed": {"worker_class": "gthread", "workers": cores + 1, "threads": 4},
+    "asgi": {"worker_class": "uvicorn.workers.UvicornWorker", "workers": cores, "threads": 1},
+}
+
+profile_name = os.getenv("GUNICORN_PROFILE", "mixed")
+if profile_name not in PROFILES:
+    raise RuntimeError(f"GUNICORN_PROFILE must be one of {', '.join(PROFILES)}, not {profile_name!r}")
+profile = PROFILES[profile_name]
+
+wsgi_app = "auth_service.asgi:application" if profile_name == "asgi" else "auth_service.wsgi:application"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+worker_class = profile["worker_class"]
+workers = int(os.getenv("WEB_CONCURRENCY") or profile["workers"])
+threads = int(os.getenv("GUNICORN_THREADS") or profile["threads"])
+
+# One slow hash never takes 30s; a worker that does is stuck
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", 30))
+# Idle keep-alive for connections from the proxy; raise it above the load
+# balancer's idle timeout when gunicorn faces the load balancer directly
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", max_requests // 10))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+# Heartbeat files on tmpfs; a disk-backed /tmp in containers can stall workers
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+forwarded_allow_ips = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+
+def pre_fork(server, worker):
+    if preload_app:
+        from auth_service.prefork import before_fork
+        before_fork()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from auth_service.prefork import after_fork
+        after_fork()
+
+
+def worker_exit(server, worker):
+    # Write out buffered last_login / session last-seen and queued mail
+    from users.buffers import flush_all
+    flush_all()
+
+
+def child_exit(server, worker):
+    from auth_service.metrics import mark_worker_dead
+    mark_worker_dead(worker.pid)
@@ -3,13 +3,39 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.admin import UserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from .models import AuditEvent, Tenant
+
 User = get_user_model()
 
+
+@admin.register(Tenant)
+class TenantAdmin(admin.ModelAdmin):
+    list_display = ('slug', 'name', 'domain', 'is_active', 'rate_limit_per_minute')
+    list_filter = ('is_active',)
+    search_fields = ('slug', 'name', 'domain')
+    ordering = ('slug',)
+
+
+@admin.register(AuditEvent)
+class AuditEventAdmin(admin.ModelAdmin):
+    # Append-only log: events are written by users.audit, never edited here
+    list_display = ('created_at', 'event', 'tenant', 'email', 'user_id', 'ip')
+    # No filters or search: each would scan the whole table (use the API to
+    # page through one user's events)
+    ordering = ('-created_at', '-id')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     # Fields for editing existing users
     fieldsets = (
-        (None, {'fields': ('email', 'password')}),
+        (None, {'fields': ('tenant', 'email', 'password')}),
         (_('Personal info'), {'fields': ('full_name',)}),
         (_('Permissions'), {
             'fields': ('is_active', 'is_staff', 'is_superuser', 'groups', 'user_permissions'),
@@ -21,13 +47,13 @@ class CustomUserAdmin(UserAdmin):
     add_fieldsets = (
         (None, {
             'classes': ('wide',),
-            'fields': ('email', 'full_name', 'password1', 'password2'),
+            'fields': ('tenant', 'email', 'full_name', 'password1', 'password2'),
         }),
     )
     
     # Display fields in list view
-    list_display = ('email', 'full_name', 'is_staff', 'is_active')
-    list_filter = ('is_staff', 'is_superuser', 'is_active', 'groups')
+    list_display = ('email', 'tenant', 'full_name', 'is_staff', 'is_active')
+    list_filter = ('tenant', 'is_staff', 'is_superuser', 'is_active', 'groups')
     
     # Search fields
     search_fields = ('email', 'full_name')
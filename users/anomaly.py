@@ -0,0 +1,393 @@
+"""Login anomaly detection on compact per-user profiles.
+
+``observe()`` is all a login pays for: it extracts the login's features
+(network prefix, device fingerprint, country, coordinates) into a small
+record and appends it to a per-worker queue. A daemon thread, started lazily
+like the mail and audit flushers, evaluates each login against the user's
+profile, updates the profile and applies the resulting actions.
+
+A profile is one fixed-size record per user (``PROFILE``, about 100 bytes
+in the KV store under ``loginprof:<user id>``, per tenant): the last login's
+time and coordinates, then most-recent-first slots of hashed /24 (IPv4) or
+/48 (IPv6) prefixes, user-agent fingerprints (the UA with version numbers
+stripped, so browser updates are not new devices) and countries. Evaluating
+a login is a fixed number of slot comparisons; updating moves the hit to the
+front or evicts the oldest slot, so profiles never grow. Two workers
+updating one user's profile at the same moment can lose one of the updates,
+which only means one login is learnt twice.
+
+Rules, each adding ``ANOMALY_WEIGHTS[rule]`` to the login's score:
+
+* ``new_network``: the IP prefix is not among the recent ones.
+* ``new_device``: the device fingerprint is not among the recent ones.
+* ``new_country``: the country is not among the recent ones.
+* ``impossible_travel``: reaching this location from the last one since the
+  last login would need more than ``ANOMALY_MAX_TRAVEL_KMH``.
+
+The first ``ANOMALY_LEARNING_LOGINS`` logins only train the profile. A score
+of ``ANOMALY_ALERT_SCORE`` records a ``login_anomaly`` audit event and mails
+the user; a password login scoring ``ANOMALY_STEP_UP_SCORE`` also loses the
+session it just started, and the next password login needs a sign-in code
+(magic link or OTP) first. Such a login is not learnt; the sign-in code
+login that follows is.
+
+Country and coordinates come from headers set by the edge (Cloudflare's
+``CF-IPCountry``, CloudFront's viewer headers, ...; see ``ANOMALY_*_HEADER``).
+Without them the country and travel rules never fire.
+"""
+import math
+import re
+import time
+import base64
+import struct
+import hashlib
+import logging
+import threading
+import ipaddress
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+
+from .kvstore import get_store, writer
+from .tenants import current_tenant, scoped, use_tenant
+
+logger = logging.getLogger(__name__)
+
+PROFILE_PREFIX = "loginprof:"
+STEP_UP_PREFIX = "stepup:"
+NETWORK_SLOTS = 8
+DEVICE_SLOTS = 4
+COUNTRY_SLOTS = 4
+# version, logins seen, last login (epoch), last latitude/longitude (NaN:
+# unknown), network and device hashes, countries (2 letters each)
+PROFILE = struct.Struct(f"<BxHdff{NETWORK_SLOTS}I{DEVICE_SLOTS}I{COUNTRY_SLOTS * 2}s")
+PROFILE_VERSION = 1
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_WEIGHTS = {"new_network": 1, "new_device": 1, "new_country": 2, "impossible_travel": 3}
+
+_VERSION_DIGITS = re.compile(r"[\d._]+")
+
+_queue = None
+_queue_lock = threading.Lock()
+_wakeup = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+dropped = 0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _get_queue() -> deque:
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                _queue = deque(maxlen=_setting("ANOMALY_QUEUE_SIZE", 10000))
+    return _queue
+
+
+@dataclass
+class Login:
+    """What the engine needs to know about one successful login."""
+    user_id: int
+    email: str
+    tenant: str
+    at: float
+    network: int
+    device: int
+    country: str = ""
+    latitude: float = math.nan
+    longitude: float = math.nan
+    ip: str = ""
+    method: str = "password"
+    session_id: str | None = None
+
+
+@dataclass
+class Profile:
+    logins: int = 0
+    last_at: float = 0.0
+    latitude: float = math.nan
+    longitude: float = math.nan
+    networks: list = field(default_factory=lambda: [0] * NETWORK_SLOTS)
+    devices: list = field(default_factory=lambda: [0] * DEVICE_SLOTS)
+    countries: list = field(default_factory=lambda: [""] * COUNTRY_SLOTS)
+
+    def pack(self) -> str:
+        countries = "".join(country.ljust(2)[:2] for country in self.countries).encode("ascii")
+        raw = PROFILE.pack(
+            PROFILE_VERSION, min(self.logins, 0xFFFF), self.last_at, self.latitude, self.longitude,
+            *self.networks, *self.devices, countries,
+        )
+        return base64.b64encode(raw).decode("ascii")
+
+    @classmethod
+    def unpack(cls, value: str | None) -> "Profile":
+        if not value:
+            return cls()
+        try:
+            fields = PROFILE.unpack(base64.b64decode(value))
+        except (ValueError, struct.error):
+            return cls()  # corrupt or from another layout: start over
+        if fields[0] != PROFILE_VERSION:
+            return cls()
+        networks = list(fields[5:5 + NETWORK_SLOTS])
+        devices = list(fields[5 + NETWORK_SLOTS:5 + NETWORK_SLOTS + DEVICE_SLOTS])
+        countries = fields[-1].decode("ascii")
+        return cls(
+            logins=fields[1], last_at=fields[2], latitude=fields[3], longitude=fields[4],
+            networks=networks, devices=devices,
+            countries=[countries[i:i + 2].strip() for i in range(0, COUNTRY_SLOTS * 2, 2)],
+        )
+
+
+# ----------------------
+# Features
+# ----------------------
+def _hash32(value: str) -> int:
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little") or 1
+
+
+def network_hash(ip: str) -> int:
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return 0
+    prefix = 24 if address.version == 4 else 48
+    return _hash32(str(ipaddress.ip_network(f"{address}/{prefix}", strict=False)))
+
+
+def device_hash(user_agent: str) -> int:
+    return _hash32(_VERSION_DIGITS.sub("", user_agent)) if user_agent else 0
+
+
+def _float_header(request, name: str) -> float:
+    try:
+        return float(request.META.get(name) or "nan")
+    except ValueError:
+        return math.nan
+
+
+def login_from_request(user, request, method: str = "password", session_id: str | None = None) -> Login:
+    from .sessions import client_ip
+
+    ip = client_ip(request)
+    latitude = _float_header(request, _setting("ANOMALY_LATITUDE_HEADER", "HTTP_CLOUDFRONT_VIEWER_LATITUDE"))
+    longitude = _float_header(request, _setting("ANOMALY_LONGITUDE_HEADER", "HTTP_CLOUDFRONT_VIEWER_LONGITUDE"))
+    if math.isnan(latitude) or math.isnan(longitude):
+        latitude = longitude = math.nan
+    country = request.META.get(_setting("ANOMALY_COUNTRY_HEADER", "HTTP_CF_IPCOUNTRY"), "").upper()
+    # XX and T1 are Cloudflare's unknown and Tor
+    if not (len(country) == 2 and country.isascii() and country.isalpha()) or country in ("XX", "T1"):
+        country = ""
+    return Login(
+        user_id=user.pk,
+        email=user.email,
+        tenant=current_tenant(),
+        at=time.time(),
+        network=network_hash(ip),
+        device=device_hash(request.META.get("HTTP_USER_AGENT", "")),
+        country=country,
+        latitude=latitude,
+        longitude=longitude,
+        ip=ip,
+        method=method,
+        session_id=session_id,
+    )
+
+
+# ----------------------
+# Rules
+# ----------------------
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(1.0, a)))
+
+
+def evaluate(profile: Profile, login: Login) -> list[str]:
+    """Names of the rules ``login`` breaks against ``profile``."""
+    if profile.logins < _setting("ANOMALY_LEARNING_LOGINS", 3):
+        return []
+    rules = []
+    if login.network and login.network not in profile.networks:
+        rules.append("new_network")
+    if login.device and login.device not in profile.devices:
+        rules.append("new_device")
+    if login.country and any(profile.countries) and login.country not in profile.countries:
+        rules.append("new_country")
+    if not (math.isnan(login.latitude) or math.isnan(profile.latitude)):
+        km = distance_km(profile.latitude, profile.longitude, login.latitude, login.longitude)
+        hours = max(login.at - profile.last_at, 60) / 3600
+        # Geolocation is coarse; nearby hops are never "impossible"
+        if km > _setting("ANOMALY_MIN_TRAVEL_KM", 500) and km / hours > _setting("ANOMALY_MAX_TRAVEL_KMH", 1000):
+            rules.append("impossible_travel")
+    return rules
+
+
+def score(rules: list[str]) -> int:
+    weights = _setting("ANOMALY_WEIGHTS", DEFAULT_WEIGHTS)
+    return sum(weights.get(rule, 0) for rule in rules)
+
+
+def _remember(slots: list, value):
+    """Move ``value`` to the front, evicting the oldest slot if it is new."""
+    if not value:
+        return
+    if value in slots:
+        slots.remove(value)
+    else:
+        slots.pop()
+    slots.insert(0, value)
+
+
+def learn(profile: Profile, login: Login):
+    profile.logins += 1
+    profile.last_at = login.at
+    if not math.isnan(login.latitude):
+        profile.latitude, profile.longitude = login.latitude, login.longitude
+    _remember(profile.networks, login.network)
+    _remember(profile.devices, login.device)
+    _remember(profile.countries, login.country)
+
+
+# ----------------------
+# Engine
+# ----------------------
+def _profile_key(user_id) -> str:
+    return scoped(f"{PROFILE_PREFIX}{user_id}")
+
+
+def _step_up_key(user_id) -> str:
+    return scoped(f"{STEP_UP_PREFIX}{user_id}")
+
+
+def process(login: Login) -> tuple[list[str], int]:
+    """Evaluate one login, update the profile and act; returns ``(rules, score)``."""
+    with use_tenant(login.tenant):
+        store = get_store()
+        key = _profile_key(login.user_id)
+        profile = Profile.unpack(store.get(key))
+        rules = evaluate(profile, login)
+        total = score(rules)
+        step_up = login.method == "password" and total >= _setting("ANOMALY_STEP_UP_SCORE", 4)
+        # A login that needs step-up may be an attacker; learning it would
+        # make the owner's next login look like the anomaly
+        if not step_up:
+            learn(profile, login)
+            store.set(key, profile.pack(), ttl=_setting("ANOMALY_PROFILE_TTL_SECONDS", 180 * 86400))
+        if rules and total >= _setting("ANOMALY_ALERT_SCORE", 2):
+            _act(login, rules, total, step_up)
+    return rules, total
+
+
+def _act(login: Login, rules: list[str], total: int, step_up: bool):
+    from . import audit, mail_queue
+    from .sessions import revoke_session
+
+    logger.warning(f"Login anomaly for user {login.user_id} ({', '.join(rules)}, score {total})")
+    audit.record(
+        audit.LOGIN_ANOMALY, email=login.email, user_id=login.user_id, ip=login.ip,
+        rules=rules, score=total, step_up=step_up, country=login.country, method=login.method,
+    )
+    if step_up:
+        if login.session_id:
+            # Authentication checks the family, so this also cuts off the
+            # access token the suspected attacker already received
+            revoke_session(login.user_id, login.session_id)
+        get_store().set(_step_up_key(login.user_id), "1", ttl=_setting("ANOMALY_STEP_UP_SECONDS", 86400))
+    mail_queue.enqueue(
+        _('New sign-in to your account'),
+        _('We noticed a sign-in from a new location or device ({}). If this was not you, '
+          'reset your password.').format(login.country or login.ip or _('unknown location')),
+        [login.email],
+    )
+
+
+def observe(login: Login):
+    """Queue a login for evaluation; never blocks on the store or raises.
+
+    With ``ANOMALY_QUEUE_SIZE`` logins waiting (worker or store stalled) the
+    oldest are dropped unchecked, and counted, rather than growing memory.
+    """
+    global dropped
+    if not _setting("ANOMALY_DETECTION", True):
+        return
+    queue = _get_queue()
+    if len(queue) == queue.maxlen:
+        dropped += 1  # the append below evicts the oldest login
+        if dropped % 1000 == 1:
+            logger.warning(f"Anomaly queue full, {dropped} logins dropped unchecked so far")
+    queue.append(login)
+    if _setting("ANOMALY_BACKGROUND", True):
+        _ensure_worker()
+        _wakeup.set()
+
+
+def drain() -> int:
+    """Process every queued login in this thread; returns how many."""
+    processed = 0
+    queue = _get_queue()
+    while queue:
+        try:
+            login = queue.popleft()
+        except IndexError:
+            break
+        try:
+            process(login)
+        except Exception as e:
+            logger.error(f"Anomaly check for user {login.user_id} failed: {e}")
+        processed += 1
+    return processed
+
+
+def discard():
+    """Drop queued logins without evaluating them (tests, forked children)."""
+    if _queue is not None:
+        _queue.clear()
+
+
+def _run_worker():
+    while True:
+        _wakeup.wait(_setting("ANOMALY_FLUSH_SECONDS", 1))
+        _wakeup.clear()
+        if _setting("ANOMALY_BACKGROUND", True):
+            drain()
+
+
+def _ensure_worker():
+    global _worker
+    if _worker is not None and _worker.is_alive():
+        return
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name="anomaly-worker", daemon=True)
+            _worker.start()
+
+
+# ----------------------
+# Step-up
+# ----------------------
+def step_up_required(user_id) -> bool:
+    """Whether the next password login must be preceded by a sign-in code."""
+    if not _setting("ANOMALY_DETECTION", True):
+        return False
+    try:
+        return get_store().exists(_step_up_key(user_id))
+    except Exception as e:
+        logger.error(f"Step-up check failed for user {user_id}: {e}")
+        return False  # fail open; the anomaly was already alerted
+
+
+def clear_step_up(user_id):
+    """The user proved mailbox ownership (magic link, sign-in code, reset)."""
+    try:
+        writer(get_store()).delete(_step_up_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to clear step-up for user {user_id}: {e}")
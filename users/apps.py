@@ -9,5 +9,5 @@ class UsersConfig(AppConfig):
 
     def ready(self):
         """App is ready. DO NOT put database operations here."""
-        # EMPTY - no database operations during startup
-        pass
\ No newline at end of file
+        # Signal receivers only - no database operations during startup
+        from . import signals  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,335 @@
+"""Security audit events.
+
+``record()`` appends an event to a bounded in-process ring buffer and returns;
+the request never waits on the database. Each worker runs a daemon flusher
+thread (``AUDIT_BACKGROUND``), started lazily on the first event so it exists
+in the forked worker, not the gunicorn master. It writes the buffer with one
+``bulk_create`` per ``AUDIT_BATCH_SIZE`` events, every ``AUDIT_FLUSH_SECONDS``
+or as soon as a batch is full, and once more at worker exit. While the
+database is unreachable events stay buffered and are retried; past
+``AUDIT_BUFFER_SIZE`` the oldest are dropped (and counted) rather than
+blocking or growing without bound.
+
+On PostgreSQL ``users_auditevent`` is range-partitioned by month on
+``created_at``: retention drops whole partitions instead of deleting rows, and
+``query()`` pages newest-first with a keyset on ``(created_at, id)`` that the
+``(user_id|tenant, created_at, id)`` indexes serve directly.
+``manage.py audit_events maintain`` creates upcoming partitions and applies
+``AUDIT_RETENTION_DAYS``.
+"""
+import base64
+import logging
+import threading
+from collections import deque
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .buffers import register_flush_hook
+from .models import AuditEvent
+from .sessions import client_ip
+from .tenants import current_tenant
+
+logger = logging.getLogger(__name__)
+
+REGISTERED = "registered"
+LOGIN_SUCCEEDED = "login_succeeded"
+LOGIN_FAILED = "login_failed"
+LOGIN_LOCKED = "login_locked"
+RESET_REQUESTED = "reset_requested"
+RESET_COMPLETED = "reset_completed"
+EMAIL_VERIFIED = "email_verified"
+SESSIONS_REVOKED = "sessions_revoked"
+LOGIN_ANOMALY = "login_anomaly"
+
+TABLE = "users_auditevent"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+_buffer = None
+_buffer_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+dropped = 0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _get_buffer() -> deque:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = deque(maxlen=_setting("AUDIT_BUFFER_SIZE", 10000))
+    return _buffer
+
+
+def record(event: str, request=None, user=None, email: str = "", user_id=None, ip=None, **metadata):
+    """Buffer one event; never touches the database or raises.
+
+    ``user_id`` and ``ip`` stand in for ``user`` and ``request`` when the
+    event is recorded away from the request (background threads).
+    """
+    global dropped
+    try:
+        entry = {
+            "created_at": timezone.now(),
+            "event": event,
+            "tenant": current_tenant(),
+            "user_id": getattr(user, "pk", user_id),
+            "email": email or getattr(user, "email", ""),
+            "ip": (client_ip(request) if request is not None else ip) or None,
+            "metadata": metadata,
+        }
+        buffer = _get_buffer()
+        if len(buffer) == buffer.maxlen:
+            dropped += 1  # the append below evicts the oldest event
+            if dropped % 1000 == 1:
+                logger.warning(f"Audit buffer full, {dropped} events dropped so far")
+        buffer.append(entry)
+    except Exception as e:
+        logger.error(f"Failed to record audit event {event}: {e}")
+        return
+    if _setting("AUDIT_BACKGROUND", True):
+        _ensure_flusher()
+        if len(buffer) >= _setting("AUDIT_BATCH_SIZE", 500):
+            _wakeup.set()
+
+
+def _pop_batch(buffer: deque, size: int) -> list[dict]:
+    batch = []
+    while buffer and len(batch) < size:
+        try:
+            batch.append(buffer.popleft())
+        except IndexError:
+            break
+    return batch
+
+
+def flush() -> int:
+    """Write everything buffered, batch by batch; returns how many were stored."""
+    buffer = _get_buffer()
+    size = _setting("AUDIT_BATCH_SIZE", 500)
+    written = 0
+    with _flush_lock:
+        while buffer:
+            batch = _pop_batch(buffer, size)
+            try:
+                AuditEvent.objects.bulk_create([AuditEvent(**entry) for entry in batch])
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} audit events, keeping them buffered: {e}")
+                # Back at the front in order; if new events filled the buffer
+                # meanwhile, the oldest of the batch are the ones given up
+                room = buffer.maxlen - len(buffer)
+                buffer.extendleft(reversed(batch[max(len(batch) - room, 0):]))
+                raise
+            written += len(batch)
+    return written
+
+
+def discard():
+    """Drop buffered events without writing them (tests, forked children)."""
+    _get_buffer().clear()
+
+
+@register_flush_hook
+def _flush_on_exit():
+    flush()
+
+
+def _run_flusher():
+    interval = _setting("AUDIT_FLUSH_SECONDS", 2)
+    while True:
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        if not _setting("AUDIT_BACKGROUND", True):
+            continue
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            _wakeup.wait(interval * 5)  # back off while the database is down
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, name="audit-flusher", daemon=True)
+            _flusher.start()
+
+
+# ----------------------
+# Queries
+# ----------------------
+def encode_cursor(event: AuditEvent) -> str:
+    raw = f"{event.created_at.isoformat()}|{event.pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """``(created_at, id)`` of the last event on the previous page; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, event_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(event_id)
+    except ValueError as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def query(user_id=None, tenant=None, since=None, until=None, cursor=None, limit=50):
+    """One page of events, newest first, and the cursor for the next page (or None).
+
+    ``since``/``until`` bound ``created_at`` (and let PostgreSQL prune
+    partitions); ``cursor`` continues after the previous page without an
+    OFFSET scan.
+    """
+    queryset = AuditEvent.objects.filter(tenant=tenant or current_tenant())
+    if user_id is not None:
+        queryset = queryset.filter(user_id=user_id)
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id)
+        )
+    page = list(queryset.order_by("-created_at", "-id")[:limit + 1])
+    if len(page) > limit:
+        return page[:limit], encode_cursor(page[limit - 1])
+    return page, None
+
+
+# ----------------------
+# Partitions (PostgreSQL)
+# ----------------------
+def _month(day: date, offset: int = 0) -> date:
+    years, month = divmod(day.month - 1 + offset, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_{month:%Y%m}"
+
+
+def is_partitioned(connection) -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def convert_to_partitioned(connection):
+    """Recreate the freshly created (empty) table as a monthly-partitioned one.
+
+    A partitioned table's primary key must contain the partition key, so it
+    becomes ``(id, created_at)`` and ``id`` draws from a plain sequence.
+    Indexes created on the parent afterwards cascade to every partition.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {TABLE}_plain")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {TABLE}_plain INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute(f"DROP TABLE {TABLE}_plain")
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)")
+        # Catches events outside the monthly partitions (clock skew, a missed
+        # maintenance run) so inserts never fail
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+
+def ensure_partitions(connection, months_ahead: int, today: date | None = None) -> list[str]:
+    """Create the partitions from this month to ``months_ahead`` months out; returns the new ones.
+
+    If maintenance missed the start of a month, that month's events are in
+    the default partition, and PostgreSQL refuses to create a partition that
+    would own them. They are then moved into the new partition, which is
+    attached once the default partition no longer holds them.
+    """
+    first = _month(today or timezone.now().date())
+    created = []
+    with connection.cursor() as cursor:
+        for offset in range(months_ahead + 1):
+            low, high = _month(first, offset), _month(first, offset + 1)
+            name = partition_name(low)
+            cursor.execute("SELECT to_regclass(%s)", [name])
+            if cursor.fetchone()[0] is not None:
+                continue
+            bounds = f"FROM ('{low.isoformat()} 00:00+00') TO ('{high.isoformat()} 00:00+00')"
+            in_month = f"created_at >= '{low.isoformat()} 00:00+00' AND created_at < '{high.isoformat()} 00:00+00'"
+            cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_month})")
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES {bounds}")
+            else:
+                with transaction.atomic(using=connection.alias):
+                    cursor.execute(f"CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS)")
+                    cursor.execute(
+                        f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE {in_month} RETURNING *) "
+                        f"INSERT INTO {name} SELECT * FROM moved"
+                    )
+                    moved = cursor.rowcount
+                    # Builds the parent's indexes on the new partition
+                    cursor.execute(f"ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES {bounds}")
+                logger.warning(f"Moved {moved} audit events from {DEFAULT_PARTITION} into {name}")
+            created.append(name)
+    return created
+
+
+def partition_status(connection):
+    """``[(partition, bounds, approximate_rows)]`` for the audit table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            [TABLE],
+        )
+        return cursor.fetchall()
+
+
+def drop_expired(connection, cutoff: datetime) -> tuple[list[str], int]:
+    """Remove events older than ``cutoff``.
+
+    Monthly partitions that end before the cutoff are dropped outright; the
+    rest (the straddling month, the default partition, or the whole table when
+    it is not partitioned) is trimmed with a DELETE. Returns the dropped
+    partitions and the number of deleted rows.
+    """
+    dropped_partitions = []
+    if is_partitioned(connection):
+        with connection.cursor() as cursor:
+            for name, _, _ in partition_status(connection):
+                suffix = name[len(TABLE) + 1:]
+                if not suffix.isdigit():
+                    continue
+                month = date(int(suffix[:4]), int(suffix[4:]), 1)
+                if datetime.combine(_month(month, 1), datetime.min.time(), tzinfo=cutoff.tzinfo) <= cutoff:
+                    cursor.execute(f"DROP TABLE {name}")
+                    dropped_partitions.append(name)
+    deleted, _ = AuditEvent.objects.using(connection.alias).filter(created_at__lt=cutoff).delete()
+    return dropped_partitions, deleted
+
+
+def retention_cutoff(days: int | None = None) -> datetime:
+    return timezone.now() - timedelta(days=days if days is not None else _setting("AUDIT_RETENTION_DAYS", 365))
@@ -0,0 +1,67 @@
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from auth_service.db_router import read_your_writes
+from .sessions import touch
+from .tenants import TENANT_CLAIM, current_tenant, default_tenant
+from .token_families import FAMILY_CLAIM, family_active
+
+
+class ReplicaAwareJWTAuthentication(JWTAuthentication):
+    """JWT authentication whose user fetch honours read-your-writes stickiness.
+
+    Also records activity on the token's session for the sessions list, and
+    rejects tokens issued in another tenant (tokens from before tenants
+    existed count as the default tenant's) and tokens of revoked sessions, so
+    logging out takes effect before the access token expires.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            user, token = result
+            if token.get(TENANT_CLAIM, default_tenant()) != current_tenant():
+                raise AuthenticationFailed(_("Token belongs to another tenant"), code="wrong_tenant")
+            family_id = token.get(FAMILY_CLAIM)
+            if family_id:
+                if not family_active(family_id):
+                    raise AuthenticationFailed(_("Session has been revoked"), code="session_revoked")
+                # From the token, so a lazily loaded user stays unloaded
+                touch(token[api_settings.USER_ID_CLAIM], family_id)
+        return result
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        with read_your_writes(f"user:{user_id}"):
+            return super().get_user(validated_token)
+
+
+class LazyUserJWTAuthentication(ReplicaAwareJWTAuthentication):
+    """Validate the token now, load the user only when ``request.user`` is used.
+
+    For views that can answer from the token alone (``/me`` revalidation).
+    Pair it with ``permissions.HasValidToken``; ``IsAuthenticated`` would load
+    the user to check it. A deleted or deactivated user fails with a 401 when
+    the view first touches ``request.user``.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        parent = super()
+        return SimpleLazyObject(lambda: parent.get_user(validated_token))
+
+
+class ReplicaAwareJWTScheme(SimpleJWTScheme):
+    """Document the subclass as the same bearer JWT scheme in the API schema."""
+    target_class = 'users.authentication.ReplicaAwareJWTAuthentication'
+
+
+class LazyUserJWTScheme(SimpleJWTScheme):
+    """Same bearer JWT, under its own name: schema components need one class per name."""
+    target_class = 'users.authentication.LazyUserJWTAuthentication'
+    name = 'jwtAuthLazyUser'
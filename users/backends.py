@@ -0,0 +1,18 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import tenants
+
+
+class TenantModelBackend(ModelBackend):
+    """ModelBackend for emails that are unique per tenant, not globally.
+
+    ``UserManager.get_by_natural_key`` already looks the email up in the
+    current tenant; session-based auth (the admin) additionally refuses a
+    session whose user belongs to another tenant.
+    """
+
+    def get_user(self, user_id):
+        user = super().get_user(user_id)
+        if user is not None and user.tenant != tenants.current_tenant():
+            return None
+        return user
@@ -0,0 +1,93 @@
+import time
+import atexit
+import logging
+import threading
+import weakref
+
+logger = logging.getLogger(__name__)
+
+_buffers = weakref.WeakSet()
+_flush_hooks = []
+
+
+class WriteBehindBuffer:
+    """Coalesce frequent writes in process memory and flush them in batches.
+
+    ``add(key, value)`` keeps only the latest value per key. The pending batch
+    is handed to ``flush_func(dict)`` once ``interval`` seconds have passed or
+    ``max_size`` keys are pending, whichever comes first, and once more when the
+    process exits. A batch that fails to write is merged back (newer values
+    win) and retried on the next flush. Entries still pending when a worker is
+    killed hard are lost, so use it for data that tolerates that or back it
+    with something durable.
+    """
+
+    def __init__(self, name: str, flush_func, interval: float = 30.0, max_size: int = 1000):
+        self.name = name
+        self.flush_func = flush_func
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        _buffers.add(self)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+            due = (
+                len(self._pending) >= self.max_size
+                or time.monotonic() - self._last_flush >= self.interval
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> int:
+        """Write out everything pending; returns the number of keys flushed."""
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+        try:
+            self.flush_func(batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {self.name} buffer ({len(batch)} entries): {e}")
+            with self._lock:
+                self._pending = {**batch, **self._pending}
+            return 0
+        return len(batch)
+
+    def discard(self):
+        """Drop pending entries without writing them (tests, forked children)."""
+        with self._lock:
+            self._pending = {}
+
+
+def discard_all():
+    """Drop everything pending in every buffer (tests)."""
+    for buffer in list(_buffers):
+        buffer.discard()
+
+
+def register_flush_hook(func):
+    """Run ``func()`` from ``flush_all`` too (stores that drain elsewhere)."""
+    _flush_hooks.append(func)
+    return func
+
+
+def flush_all():
+    """Flush every live buffer and hook (atexit, gunicorn ``worker_exit``)."""
+    for buffer in list(_buffers):
+        buffer.flush()
+    for func in _flush_hooks:
+        try:
+            func()
+        except Exception as e:
+            logger.error(f"Flush hook {func.__name__} failed: {e}")
+
+
+atexit.register(flush_all)
@@ -0,0 +1,136 @@
+import hmac
+import json
+import hashlib
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.response import Response
+
+from .kvstore import get_store
+from .tenants import scoped
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# Idempotency keys
+# ----------------------
+# A request carrying ``Idempotency-Key`` claims idem:<scope>:<key hash> with a
+# short in-progress marker (SET NX). When the view finishes, the marker is
+# replaced by the response (status + data) for IDEMPOTENCY_TTL_SECONDS. A
+# retry with the same key and body gets that response back without running
+# validation, hashing or the insert again. The same key with a different body
+# is rejected (422); a retry while the first attempt still runs gets 409.
+# Server errors are not stored, so those retries execute again.
+HEADER = "Idempotency-Key"
+PREFIX = "idem:"
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = "in_progress"
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def _store_key(scope: str, key: str) -> str:
+    return scoped(f"{PREFIX}{scope}:{hashlib.sha256(key.encode('utf-8')).hexdigest()}")
+
+
+def _fingerprint(request) -> str:
+    # Keyed: bodies carry plaintext passwords, and an unsalted digest kept in
+    # the store for a day could be brute-forced by anyone who can read it
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder, default=str)
+    message = f"{request.method}:{request.path}:{body}".encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def _claim(store_key: str, marker: str, ttl: int) -> bool:
+    return get_store().add(store_key, marker, ttl=ttl)
+
+
+def _load(store_key: str):
+    raw = get_store().get(store_key)
+    return json.loads(raw) if raw else None
+
+
+def _save(store_key: str, record: dict, ttl: int):
+    get_store().set(store_key, json.dumps(record, cls=DjangoJSONEncoder), ttl=ttl)
+
+
+def _release(store_key: str):
+    get_store().delete(store_key)
+
+
+def _replay(record: dict, fingerprint: str):
+    if record["fingerprint"] != fingerprint:
+        return Response(
+            {'detail': _('Idempotency-Key was already used with a different request')},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record["state"] == IN_PROGRESS:
+        return Response(
+            {'detail': _('A request with this Idempotency-Key is still being processed')},
+            status=status.HTTP_409_CONFLICT,
+            headers={'Retry-After': '1'},
+        )
+    return Response(record["data"], status=record["status"], headers={REPLAY_HEADER: 'true'})
+
+
+def idempotent(scope: str):
+    """Deduplicate retries of a DRF function view by ``Idempotency-Key``.
+
+    Place it directly above the view function (below ``@api_view`` and the
+    rate limit) so retries are still rate limited.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {'detail': _('Idempotency-Key must be at most {} characters').format(MAX_KEY_LENGTH)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            store_key = _store_key(scope, key)
+            fingerprint = _fingerprint(request)
+            lock_ttl = getattr(settings, "IDEMPOTENCY_LOCK_SECONDS", 30)
+            ttl = getattr(settings, "IDEMPOTENCY_TTL_SECONDS", 86400)
+            marker = json.dumps({"state": IN_PROGRESS, "fingerprint": fingerprint})
+            try:
+                claimed = _claim(store_key, marker, lock_ttl)
+                if not claimed:
+                    record = _load(store_key)
+                    if record is not None:
+                        logger.info(f"Idempotent replay for {scope}")
+                        return _replay(record, fingerprint)
+                    claimed = _claim(store_key, marker, lock_ttl)  # expired in between
+            except Exception as e:
+                # Without the store the request simply runs un-deduplicated
+                logger.error(f"Idempotency store unavailable for {scope}: {e}")
+                return view(request, *args, **kwargs)
+            if not claimed:
+                return view(request, *args, **kwargs)
+
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                _release(store_key)
+                raise
+            try:
+                if response.status_code >= 500:
+                    _release(store_key)
+                else:
+                    _save(store_key, {
+                        "state": "done",
+                        "fingerprint": fingerprint,
+                        "status": response.status_code,
+                        "data": response.data,
+                    }, ttl)
+            except Exception as e:
+                logger.error(f"Failed to store idempotent response for {scope}: {e}")
+            return response
+        return wrapper
+    return decorator
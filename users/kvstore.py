@@ -0,0 +1,660 @@
+"""Key-value store used for tokens, counters and other short-lived state.
+
+One small interface over the places such state can live, so callers stop
+branching on ``get_redis_client()`` themselves:
+
+* ``RedisStore``: the shared Redis (atomic across workers).
+* ``CacheStore``: the Django cache, used when Redis is not configured or
+  unreachable. ``getdel`` is get-then-delete there, and only the caller
+  whose delete actually removed the key gets the value, so a token is
+  still handed out at most once.
+* ``LocalLRUStore``: a bounded in-process dict with expiry.
+* ``LayeredStore``: reads go top-down and backfill the upper layers; writes
+  and atomic operations go to the bottom (authoritative) layer. Upper layers
+  are per process, so only layer data that never changes once written (e.g.
+  blacklisted tokens) or that may be ``upper_ttl`` seconds stale.
+
+``batch()`` groups the writes of everything called inside the block into
+one pipeline per store (one round trip, optionally MULTI/EXEC); code that
+should join a batch writes through ``writer(store)``.
+
+Values are strings (``get`` never returns bytes); counters are ints. Every
+operation is timed into ``auth_kvstore_operation_seconds{backend,operation}``
+and into the request's component breakdown. Errors propagate; callers keep
+their own fail-open/fail-closed handling.
+"""
+import time
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from auth_service.metrics import KV_LATENCY, record
+
+
+def _decode(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class Deferred:
+    """Result of an operation queued in a pipeline, set by ``execute()``."""
+
+    __slots__ = ("_value", "_ready", "_source", "_func")
+
+    def __init__(self, source: "Deferred | None" = None, func=None):
+        self._ready = False
+        self._value = None
+        self._source = source
+        self._func = func
+
+    def _set(self, value):
+        self._value = value
+        self._ready = True
+
+    @property
+    def ready(self) -> bool:
+        return self._ready if self._source is None else self._source.ready
+
+    @property
+    def value(self):
+        if self._source is not None:
+            return self._func(self._source.value)
+        if not self._ready:
+            raise RuntimeError("Pipeline has not been executed yet")
+        return self._value
+
+    def map(self, func) -> "Deferred":
+        """A Deferred of ``func(value)``."""
+        return Deferred(self, func)
+
+
+def resolve(result, func):
+    """``func(result)``, or a Deferred of it when ``result`` is queued."""
+    return result.map(func) if isinstance(result, Deferred) else func(result)
+
+
+class KVStore(ABC):
+    """Base class; subclasses implement the abstract operations below."""
+
+    backend = "kv"
+    component = None  # per-request breakdown label (None: histogram only)
+
+    @contextmanager
+    def _timed(self, operation: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            KV_LATENCY.labels(self.backend, operation).observe(elapsed)
+            if self.component:
+                record(self.component, elapsed)
+
+    @abstractmethod
+    def get(self, key: str):
+        ...
+
+    @abstractmethod
+    def get_many(self, keys: list[str]) -> list:
+        """Values for ``keys`` in order (None where missing)."""
+
+    @abstractmethod
+    def set(self, key: str, value, ttl: int | None = None):
+        ...
+
+    @abstractmethod
+    def add(self, key: str, value, ttl: int | None = None) -> bool:
+        """Set only if absent; True if this call stored the value."""
+
+    @abstractmethod
+    def delete(self, *keys: str):
+        ...
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def getdel(self, key: str):
+        """Return the value and delete it, so only one caller gets it."""
+
+    @abstractmethod
+    def incr(self, key: str, ttl: int | None = None) -> int:
+        """Increment a counter; ``ttl`` starts when the counter is created."""
+
+    def pipeline(self, transaction: bool = False) -> "Pipeline":
+        return Pipeline(self)
+
+
+class Pipeline:
+    """Queue operations and run them with ``execute()``, which returns their
+    results in order. Each queued call returns a ``Deferred`` for its result.
+    Backends that support it send everything in one round trip.
+    """
+
+    def __init__(self, store: KVStore):
+        self.store = store
+        self._ops = []
+
+    def __len__(self):
+        return len(self._ops)
+
+    def _queue(self, operation, *args, **kwargs):
+        deferred = Deferred()
+        self._ops.append((operation, args, kwargs, deferred))
+        return deferred
+
+    def _take(self):
+        ops, self._ops = self._ops, []
+        return ops
+
+    def get(self, key):
+        return self._queue("get", key)
+
+    def get_many(self, keys):
+        return self._queue("get_many", keys)
+
+    def set(self, key, value, ttl=None):
+        return self._queue("set", key, value, ttl=ttl)
+
+    def add(self, key, value, ttl=None):
+        return self._queue("add", key, value, ttl=ttl)
+
+    def delete(self, *keys):
+        return self._queue("delete", *keys)
+
+    def exists(self, key):
+        return self._queue("exists", key)
+
+    def getdel(self, key):
+        return self._queue("getdel", key)
+
+    def incr(self, key, ttl=None):
+        return self._queue("incr", key, ttl=ttl)
+
+    def execute(self) -> list:
+        results = []
+        for operation, args, kwargs, deferred in self._take():
+            deferred._set(getattr(self.store, operation)(*args, **kwargs))
+            results.append(deferred._value)
+        return results
+
+
+# ----------------------
+# Redis
+# ----------------------
+class RedisStore(KVStore):
+    backend = "redis"
+    component = "redis"
+
+    def __init__(self, client):
+        self.client = client
+
+    # Each _queue_<op> adds the op's commands to a redis pipeline and returns
+    # (number of replies, function turning those replies into the result).
+    def _queue_get(self, pipe, key):
+        pipe.get(key)
+        return 1, lambda replies: _decode(replies[0])
+
+    def _queue_get_many(self, pipe, keys):
+        pipe.mget(keys)
+        return 1, lambda replies: [_decode(value) for value in replies[0]]
+
+    def _queue_set(self, pipe, key, value, ttl=None):
+        pipe.set(key, value, ex=ttl)
+        return 1, lambda replies: None
+
+    def _queue_add(self, pipe, key, value, ttl=None):
+        pipe.set(key, value, ex=ttl, nx=True)
+        return 1, lambda replies: bool(replies[0])
+
+    def _queue_delete(self, pipe, *keys):
+        pipe.delete(*keys)
+        return 1, lambda replies: None
+
+    def _queue_exists(self, pipe, key):
+        pipe.exists(key)
+        return 1, lambda replies: replies[0] == 1
+
+    def _queue_getdel(self, pipe, key):
+        pipe.getdel(key)
+        return 1, lambda replies: _decode(replies[0])
+
+    def _queue_incr(self, pipe, key, ttl=None):
+        if not ttl:
+            pipe.incr(key)
+            return 1, lambda replies: int(replies[0])
+        # Create the counter with its expiry first; INCR keeps an existing TTL
+        pipe.set(key, 0, ex=ttl, nx=True)
+        pipe.incr(key)
+        return 2, lambda replies: int(replies[1])
+
+    def get(self, key):
+        with self._timed("get"):
+            return _decode(self.client.get(key))
+
+    def get_many(self, keys):
+        with self._timed("get_many"):
+            return [_decode(value) for value in self.client.mget(keys)]
+
+    def set(self, key, value, ttl=None):
+        with self._timed("set"):
+            self.client.set(key, value, ex=ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._timed("add"):
+            return bool(self.client.set(key, value, ex=ttl, nx=True))
+
+    def delete(self, *keys):
+        with self._timed("delete"):
+            self.client.delete(*keys)
+
+    def exists(self, key):
+        with self._timed("exists"):
+            return self.client.exists(key) == 1
+
+    def getdel(self, key):
+        with self._timed("getdel"):
+            return _decode(self.client.getdel(key))
+
+    def incr(self, key, ttl=None):
+        with self._timed("incr"):
+            if not ttl:
+                return int(self.client.incr(key))
+            pipe = self.client.pipeline(transaction=False)
+            _, convert = self._queue_incr(pipe, key, ttl)
+            return convert(pipe.execute())
+
+    def pipeline(self, transaction=False):
+        return RedisPipeline(self, transaction)
+
+
+class RedisPipeline(Pipeline):
+    """Sends the queue in one round trip, wrapped in MULTI/EXEC if ``transaction``."""
+
+    def __init__(self, store: RedisStore, transaction: bool = False):
+        super().__init__(store)
+        self.transaction = transaction
+
+    def execute(self):
+        ops = self._take()
+        if not ops:
+            return []
+        pipe = self.store.client.pipeline(transaction=self.transaction)
+        plan = [
+            getattr(self.store, f"_queue_{operation}")(pipe, *args, **kwargs)
+            for operation, args, kwargs, _ in ops
+        ]
+        with self.store._timed("pipeline"):
+            replies = pipe.execute()
+        results, position = [], 0
+        for (count, convert), (_, _, _, deferred) in zip(plan, ops):
+            deferred._set(convert(replies[position:position + count]))
+            results.append(deferred._value)
+            position += count
+        return results
+
+
+# ----------------------
+# Django cache
+# ----------------------
+class CacheStore(KVStore):
+    backend = "cache"
+    component = "cache"
+
+    def __init__(self, backend=None):
+        self.cache = backend or cache
+
+    def get(self, key):
+        with self._timed("get"):
+            return self.cache.get(key)
+
+    def get_many(self, keys):
+        with self._timed("get_many"):
+            found = self.cache.get_many(keys)
+        return [found.get(key) for key in keys]
+
+    def set(self, key, value, ttl=None):
+        with self._timed("set"):
+            self.cache.set(key, value, timeout=ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._timed("add"):
+            return self.cache.add(key, value, timeout=ttl)
+
+    def delete(self, *keys):
+        with self._timed("delete"):
+            self.cache.delete_many(keys)
+
+    def exists(self, key):
+        with self._timed("exists"):
+            return self.cache.get(key) is not None
+
+    def getdel(self, key):
+        with self._timed("getdel"):
+            value = self.cache.get(key)
+            # Only the caller whose delete removed the key gets the value
+            if value is None or not self.cache.delete(key):
+                return None
+            return value
+
+    def incr(self, key, ttl=None):
+        with self._timed("incr"):
+            self.cache.add(key, 0, timeout=ttl)
+            try:
+                return self.cache.incr(key)
+            except ValueError:  # expired between add() and incr()
+                self.cache.set(key, 1, timeout=ttl)
+                return 1
+
+
+# ----------------------
+# In-process LRU
+# ----------------------
+class LocalLRUStore(KVStore):
+    backend = "local"
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()  # key -> (value, expires or None)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def _live(self, key):
+        """Entry for ``key`` (refreshing its LRU position), dropping it if expired."""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def _store(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, key):
+        with self._timed("get"), self._lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def get_many(self, keys):
+        with self._timed("get_many"), self._lock:
+            return [entry[0] if entry else None for entry in map(self._live, keys)]
+
+    def set(self, key, value, ttl=None):
+        with self._timed("set"), self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key, value, ttl=None):
+        with self._timed("add"), self._lock:
+            if self._live(key) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, *keys):
+        with self._timed("delete"), self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def exists(self, key):
+        with self._timed("exists"), self._lock:
+            return self._live(key) is not None
+
+    def getdel(self, key):
+        with self._timed("getdel"), self._lock:
+            entry = self._live(key)
+            if entry is None:
+                return None
+            del self._data[key]
+            return entry[0]
+
+    def incr(self, key, ttl=None):
+        with self._timed("incr"), self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self._store(key, 1, ttl)
+                return 1
+            value = int(entry[0]) + 1
+            self._data[key] = (value, entry[1])
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# ----------------------
+# Layers
+# ----------------------
+class LayeredStore(KVStore):
+    """Read-through stack of stores; the last one is authoritative."""
+
+    backend = "layered"
+
+    def __init__(self, *layers: KVStore, upper_ttl: int | None = 60):
+        self.layers = layers
+        self.upper_ttl = upper_ttl
+
+    @property
+    def bottom(self) -> KVStore:
+        return self.layers[-1]
+
+    def _upper_ttl(self, ttl):
+        if ttl and self.upper_ttl:
+            return min(ttl, self.upper_ttl)
+        return ttl or self.upper_ttl
+
+    def _fill(self, layers, key, value):
+        for layer in layers:
+            layer.set(key, value, ttl=self.upper_ttl)
+
+    def get(self, key):
+        for depth, layer in enumerate(self.layers):
+            value = layer.get(key)
+            if value is not None:
+                self._fill(self.layers[:depth], key, value)
+                return value
+        return None
+
+    def get_many(self, keys):
+        values = [None] * len(keys)
+        missing = list(range(len(keys)))
+        for depth, layer in enumerate(self.layers):
+            found = layer.get_many([keys[i] for i in missing])
+            for i, value in zip(missing, found):
+                if value is not None:
+                    values[i] = value
+                    self._fill(self.layers[:depth], keys[i], value)
+            missing = [i for i in missing if values[i] is None]
+            if not missing:
+                break
+        return values
+
+    def set(self, key, value, ttl=None):
+        self.bottom.set(key, value, ttl=ttl)
+        for layer in self.layers[:-1]:
+            layer.set(key, value, ttl=self._upper_ttl(ttl))
+
+    def add(self, key, value, ttl=None):
+        added = self.bottom.add(key, value, ttl=ttl)
+        if added:
+            for layer in self.layers[:-1]:
+                layer.set(key, value, ttl=self._upper_ttl(ttl))
+        return added
+
+    def delete(self, *keys):
+        self.bottom.delete(*keys)
+        for layer in self.layers[:-1]:
+            layer.delete(*keys)
+
+    def exists(self, key):
+        return self.get(key) is not None
+
+    def getdel(self, key):
+        for layer in self.layers[:-1]:
+            layer.delete(key)
+        return self.bottom.getdel(key)
+
+    def incr(self, key, ttl=None):
+        # Counters are never cached above the authoritative layer
+        for layer in self.layers[:-1]:
+            layer.delete(key)
+        return self.bottom.incr(key, ttl=ttl)
+
+    def pipeline(self, transaction=False):
+        return LayeredPipeline(self, self.bottom.pipeline(transaction))
+
+
+class LayeredPipeline(Pipeline):
+    """Queues on the bottom layer's pipeline; upper layers are updated
+    in process once it has executed (``apply()``)."""
+
+    def __init__(self, store: LayeredStore, bottom):
+        super().__init__(store)
+        self.bottom = bottom
+
+    def _queue(self, operation, *args, **kwargs):
+        deferred = getattr(self.bottom, operation)(*args, **kwargs)
+        self._ops.append((operation, args, kwargs, deferred))
+        return deferred
+
+    def apply(self):
+        for operation, args, kwargs, deferred in self._take():
+            for layer in self.store.layers[:-1]:
+                if operation == "set" or (operation == "add" and deferred.value):
+                    layer.set(args[0], args[1], ttl=self.store._upper_ttl(kwargs.get("ttl")))
+                elif operation in ("delete", "getdel", "incr"):
+                    layer.delete(*args[:len(args) if operation == "delete" else 1])
+
+    def execute(self):
+        results = self.bottom.execute()
+        self.apply()
+        return results
+
+
+# ----------------------
+# Batches
+# ----------------------
+class Batch:
+    """Pipelines opened by ``writer()`` inside one ``batch()`` block."""
+
+    def __init__(self, transaction: bool = False):
+        self.transaction = transaction
+        self._pipelines = {}  # id(store) -> (store, pipeline)
+
+    def pipeline_for(self, store: KVStore) -> Pipeline:
+        entry = self._pipelines.get(id(store))
+        if entry is None:
+            if isinstance(store, LayeredStore):
+                pipe = LayeredPipeline(store, self.pipeline_for(store.bottom))
+            else:
+                pipe = store.pipeline(self.transaction)
+            entry = self._pipelines[id(store)] = (store, pipe)
+        return entry[1]
+
+    def execute(self):
+        pipelines = [pipe for _, pipe in self._pipelines.values()]
+        for pipe in pipelines:
+            if not isinstance(pipe, LayeredPipeline):
+                pipe.execute()
+        for pipe in pipelines:
+            if isinstance(pipe, LayeredPipeline):
+                pipe.apply()
+
+
+_active_batch = contextvars.ContextVar("kvstore_batch", default=None)
+
+
+@contextmanager
+def batch(transaction: bool = False):
+    """Queue writes made through ``writer()`` and send them when the block exits.
+
+    Calls inside the block return ``Deferred`` results (read ``.value`` after
+    the block); errors are raised on exit. Nested blocks join the outer one.
+    If the block raises, nothing queued is sent.
+    """
+    current = _active_batch.get()
+    if current is not None:
+        yield current
+        return
+    current = Batch(transaction)
+    token = _active_batch.set(current)
+    try:
+        yield current
+    finally:
+        _active_batch.reset(token)
+    current.execute()
+
+
+def in_batch() -> bool:
+    """Whether writes are currently queued for an enclosing ``batch()``."""
+    return _active_batch.get() is not None
+
+
+def writer(store: KVStore):
+    """``store``, or its pipeline in the active ``batch()``."""
+    current = _active_batch.get()
+    return current.pipeline_for(store) if current is not None else store
+
+
+# ----------------------
+# Store lookup
+# ----------------------
+_lock = threading.Lock()
+_redis_store = None
+_cache_store = CacheStore()
+_local_store = None
+
+
+def get_store() -> KVStore:
+    """The shared store: Redis when reachable, else the Django cache."""
+    global _redis_store
+    from .utils import get_redis_client
+
+    client = get_redis_client()
+    if client is None:
+        return _cache_store
+    store = _redis_store
+    if store is None or store.client is not client:
+        with _lock:
+            if _redis_store is None or _redis_store.client is not client:
+                _redis_store = RedisStore(client)
+            store = _redis_store
+    return store
+
+
+def get_local_store() -> LocalLRUStore:
+    """This process's LRU (``KVSTORE_LOCAL_MAX_ENTRIES`` entries)."""
+    global _local_store
+    if _local_store is None:
+        with _lock:
+            if _local_store is None:
+                _local_store = LocalLRUStore(getattr(settings, "KVSTORE_LOCAL_MAX_ENTRIES", 10000))
+    return _local_store
+
+
+_layered_stores = {}
+
+
+def get_layered_store(upper_ttl: int | None = None) -> LayeredStore:
+    """The local LRU in front of the shared store."""
+    if upper_ttl is None:
+        upper_ttl = getattr(settings, "KVSTORE_LOCAL_TTL_SECONDS", 60)
+    shared = get_store()
+    store = _layered_stores.get((id(shared), upper_ttl))
+    if store is None or store.bottom is not shared:
+        store = LayeredStore(get_local_store(), shared, upper_ttl=upper_ttl)
+        _layered_stores[(id(shared), upper_ttl)] = store
+    return store
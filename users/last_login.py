@@ -0,0 +1,173 @@
+"""Write-behind ``last_login`` updates.
+
+Logins only record ``user id -> timestamp``; a flush writes every pending
+user in one ``UPDATE ... FROM (VALUES ...)`` statement instead of one row
+update (and row lock, and WAL record) per login.
+
+With Redis the pending entries live in one hash shared by all workers, so
+nothing is lost if a worker dies: an entry is only removed after the UPDATE
+committed, and only if no newer login overwrote it meanwhile. Without Redis
+an in-process ``WriteBehindBuffer`` is used and flushed at worker exit.
+
+Logins never write to the database themselves. A daemon thread per worker
+wakes every ``LAST_LOGIN_FLUSH_SECONDS``; with Redis, whichever worker takes
+the short flush lock drains the shared hash for that interval.
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connections, transaction
+
+from auth_service.metrics import track
+from .buffers import WriteBehindBuffer, register_flush_hook
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "last_login:pending"
+LOCK_KEY = "last_login:flush_lock"
+CHUNK_SIZE = 500
+
+# Remove a drained field only if it still holds the value that was written
+_ACK_SCRIPT = """
+local removed = 0
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        removed = removed + redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+return removed
+"""
+
+
+def _interval() -> float:
+    return getattr(settings, "LAST_LOGIN_FLUSH_SECONDS", 5)
+
+
+def write_last_logins(entries: dict, using: str = "default") -> int:
+    """Persist ``{user_id: epoch_seconds}`` in chunked bulk statements.
+
+    On PostgreSQL a row is only updated when the new value is later, so racing
+    flushers cannot move last_login backwards.
+    """
+    User = get_user_model()
+    rows = [
+        (int(user_id), datetime.fromtimestamp(float(seen), tz=timezone.utc))
+        for user_id, seen in entries.items()
+    ]
+    connection = connections[using]
+    table = connection.ops.quote_name(User._meta.db_table)
+    updated = 0
+    with track("db"), transaction.atomic(using=using):
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = rows[start:start + CHUNK_SIZE]
+            if connection.vendor == "postgresql":
+                values = ", ".join(["(%s::bigint, %s::timestamptz)"] * len(chunk))
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f"UPDATE {table} AS u SET last_login = v.last_login "
+                        f"FROM (VALUES {values}) AS v(id, last_login) "
+                        "WHERE u.id = v.id AND (u.last_login IS NULL OR u.last_login < v.last_login)",
+                        [value for row in chunk for value in row],
+                    )
+                    updated += cursor.rowcount
+            else:
+                users = [User(pk=user_id, last_login=seen) for user_id, seen in chunk]
+                updated += User.objects.using(using).bulk_update(users, ["last_login"])
+    return updated
+
+
+# Flushed by the background thread only (one entry per user, so bounded by
+# the number of users who logged in since the last flush)
+buffer = WriteBehindBuffer("last_login", write_last_logins, interval=float("inf"), max_size=float("inf"))
+_wakeup = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def record_login(user_id, when: float | None = None):
+    """Queue a last_login update for ``user_id``; never touches the database."""
+    when = time.time() if when is None else when
+    redis_client = get_redis_client()
+    if not redis_client:
+        buffer.add(user_id, when)
+    else:
+        try:
+            with track("redis"):
+                redis_client.hset(PENDING_KEY, str(user_id), repr(when))
+        except Exception as e:
+            logger.error(f"Failed to queue last_login for user {user_id}: {e}")
+            buffer.add(user_id, when)
+    if getattr(settings, "LAST_LOGIN_BACKGROUND", True):
+        _ensure_flusher()
+
+
+def drain() -> int:
+    """Write out what is pending in Redis; returns the number of users flushed."""
+    redis_client = get_redis_client()
+    if not redis_client:
+        return 0
+    with track("redis"):
+        pending = redis_client.hgetall(PENDING_KEY)
+    if not pending:
+        return 0
+    entries = {key.decode(): value.decode() for key, value in pending.items()}
+    write_last_logins(entries)
+    acks = [item for pair in entries.items() for item in pair]
+    with track("redis"):
+        redis_client.eval(_ACK_SCRIPT, 1, PENDING_KEY, *acks)
+    return len(entries)
+
+
+def flush_due() -> int:
+    """One flusher tick: this worker's buffer, and the Redis hash if this
+    worker wins the flush lock for the interval."""
+    flushed = buffer.flush()
+    redis_client = get_redis_client()
+    if redis_client:
+        with track("redis"):
+            due = redis_client.set(LOCK_KEY, 1, nx=True, ex=max(1, int(_interval())))
+        if due:
+            flushed += drain()
+    return flushed
+
+
+def _run_flusher():
+    while True:
+        _wakeup.wait(_interval())
+        _wakeup.clear()
+        if not getattr(settings, "LAST_LOGIN_BACKGROUND", True):
+            continue
+        close_old_connections()
+        try:
+            flush_due()
+        except Exception as e:
+            # Redis entries stay pending until a later drain succeeds
+            logger.error(f"Failed to flush pending last_login updates: {e}")
+        finally:
+            close_old_connections()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, name="last-login-flusher", daemon=True)
+            _flusher.start()
+
+
+@register_flush_hook
+def flush() -> int:
+    """Flush everything pending (gunicorn ``worker_exit``, tests, management command)."""
+    flushed = buffer.flush()
+    try:
+        flushed += drain()
+    except Exception as e:
+        logger.error(f"Failed to drain pending last_login updates: {e}")
+    return flushed
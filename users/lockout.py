@@ -0,0 +1,124 @@
+"""Login failure tracking and lockout.
+
+Failed logins are counted per canonical email, per client IP and globally
+per minute. Crossing a threshold locks the email or IP for an exponentially
+growing period (``base * 2**excess`` capped at ``max``). When the global
+failure rate crosses ``LOGIN_ATTACK_THRESHOLD`` the service enters "under
+attack" mode for a cooldown period and the per-email/IP thresholds tighten.
+
+``check()`` is a single MGET done before the password is hashed, so attempts
+against a locked email or IP are rejected without running PBKDF2.
+``record_failure()`` updates all counters in one pipelined round trip. The
+failure counters are fixed windows that start with the first failure.
+All counters and the attack flag are kept per tenant.
+"""
+import time
+import logging
+
+from django.conf import settings
+
+from .kvstore import get_store, writer
+from .partitioning import canonical_email
+from .tenants import scoped
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "lockout:"
+ATTACK_KEY = f"{PREFIX}attack"
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _keys(email: str, ip: str) -> dict:
+    email = canonical_email(email)
+    keys = {
+        "fail_email": f"{PREFIX}fail:email:{email}",
+        "fail_ip": f"{PREFIX}fail:ip:{ip}",
+        "until_email": f"{PREFIX}until:email:{email}",
+        "until_ip": f"{PREFIX}until:ip:{ip}",
+        "global": f"{PREFIX}global:{int(time.time() // 60)}",
+        "attack": ATTACK_KEY,
+    }
+    return {name: scoped(key) for name, key in keys.items()}
+
+
+def _lock_seconds(failures: int, threshold: int) -> int:
+    if failures < threshold:
+        return 0
+    base = _setting("LOGIN_LOCKOUT_BASE_SECONDS", 30)
+    ceiling = _setting("LOGIN_LOCKOUT_MAX_SECONDS", 3600)
+    return min(ceiling, base * 2 ** min(failures - threshold, 16))
+
+
+def _thresholds(under_attack: bool) -> tuple[int, int]:
+    email = _setting("LOGIN_EMAIL_FAILURE_THRESHOLD", 5)
+    ip = _setting("LOGIN_IP_FAILURE_THRESHOLD", 20)
+    if under_attack:
+        email = max(1, email // 2)
+        ip = max(1, ip // 4)
+    return email, ip
+
+
+def check(email: str, ip: str) -> int:
+    """Seconds until ``email``/``ip`` may try again, 0 if allowed."""
+    keys = _keys(email, ip)
+    try:
+        values = get_store().get_many([keys["until_email"], keys["until_ip"]])
+    except Exception as e:
+        logger.error(f"Login lockout check failed: {e}")
+        return 0  # fail open; django_ratelimit still applies
+    until = max(float(value) for value in values if value is not None) if any(values) else 0
+    return max(0, int(until - time.time() + 0.999))
+
+
+def _count_failure(keys: dict) -> tuple[int, int, int, bool]:
+    window = _setting("LOGIN_FAILURE_WINDOW_SECONDS", 900)
+    pipe = get_store().pipeline()
+    pipe.incr(keys["fail_email"], ttl=window)
+    pipe.incr(keys["fail_ip"], ttl=window)
+    pipe.incr(keys["global"], ttl=120)
+    pipe.exists(keys["attack"])
+    email_count, ip_count, global_count, attack = pipe.execute()
+    return email_count, ip_count, global_count, attack
+
+
+def _set_locks(locks: dict, attack_key: str | None):
+    pipe = get_store().pipeline()
+    for key, seconds in locks.items():
+        pipe.set(key, repr(time.time() + seconds), ttl=seconds)
+    if attack_key:
+        pipe.set(attack_key, "1", ttl=_setting("LOGIN_ATTACK_COOLDOWN_SECONDS", 600))
+    pipe.execute()
+
+
+def record_failure(email: str, ip: str) -> int:
+    """Count a failed login; returns the lockout (seconds) it triggered, if any."""
+    keys = _keys(email, ip)
+    try:
+        email_count, ip_count, global_count, attack = _count_failure(keys)
+        start_attack = not attack and global_count >= _setting("LOGIN_ATTACK_THRESHOLD", 300)
+        if start_attack:
+            logger.warning(f"Login failures at {global_count}/min, entering under-attack mode")
+        email_threshold, ip_threshold = _thresholds(attack or start_attack)
+        locks = {
+            keys["until_email"]: _lock_seconds(email_count, email_threshold),
+            keys["until_ip"]: _lock_seconds(ip_count, ip_threshold),
+        }
+        locks = {key: seconds for key, seconds in locks.items() if seconds}
+        if locks or start_attack:
+            _set_locks(locks, keys["attack"] if start_attack else None)
+        return max(locks.values(), default=0)
+    except Exception as e:
+        logger.error(f"Failed to record login failure: {e}")
+        return 0
+
+
+def record_success(email: str, ip: str):
+    """Reset the email's failure count after a good login (IP counts are kept)."""
+    keys = _keys(email, ip)
+    try:
+        writer(get_store()).delete(keys["fail_email"])
+    except Exception as e:
+        logger.error(f"Failed to reset login failures: {e}")
@@ -0,0 +1,151 @@
+"""Outgoing mail queue.
+
+Views enqueue messages instead of talking SMTP inside the request. A flusher
+pops up to ``MAIL_QUEUE_BATCH_SIZE`` messages and sends them over a single
+connection (``get_connection().send_messages``), so a burst of signups costs
+one SMTP handshake per batch rather than one per mail.
+
+With Redis the queue is a list shared by all workers (LPOP with a count is
+atomic, so concurrent flushers never send the same message twice); without
+Redis it is a per-process deque. Each worker runs a daemon flusher thread
+(``MAIL_QUEUE_BACKGROUND``), started lazily on the first enqueue so it exists
+in the forked worker, not the gunicorn master. ``manage.py send_queued_mail``
+drains the queue from a separate process instead.
+"""
+import json
+import logging
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from auth_service.metrics import track
+from .buffers import register_flush_hook
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+QUEUE_KEY = "mailq:outbox"
+
+_local_queue = deque()
+_wakeup = threading.Event()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject: str, body: str, to: list[str], from_email: str | None = None):
+    """Queue one plain-text message for the next batch."""
+    message = {
+        "subject": str(subject),
+        "body": str(body),
+        "to": list(to),
+        "from_email": from_email or _setting("DEFAULT_FROM_EMAIL", "noreply@example.com"),
+    }
+    redis_client = get_redis_client()
+    try:
+        if redis_client:
+            with track("redis"):
+                redis_client.rpush(QUEUE_KEY, json.dumps(message))
+        else:
+            _local_queue.append(message)
+    except Exception as e:
+        logger.error(f"Failed to queue mail to {to}, queueing locally: {e}")
+        _local_queue.append(message)
+    if _setting("MAIL_QUEUE_BACKGROUND", True):
+        _ensure_flusher()
+        _wakeup.set()
+
+
+def _pop_batch(size: int) -> list[dict]:
+    batch = []
+    while _local_queue and len(batch) < size:
+        batch.append(_local_queue.popleft())
+    redis_client = get_redis_client()
+    if redis_client and len(batch) < size:
+        with track("redis"):
+            raw = redis_client.lpop(QUEUE_KEY, size - len(batch)) or []
+        batch.extend(json.loads(item) for item in raw)
+    return batch
+
+
+def _requeue(batch: list[dict]):
+    redis_client = get_redis_client()
+    try:
+        if redis_client:
+            redis_client.lpush(QUEUE_KEY, *(json.dumps(message) for message in reversed(batch)))
+            return
+    except Exception as e:
+        logger.error(f"Failed to requeue {len(batch)} mails in Redis: {e}")
+    _local_queue.extendleft(reversed(batch))
+
+
+def send_batch(size: int | None = None) -> int:
+    """Send up to ``size`` queued messages over one connection; returns how many."""
+    batch = _pop_batch(size or _setting("MAIL_QUEUE_BATCH_SIZE", 50))
+    if not batch:
+        return 0
+    messages = [
+        EmailMessage(subject=m["subject"], body=m["body"], from_email=m["from_email"], to=m["to"])
+        for m in batch
+    ]
+    try:
+        with track("email"):
+            connection = get_connection(fail_silently=False)
+            sent = connection.send_messages(messages) or 0
+    except Exception as e:
+        logger.error(f"Failed to send {len(batch)} queued mails, requeueing: {e}")
+        _requeue(batch)
+        raise
+    logger.info(f"Sent {sent} queued mails")
+    return sent
+
+
+def flush() -> int:
+    """Send everything queued, batch by batch."""
+    total = 0
+    while True:
+        sent = send_batch()
+        if not sent:
+            return total
+        total += sent
+
+
+def discard():
+    """Drop the process-local queue without sending it (tests)."""
+    _local_queue.clear()
+
+
+@register_flush_hook
+def _flush_local():
+    """Shutdown hook: only the process-local deque would be lost."""
+    while _local_queue:
+        send_batch()
+
+
+def _run_flusher():
+    interval = _setting("MAIL_QUEUE_FLUSH_SECONDS", 2)
+    while True:
+        _wakeup.wait(interval)
+        _wakeup.clear()
+        if not _setting("MAIL_QUEUE_BACKGROUND", True):
+            continue  # switched off at runtime; the command drains instead
+        try:
+            flush()
+        except Exception as e:
+            logger.error(f"Mail queue flush failed: {e}")
+            _wakeup.wait(interval * 5)  # back off while SMTP is down
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, name="mail-queue-flusher", daemon=True)
+            _flusher.start()
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from users import audit
+
+
+class Command(BaseCommand):
+    help = "Maintain the audit event table: create upcoming monthly partitions and apply retention."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("status", "maintain"))
+        parser.add_argument(
+            "--months-ahead", type=int, default=getattr(settings, "AUDIT_PARTITION_MONTHS_AHEAD", 3),
+            help="partitions to keep ready beyond the current month (PostgreSQL)",
+        )
+        parser.add_argument(
+            "--retention-days", type=int, default=getattr(settings, "AUDIT_RETENTION_DAYS", 365),
+            help="drop events older than this; 0 keeps everything",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        action = options["action"]
+
+        partitioned = audit.is_partitioned(connection)
+        if action == "status":
+            if not partitioned:
+                self.stdout.write(f"{audit.TABLE} is not partitioned")
+                return
+            for name, bounds, rows in audit.partition_status(connection):
+                self.stdout.write(f"{name:<28} {max(rows, 0):>14} rows  {bounds}")
+            return
+
+        with transaction.atomic(using=options["database"]):
+            if partitioned:
+                for name in audit.ensure_partitions(connection, options["months_ahead"]):
+                    self.stdout.write(f"Created {name}")
+            if options["retention_days"] > 0:
+                cutoff = audit.retention_cutoff(options["retention_days"])
+                dropped, deleted = audit.drop_expired(connection, cutoff)
+                for name in dropped:
+                    self.stdout.write(f"Dropped {name}")
+                self.stdout.write(f"Deleted {deleted} events older than {cutoff:%Y-%m-%d}")
+        self.stdout.write(self.style.SUCCESS("Audit events maintained"))
@@ -0,0 +1,52 @@
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import password_validation
+from django.core.management.base import BaseCommand, CommandError
+
+from users import password_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the memory-mapped breached password index from password lists or "
+        "HIBP-style SHA1[:count] files (.gz ok, '-' for stdin)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("sources", nargs="*")
+        parser.add_argument(
+            "--output", default=getattr(settings, "PASSWORD_INDEX_PATH", ""),
+            help="index file (default: PASSWORD_INDEX_PATH)",
+        )
+        parser.add_argument(
+            "--include-django-common", action="store_true",
+            help="also add Django's common password list (replaces CommonPasswordValidator)",
+        )
+        parser.add_argument(
+            "--chunk-size", type=int, default=10_000_000,
+            help="prefixes sorted in memory per run (8 bytes each)",
+        )
+        parser.add_argument("--tmp-dir", help="directory for sorted runs (default: next to the output)")
+
+    def handle(self, *args, **options):
+        sources = list(options["sources"])
+        if options["include_django_common"]:
+            sources.append(str(Path(password_validation.__file__).resolve().parent / "common-passwords.txt.gz"))
+        if not sources:
+            raise CommandError("Give at least one source file or --include-django-common")
+        if not options["output"]:
+            raise CommandError("Set --output or PASSWORD_INDEX_PATH")
+
+        started = time.monotonic()
+        try:
+            count = password_index.build_index(
+                sources, options["output"], chunk_size=options["chunk_size"], tmp_dir=options["tmp_dir"],
+            )
+        except OSError as e:
+            raise CommandError(str(e))
+        self.stdout.write(
+            f"Wrote {count} entries to {options['output']} in {time.monotonic() - started:.1f}s; "
+            "restart workers to map the new file"
+        )
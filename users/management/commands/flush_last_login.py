@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users import last_login
+
+
+class Command(BaseCommand):
+    help = "Write pending buffered last_login updates to the database."
+
+    def handle(self, *args, **options):
+        flushed = last_login.flush()
+        self.stdout.write(f"Flushed last_login for {flushed} users")
@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from users import partitioning
+
+
+class Command(BaseCommand):
+    help = "Manage the hash-partitioned users_user layout (PostgreSQL only)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=("status", "convert", "plan"))
+        parser.add_argument(
+            "--partitions", type=int, default=getattr(settings, "USERS_PARTITIONS", 0) or 16,
+            help=f"physical partitions; must divide {partitioning.VIRTUAL_SHARDS}",
+        )
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        action = options["action"]
+
+        if action == "plan":
+            try:
+                ranges = list(partitioning.partition_ranges(options["partitions"]))
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(f"{partitioning.LEGACY_TABLE}: ids below {partitioning.LEGACY_ID_LIMIT}")
+            for name, low, high in ranges:
+                self.stdout.write(f"{name}: ids [{low}, {high})")
+            return
+
+        if connection.vendor != "postgresql":
+            raise CommandError("The partitioned users table requires PostgreSQL")
+
+        if action == "convert":
+            if partitioning.is_partitioned(connection):
+                self.stdout.write("users_user is already partitioned")
+                return
+            try:
+                with transaction.atomic(using=options["database"]):
+                    partitioning.convert_to_partitioned(connection, options["partitions"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS(
+                f"users_user converted to {options['partitions']} partitions; "
+                f"set USERS_PARTITIONS={options['partitions']} on every instance"
+            ))
+            return
+
+        if not partitioning.is_partitioned(connection):
+            self.stdout.write("users_user is not partitioned")
+            return
+        for name, bounds, rows in partitioning.partition_status(connection):
+            self.stdout.write(f"{name:<24} {max(rows, 0):>14} rows  {bounds}")
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users import mail_queue
+
+
+class Command(BaseCommand):
+    help = "Send queued mail in batches over one SMTP connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="keep draining until interrupted")
+        parser.add_argument(
+            "--interval", type=float, default=getattr(settings, "MAIL_QUEUE_FLUSH_SECONDS", 2),
+            help="seconds to wait between drains with --loop",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent = mail_queue.flush()
+            except Exception as e:
+                # The failed batch was requeued; retry after the interval
+                self.stderr.write(f"Sending failed: {e}")
+                sent = 0
+            if sent or not options["loop"]:
+                self.stdout.write(f"Sent {sent} mails")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def partition_users(apps, schema_editor):
+    """Convert users_user to the partitioned layout when USERS_PARTITIONS is set.
+
+    Only applies to PostgreSQL; existing deployments can convert later with
+    ``manage.py partition_users convert``.
+    """
+    from users import partitioning
+
+    partitions = getattr(settings, 'USERS_PARTITIONS', 0)
+    if partitions and schema_editor.connection.vendor == 'postgresql':
+        partitioning.convert_to_partitioned(schema_editor.connection, partitions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        # Reversing leaves the layout in place; it is transparent to the ORM.
+        migrations.RunPython(partition_users, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_partition_users'),
+    ]
+
+    operations = [
+        # Accounts that exist before verification was introduced count as
+        # verified, so the purge never touches them; new rows default to False.
+        migrations.AddField(
+            model_name='user',
+            name='is_verified',
+            field=models.BooleanField(default=True, verbose_name='email verified'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='is_verified',
+            field=models.BooleanField(default=False, verbose_name='email verified'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(
+                condition=models.Q(('is_verified', False)),
+                fields=['date_joined'],
+                name='users_unverified_joined_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,82 @@
+from django.db import migrations, models
+
+def create_default_tenant(apps, schema_editor):
+    Tenant = apps.get_model('users', 'Tenant')
+    Tenant.objects.get_or_create(slug='default', defaults={'name': 'Default'})
+
+
+def scope_partitions(apps, schema_editor):
+    from users import partitioning
+    partitioning.set_email_uniqueness(schema_editor.connection, per_tenant=True)
+
+
+def unscope_partitions(apps, schema_editor):
+    from users import partitioning
+    partitioning.set_email_uniqueness(schema_editor.connection, per_tenant=False)
+
+
+class UnlessPartitioned(migrations.SeparateDatabaseAndState):
+    """Apply ``state_operations`` to the database as usual, except on the
+    partitioned layout, which has no table-level email constraint to alter;
+    ``database_operations`` rebuild the per-partition indexes there instead.
+    """
+
+    def _operation(self, schema_editor):
+        from users import partitioning
+
+        if partitioning.is_partitioned(schema_editor.connection):
+            return super()
+        return migrations.SeparateDatabaseAndState(database_operations=self.state_operations)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_is_verified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slug', models.SlugField(max_length=63, unique=True, verbose_name='slug')),
+                ('name', models.CharField(max_length=255, verbose_name='name')),
+                ('domain', models.CharField(blank=True, db_index=True, max_length=253, verbose_name='domain')),
+                ('is_active', models.BooleanField(default=True, verbose_name='active')),
+                ('rate_limit_per_minute', models.PositiveIntegerField(default=0, verbose_name='rate limit per minute')),
+            ],
+        ),
+        migrations.RunPython(create_default_tenant, migrations.RunPython.noop),
+        # Existing users all belong to the default tenant
+        migrations.AddField(
+            model_name='user',
+            name='tenant',
+            field=models.SlugField(default='default', max_length=63, db_index=False, verbose_name='tenant'),
+        ),
+        UnlessPartitioned(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='user',
+                    name='email',
+                    field=models.EmailField(
+                        error_messages={'unique': 'A user with that email already exists.'},
+                        max_length=254, verbose_name='email address',
+                    ),
+                ),
+                migrations.AddConstraint(
+                    model_name='user',
+                    constraint=models.UniqueConstraint(fields=('tenant', 'email'), name='users_user_tenant_email_uniq'),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(scope_partitions, unscope_partitions),
+            ],
+        ),
+    ]
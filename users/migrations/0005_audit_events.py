@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def partition_audit_events(apps, schema_editor):
+    """On PostgreSQL, turn the new table into monthly range partitions."""
+    from users import audit
+
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    # CreateModel defers its indexes to the end of the migration, so they
+    # are built on the partitioned parent (and cascade to every partition)
+    audit.convert_to_partitioned(connection)
+    audit.ensure_partitions(connection, getattr(settings, 'AUDIT_PARTITION_MONTHS_AHEAD', 3))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_tenants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='created at')),
+                ('event', models.CharField(max_length=32, verbose_name='event')),
+                ('tenant', models.SlugField(db_index=False, max_length=63, verbose_name='tenant')),
+                ('user_id', models.BigIntegerField(blank=True, null=True, verbose_name='user id')),
+                ('email', models.EmailField(blank=True, max_length=254, verbose_name='email address')),
+                ('ip', models.GenericIPAddressField(blank=True, null=True, verbose_name='IP address')),
+                ('metadata', models.JSONField(blank=True, default=dict, verbose_name='metadata')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', '-created_at', '-id'], name='users_audit_user_time_idx'), models.Index(fields=['tenant', '-created_at', '-id'], name='users_audit_tenant_time_idx')],
+            },
+        ),
+        # Reversing CreateModel drops the partitioned table with its partitions
+        migrations.RunPython(partition_audit_events, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,26 @@
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import IntegrityError, models, router
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
+from auth_service.db_router import read_your_writes
+from . import partitioning, tenants
+
+class Tenant(models.Model):
+    """A product served by this deployment; its users and keys are isolated."""
+    slug = models.SlugField(_('slug'), max_length=63, unique=True)
+    name = models.CharField(_('name'), max_length=255)
+    # Requests for this Host resolve to the tenant without a header
+    domain = models.CharField(_('domain'), max_length=253, blank=True, db_index=True)
+    is_active = models.BooleanField(_('active'), default=True)
+    # Requests per minute across the whole tenant; 0 means no tenant budget
+    rate_limit_per_minute = models.PositiveIntegerField(_('rate limit per minute'), default=0)
+
+    def __str__(self):
+        return self.slug
+
+
 class UserManager(BaseUserManager):
     use_in_migrations = True
 
@@ -10,11 +29,34 @@ class UserManager(BaseUserManager):
         if not email:
             raise ValueError('The Email must be set')
         email = self.normalize_email(email)
+        extra_fields.setdefault('tenant', tenants.current_tenant())
         user = self.model(email=email, **extra_fields)
         user.set_password(password)
         user.save(using=self._db)
         return user
 
+    def for_email(self, email, tenant=None):
+        """Queryset for ``email`` in ``tenant`` (default: the current one)
+        that only touches the owning partition.
+
+        With USERS_PARTITIONS set the id range of the email's shard is added so
+        PostgreSQL prunes to one partition (plus the legacy one while
+        USERS_PARTITION_LEGACY is on).
+        """
+        queryset = self.filter(tenant=tenant or tenants.current_tenant(), email=email)
+        if not partitioning.is_enabled():
+            return queryset
+        low, high = partitioning.shard_id_range(partitioning.shard_for_email(email))
+        in_shard = Q(id__gte=low, id__lt=high)
+        if getattr(settings, 'USERS_PARTITION_LEGACY', True):
+            in_shard |= Q(id__lt=partitioning.LEGACY_ID_LIMIT)
+        return queryset.filter(in_shard)
+
+    def get_by_natural_key(self, email):
+        """Look up a user by email; stays on the primary right after a write."""
+        with read_your_writes(f"email:{email.lower()}"):
+            return self.for_email(email).get()
+
     def create_user(self, email, password=None, **extra_fields):
         """Create a regular user with email and password."""
         extra_fields.setdefault('is_staff', False)
@@ -25,6 +67,7 @@ class UserManager(BaseUserManager):
         """Create a superuser with email and password."""
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
+        extra_fields.setdefault('is_verified', True)
         
         if extra_fields.get('is_staff') is not True:
             raise ValueError('Superuser must have is_staff=True.')
@@ -37,10 +80,12 @@ class User(AbstractUser):
     # Remove the username field since we're using email as username
     username = None
     
-    # Email is used as username (unique identifier)
+    # Tenant slug (not a foreign key: partitions and keys use it as is)
+    tenant = models.SlugField(_('tenant'), max_length=63, default='default', db_index=False)
+
+    # Email is used as username; unique per tenant (see Meta.constraints)
     email = models.EmailField(
         _('email address'), 
-        unique=True,
         error_messages={
             'unique': _("A user with that email already exists."),
         }
@@ -48,6 +93,10 @@ class User(AbstractUser):
     
     # Full Name field (required)
     full_name = models.CharField(_('full name'), max_length=255)
+
+    # Set once the user followed the verification link (or otherwise proved
+    # they own the mailbox); unverified accounts are purged after a while
+    is_verified = models.BooleanField(_('email verified'), default=False)
     
     # Use email as the username field for authentication
     USERNAME_FIELD = 'email'
@@ -57,13 +106,70 @@ class User(AbstractUser):
     
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Partitioned layouts enforce this with a unique index per partition
+            models.UniqueConstraint(fields=['tenant', 'email'], name='users_user_tenant_email_uniq'),
+        ]
+        indexes = [
+            # Keeps the purge_unverified scan off the full table
+            models.Index(
+                fields=['date_joined'],
+                condition=Q(is_verified=False),
+                name='users_unverified_joined_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if partitioning.is_enabled():
+            using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+            in_shard = self.pk is None or partitioning.shard_for_id(self.pk) is not None
+            if self._state.adding and in_shard:
+                # The shard partitions' unique indexes cannot see rows from
+                # before the conversion, so check the legacy partition here
+                legacy = type(self)._default_manager.using(using).filter(
+                    tenant=self.tenant, email=self.email, id__lt=partitioning.LEGACY_ID_LIMIT,
+                )
+                if legacy.exists():
+                    raise IntegrityError(f'User {self.email} already exists in {partitioning.LEGACY_TABLE}')
+            if self.pk is None:
+                self.pk = partitioning.allocate_user_id(self.email, using=using)
+            elif partitioning.shard_for_id(self.pk) not in (None, partitioning.shard_for_email(self.email)):
+                # The shard lives in the id, so the row cannot move partitions
+                raise ValueError('Changing the email would move this user to another partition.')
+        super().save(*args, **kwargs)
+
     def get_full_name(self):
         """Return the full name."""
         return self.full_name
 
     def get_short_name(self):
         """Return the short name (first part of full name or email)."""
-        return self.full_name.split()[0] if self.full_name else self.email
\ No newline at end of file
+        return self.full_name.split()[0] if self.full_name else self.email
+
+
+class AuditEvent(models.Model):
+    """A security event (login, reset, ...), written in batches by users.audit."""
+    created_at = models.DateTimeField(_('created at'))
+    event = models.CharField(_('event'), max_length=32)
+    tenant = models.SlugField(_('tenant'), max_length=63, db_index=False)
+    # Plain id, not a foreign key: events outlive deleted users and the
+    # monthly partitions never join against users_user
+    user_id = models.BigIntegerField(_('user id'), null=True, blank=True)
+    email = models.EmailField(_('email address'), blank=True)
+    ip = models.GenericIPAddressField(_('IP address'), null=True, blank=True)
+    metadata = models.JSONField(_('metadata'), default=dict, blank=True)
+
+    class Meta:
+        # Range-partitioned by month on PostgreSQL (see users/audit.py); both
+        # indexes match the keyset order used by audit.query()
+        indexes = [
+            models.Index(fields=['user_id', '-created_at', '-id'], name='users_audit_user_time_idx'),
+            models.Index(fields=['tenant', '-created_at', '-id'], name='users_audit_tenant_time_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} {self.email or self.user_id}'
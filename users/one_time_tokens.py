@@ -0,0 +1,176 @@
+import time
+import hmac
+import secrets
+import hashlib
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+
+from auth_service.metrics import track
+from .kvstore import get_store, writer
+from .tenants import scoped
+from .utils import get_redis_client, check_rate_limit
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# One-time tokens
+# ----------------------
+# Short-lived single-use secrets, namespaced per purpose. Link tokens (reset,
+# email verification, magic link) are random URL-safe strings stored as
+# <prefix><token> -> subject and consumed atomically with GETDEL. Codes (OTP)
+# are 6 digits, so they are stored per subject as an HMAC plus an attempt
+# counter and deleted after ``max_attempts`` wrong guesses; issuing is capped
+# per subject and hour so the counter cannot be reset indefinitely. Keys live
+# in the current tenant's keyspace, so a token only works in its own tenant.
+
+
+@dataclass(frozen=True)
+class TokenType:
+    name: str
+    prefix: str
+    ttl_setting: str
+    default_ttl: int
+    code: bool = False
+
+    @property
+    def ttl(self) -> int:
+        return int(getattr(settings, self.ttl_setting, self.default_ttl))
+
+
+RESET = TokenType("reset", "pwdreset:", "RESET_TOKEN_TTL_SECONDS", 600)
+VERIFY_EMAIL = TokenType("verify_email", "ott:verify_email:", "VERIFY_EMAIL_TOKEN_TTL_SECONDS", 86400)
+MAGIC_LINK = TokenType("magic_link", "ott:magic_link:", "MAGIC_LINK_TTL_SECONDS", 600)
+OTP = TokenType("otp", "ott:otp:", "OTP_TTL_SECONDS", 300, code=True)
+
+TOKEN_TYPES = {token_type.name: token_type for token_type in (RESET, VERIFY_EMAIL, MAGIC_LINK, OTP)}
+
+# KEYS[1] code hash; ARGV[1] presented digest, ARGV[2] max attempts.
+# Returns 1 on match (code consumed), 0 on mismatch, -1 if there is no code.
+_VERIFY_CODE_SCRIPT = """
+local digest = redis.call('HGET', KEYS[1], 'digest')
+if not digest then return -1 end
+if digest == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _key(token_type: TokenType, suffix: str) -> str:
+    return scoped(f"{token_type.prefix}{suffix}")
+
+
+def _code_digest(token_type: TokenType, subject: str, code: str) -> str:
+    message = f"{token_type.name}:{subject}:{code}".encode("utf-8")
+    return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def issue(token_type: TokenType, subject: str) -> str | None:
+    """Create a token (or code) for ``subject``.
+
+    None if issuing is throttled or the token could not be stored; callers
+    must then not mail anything, since the link could never be used. Inside a
+    ``batch()`` storage errors only surface when the block exits.
+    """
+    if token_type.code:
+        return _issue_code(token_type, subject)
+
+    token = secrets.token_urlsafe(32)
+    key = _key(token_type, token)
+    try:
+        writer(get_store()).set(key, subject, ttl=token_type.ttl)
+        logger.info(f"{token_type.name} token issued for: {subject}")
+    except Exception as e:
+        logger.error(f"Failed to store {token_type.name} token for {subject}: {e}")
+        return None
+    return token
+
+
+def consume(token_type: TokenType, token: str) -> str | None:
+    """Atomically fetch and delete a link token; returns its subject.
+
+    Runs immediately even inside a ``batch()``: callers branch on the result,
+    and a queued ``Deferred`` would always be truthy.
+    """
+    key = _key(token_type, token)
+    try:
+        return get_store().getdel(key)
+    except Exception as e:
+        logger.error(f"Failed to consume {token_type.name} token: {e}")
+        return None
+
+
+def exists(token_type: TokenType, token: str) -> bool:
+    """Check a link token without consuming it (never queued, see ``consume``)."""
+    key = _key(token_type, token)
+    try:
+        return get_store().exists(key)
+    except Exception as e:
+        logger.error(f"Failed to check {token_type.name} token: {e}")
+        return False
+
+
+def _issue_code(token_type: TokenType, subject: str) -> str | None:
+    max_issues = getattr(settings, "OTP_MAX_ISSUES_PER_HOUR", 5)
+    if not check_rate_limit(_key(token_type, f"issued:{subject}"), max_issues, 3600):
+        logger.warning(f"{token_type.name} issue limit reached for: {subject}")
+        return None
+
+    code = f"{secrets.randbelow(10 ** 6):06d}"
+    key = _key(token_type, subject)
+    digest = _code_digest(token_type, subject, code)
+    try:
+        redis_client = get_redis_client()
+        if redis_client:
+            with track("redis"):
+                pipe = redis_client.pipeline()
+                pipe.delete(key)
+                pipe.hset(key, mapping={"digest": digest, "attempts": 0})
+                pipe.expire(key, token_type.ttl)
+                pipe.execute()
+        else:
+            with track("cache"):
+                cache.set(key, {"digest": digest, "attempts": 0, "expires": time.time() + token_type.ttl},
+                          timeout=token_type.ttl)
+        logger.info(f"{token_type.name} code issued for: {subject}")
+    except Exception as e:
+        logger.error(f"Failed to store {token_type.name} code for {subject}: {e}")
+        return None
+    return code
+
+
+def verify_code(token_type: TokenType, subject: str, code: str) -> bool:
+    """Check and consume a code; wrong guesses count towards ``OTP_MAX_ATTEMPTS``."""
+    key = _key(token_type, subject)
+    digest = _code_digest(token_type, subject, code)
+    max_attempts = getattr(settings, "OTP_MAX_ATTEMPTS", 5)
+    try:
+        redis_client = get_redis_client()
+        if redis_client:
+            with track("redis"):
+                return int(redis_client.eval(_VERIFY_CODE_SCRIPT, 1, key, digest, max_attempts)) == 1
+
+        # Django cache fallback: not atomic across workers
+        with track("cache"):
+            stored = cache.get(key)
+            if stored is None:
+                return False
+            if hmac.compare_digest(stored["digest"], digest):
+                cache.delete(key)
+                return True
+            stored["attempts"] += 1
+            if stored["attempts"] >= max_attempts:
+                cache.delete(key)
+            else:
+                cache.set(key, stored, timeout=max(1, int(stored["expires"] - time.time())))
+            return False
+    except Exception as e:
+        logger.error(f"Failed to verify {token_type.name} code for {subject}: {e}")
+        return False
@@ -0,0 +1,195 @@
+"""Hash-partitioned ``users_user`` layout keyed on canonical email.
+
+The canonical email (stripped, lower-cased) is hashed into one of
+``VIRTUAL_SHARDS`` shards and the shard is encoded in the high bits of the
+user id::
+
+    id = (shard + 1) << SHARD_SHIFT | sequence
+
+On PostgreSQL the table is then RANGE-partitioned on ``id``, each partition
+owning a contiguous block of shards. That keeps ``id`` a real primary key
+(foreign keys from groups, permissions and admin log keep working) while an
+email lookup knows its id range up front and touches a single partition.
+Email uniqueness (per tenant) is enforced by a unique index per partition,
+which is global because an email can only ever land in one partition.
+
+Rows that existed before the conversion keep their ids and live in the
+``users_user_legacy`` partition below the first shard range.
+"""
+import zlib
+import logging
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+VIRTUAL_SHARDS = 256
+SHARD_SHIFT = 40  # 2**40 ids per shard
+LEGACY_ID_LIMIT = 1 << SHARD_SHIFT
+SEQUENCE_NAME = "users_user_shard_seq"
+TABLE = "users_user"
+LEGACY_TABLE = "users_user_legacy"
+
+
+def is_enabled() -> bool:
+    return getattr(settings, "USERS_PARTITIONS", 0) > 0
+
+
+def canonical_email(email: str) -> str:
+    return email.strip().lower()
+
+
+def shard_for_email(email: str) -> int:
+    return zlib.crc32(canonical_email(email).encode("utf-8")) % VIRTUAL_SHARDS
+
+
+def shard_id_range(shard: int) -> tuple[int, int]:
+    """Half-open id range ``[low, high)`` owned by a virtual shard."""
+    return (shard + 1) << SHARD_SHIFT, (shard + 2) << SHARD_SHIFT
+
+
+def shard_for_id(user_id: int) -> int | None:
+    """Shard encoded in an id, or None for a legacy (pre-partitioning) id."""
+    if user_id < LEGACY_ID_LIMIT:
+        return None
+    return (user_id >> SHARD_SHIFT) - 1
+
+
+def partition_ranges(partitions: int):
+    """Yield ``(name, low_id, high_id)`` for each physical partition."""
+    if partitions <= 0 or VIRTUAL_SHARDS % partitions:
+        raise ValueError(f"Partition count must divide {VIRTUAL_SHARDS}, got {partitions}")
+    width = VIRTUAL_SHARDS // partitions
+    for index in range(partitions):
+        low, _ = shard_id_range(index * width)
+        _, high = shard_id_range((index + 1) * width - 1)
+        yield f"{TABLE}_p{index:03d}", low, high
+
+
+def allocate_user_id(email: str, using: str = "default") -> int:
+    """Next id in the shard that owns ``email``."""
+    with connections[using].cursor() as cursor:
+        cursor.execute("SELECT nextval(%s)", [SEQUENCE_NAME])
+        sequence = cursor.fetchone()[0]
+    low, high = shard_id_range(shard_for_email(email))
+    if low + sequence >= high:
+        raise OverflowError(f"Shard for {email} exhausted its id space")
+    return low + sequence
+
+
+# ----------------------
+# Layout management (PostgreSQL)
+# ----------------------
+def _referencing_foreign_keys(cursor, table):
+    """``(table, constraint, definition)`` for every FK pointing at ``table``."""
+    cursor.execute(
+        """
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE contype = 'f' AND confrelid = %s::regclass
+        """,
+        [table],
+    )
+    return cursor.fetchall()
+
+
+def _unique_columns(cursor) -> str:
+    """Columns of the per-partition uniqueness index for the current schema."""
+    columns = {column.name for column in cursor.db.introspection.get_table_description(cursor, LEGACY_TABLE)}
+    return "(tenant, email)" if "tenant" in columns else "(email)"
+
+
+def is_partitioned(connection) -> bool:
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def convert_to_partitioned(connection, partitions: int):
+    """Turn the plain ``users_user`` table into the partitioned layout.
+
+    Existing rows stay in place as the legacy partition; foreign keys that
+    referenced the old table are re-pointed at the partitioned parent. Runs in
+    the caller's transaction.
+    """
+    if connection.vendor != "postgresql":
+        raise RuntimeError("Partitioned users table requires PostgreSQL")
+    if is_partitioned(connection):
+        logger.info("users_user is already partitioned")
+        return
+
+    ranges = list(partition_ranges(partitions))
+    with connection.cursor() as cursor:
+        foreign_keys = _referencing_foreign_keys(cursor, TABLE)
+        for table, name, _ in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"')
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {LEGACY_TABLE}")
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP IDENTITY IF EXISTS")
+        cursor.execute(f"ALTER TABLE {LEGACY_TABLE} ALTER COLUMN id DROP DEFAULT")
+        cursor.execute(
+            f"ALTER TABLE {LEGACY_TABLE} ADD CONSTRAINT {LEGACY_TABLE}_id_range "
+            f"CHECK (id < {LEGACY_ID_LIMIT})"
+        )
+        cursor.execute(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} MINVALUE 1")
+        cursor.execute(
+            f"CREATE TABLE {TABLE} (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS) PARTITION BY RANGE (id)"
+        )
+        cursor.execute(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id)")
+        cursor.execute(
+            f"ALTER TABLE {TABLE} ATTACH PARTITION {LEGACY_TABLE} "
+            f"FOR VALUES FROM (MINVALUE) TO ({LEGACY_ID_LIMIT})"
+        )
+        unique_columns = _unique_columns(cursor)
+        for name, low, high in ranges:
+            cursor.execute(f"CREATE TABLE {name} PARTITION OF {TABLE} FOR VALUES FROM ({low}) TO ({high})")
+            cursor.execute(f"CREATE UNIQUE INDEX {name}_email_uniq ON {name} {unique_columns}")
+
+        for table, name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+    logger.info(f"users_user converted to {partitions} hash partitions")
+
+
+def set_email_uniqueness(connection, per_tenant: bool):
+    """Swap every partition's unique index between ``(email)`` and ``(tenant, email)``.
+
+    A partitioned parent cannot carry a unique constraint without ``id``, so
+    the tenant migration rebuilds the per-partition indexes instead.
+    """
+    old, new = ("email",), ("tenant", "email")
+    if not per_tenant:
+        old, new = new, old
+    with connection.cursor() as cursor:
+        for partition, _, _ in partition_status(connection):
+            constraints = connection.introspection.get_constraints(cursor, partition)
+            for name, details in constraints.items():
+                if not details["unique"] or details["primary_key"] or tuple(details["columns"]) != old:
+                    continue
+                if details["index"]:
+                    cursor.execute(f'DROP INDEX "{name}"')
+                else:
+                    cursor.execute(f'ALTER TABLE {partition} DROP CONSTRAINT "{name}"')
+            cursor.execute(
+                f'CREATE UNIQUE INDEX "{partition}_email_uniq" ON {partition} ({", ".join(new)})'
+            )
+
+
+def partition_status(connection):
+    """``[(partition, bounds, approximate_rows)]`` for the users table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = %s::regclass
+            ORDER BY c.relname
+            """,
+            [TABLE],
+        )
+        return cursor.fetchall()
@@ -0,0 +1,213 @@
+"""Compact, memory-mapped index of breached / common passwords.
+
+The index file is a 16-byte header followed by a sorted array of big-endian
+64-bit SHA-1 prefixes, one per password::
+
+    b"PWIX" | version: uint32 | count: uint64 | prefix[0] ... prefix[count-1]
+
+Lookups binary-search the mmap'd array (about 30 probes for a billion
+entries) without loading it; the pages live in the OS page cache and are
+shared by every gunicorn worker that maps the same file. At 8 bytes per entry
+a 900M-password corpus is ~7 GB on disk, of which only the probed pages are
+ever resident. A 64-bit prefix gives a false-positive rate of roughly
+``count / 2**64`` (5e-11 at 900M), i.e. negligible.
+
+Sources are plain password lists or HIBP-style ``SHA1HEX[:count]`` lines
+(gzip supported). ``build_index`` sorts in bounded memory: sorted runs of
+``chunk_size`` prefixes are spilled to temp files and k-way merged.
+"""
+import gzip
+import heapq
+import mmap
+import os
+import sys
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from array import array
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"PWIX"
+VERSION = 1
+HEADER = struct.Struct(">4sIQ")
+ENTRY = struct.Struct(">Q")
+ENTRY_SIZE = ENTRY.size
+HEX_DIGITS = frozenset("0123456789abcdefABCDEF")
+
+
+def password_prefix(password: str) -> int:
+    return int.from_bytes(hashlib.sha1(password.encode("utf-8")).digest()[:ENTRY_SIZE], "big")
+
+
+def line_prefix(line: str) -> int | None:
+    """Prefix for one source line: ``SHA1HEX[:count]`` or a plain password."""
+    line = line.rstrip("\r\n")
+    if not line:
+        return None
+    candidate = line.split(":", 1)[0]
+    if len(candidate) == 40 and HEX_DIGITS.issuperset(candidate):
+        return int(candidate[:ENTRY_SIZE * 2], 16)
+    return password_prefix(line)
+
+
+class PasswordIndex:
+    """Read-only view of an index file; safe to share between threads."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        with open(self.path, "rb") as handle:
+            self._mmap = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is not a password index (version {VERSION})")
+        if len(self._mmap) != HEADER.size + count * ENTRY_SIZE:
+            self._mmap.close()
+            raise ValueError(f"{self.path} is truncated")
+        self.count = count
+        if hasattr(mmap, "MADV_RANDOM"):
+            self._mmap.madvise(mmap.MADV_RANDOM)  # no readahead for point lookups
+
+    def __len__(self):
+        return self.count
+
+    def contains_prefix(self, prefix: int) -> bool:
+        data, offset = self._mmap, HEADER.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            value = ENTRY.unpack_from(data, offset + middle * ENTRY_SIZE)[0]
+            if value < prefix:
+                low = middle + 1
+            elif value > prefix:
+                high = middle
+            else:
+                return True
+        return False
+
+    def __contains__(self, password: str) -> bool:
+        return self.contains_prefix(password_prefix(password))
+
+    def close(self):
+        self._mmap.close()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path) -> PasswordIndex | None:
+    """Process-wide index for ``path``, or None if the file is missing/invalid."""
+    path = str(path)
+    index = _indexes.get(path)
+    if index is not None:
+        return index
+    with _indexes_lock:
+        if path not in _indexes:
+            try:
+                _indexes[path] = PasswordIndex(path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Password index unavailable at {path}, using Django's common list: {e}")
+                _indexes[path] = None
+        return _indexes[path]
+
+
+# ----------------------
+# Building
+# ----------------------
+def _open_source(path):
+    if path == "-":
+        return sys.stdin
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "rt", encoding="utf-8", errors="replace")
+
+
+def iter_prefixes(sources):
+    for source in sources:
+        handle = _open_source(source)
+        try:
+            for line in handle:
+                prefix = line_prefix(line)
+                if prefix is not None:
+                    yield prefix
+        finally:
+            if handle is not sys.stdin:
+                handle.close()
+
+
+def _spill(chunk: array, directory: str) -> str:
+    chunk = array("Q", sorted(chunk))
+    if chunk.itemsize != ENTRY_SIZE:
+        raise RuntimeError("array('Q') is not 64-bit on this platform")
+    fd, path = tempfile.mkstemp(prefix="pwix-run-", dir=directory)
+    with os.fdopen(fd, "wb") as handle:
+        chunk.tofile(handle)  # native byte order; only read back by _read_run
+    return path
+
+
+def _read_run(path, batch: int = 65536):
+    with open(path, "rb") as handle:
+        while True:
+            values = array("Q")
+            try:
+                values.fromfile(handle, batch)
+            except EOFError:
+                pass
+            if not values:
+                return
+            yield from values
+
+
+def build_index(sources, output, chunk_size: int = 10_000_000, tmp_dir: str | None = None) -> int:
+    """Write a deduplicated index of ``sources`` to ``output``; returns its size.
+
+    Memory use is bounded by ``chunk_size`` prefixes (8 bytes each).
+    """
+    output = str(output)
+    directory = tmp_dir or os.path.dirname(os.path.abspath(output))
+    runs, partial = [], None
+    try:
+        chunk = array("Q")
+        for prefix in iter_prefixes(sources):
+            chunk.append(prefix)
+            if len(chunk) >= chunk_size:
+                runs.append(_spill(chunk, directory))
+                chunk = array("Q")
+        if chunk:
+            runs.append(_spill(chunk, directory))
+
+        fd, partial = tempfile.mkstemp(prefix="pwix-", dir=os.path.dirname(os.path.abspath(output)))
+        count, previous = 0, None
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(HEADER.pack(MAGIC, VERSION, 0))
+            buffered = []
+            for prefix in heapq.merge(*(_read_run(run) for run in runs)):
+                if prefix == previous:
+                    continue
+                previous = prefix
+                buffered.append(prefix)
+                if len(buffered) >= 65536:
+                    handle.write(struct.pack(f">{len(buffered)}Q", *buffered))
+                    count += len(buffered)
+                    buffered = []
+            if buffered:
+                handle.write(struct.pack(f">{len(buffered)}Q", *buffered))
+                count += len(buffered)
+            handle.seek(0)
+            handle.write(HEADER.pack(MAGIC, VERSION, count))
+        os.chmod(partial, 0o644)
+        os.replace(partial, output)  # workers holding the old mapping keep it
+        partial = None
+        return count
+    finally:
+        if partial:
+            os.unlink(partial)
+        for run in runs:
+            try:
+                os.unlink(run)
+            except OSError:
+                pass
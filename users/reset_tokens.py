@@ -0,0 +1,81 @@
+"""Signed, self-contained password reset tokens (``RESET_TOKEN_MODE=signed``).
+
+A token carries the user id, the tenant and a fingerprint of the user's
+current password hash and email, timestamped and signed with SECRET_KEY (the
+same idea as Django's ``PasswordResetTokenGenerator``). Issuing one writes
+nothing; it stops working after ``RESET_TOKEN_TTL_SECONDS`` or as soon as the
+password changes. Consuming a token adds its digest to a small used-token set
+that expires with the token, so it cannot be replayed in the moment before
+the new password is saved.
+"""
+import hmac
+import hashlib
+import logging
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils.crypto import salted_hmac
+
+from auth_service.db_router import read_your_writes
+from .kvstore import get_store
+from .one_time_tokens import RESET
+from .tenants import current_tenant, scoped
+
+logger = logging.getLogger(__name__)
+
+SALT = "users.reset_tokens"
+USED_PREFIX = "pwdreset:used:"
+
+
+def _fingerprint(user) -> str:
+    return salted_hmac(SALT, f"{user.pk}:{user.password}:{user.email}").hexdigest()[:32]
+
+
+def _used_key(token: str) -> str:
+    return scoped(f"{USED_PREFIX}{hashlib.sha256(token.encode('utf-8')).hexdigest()}")
+
+
+def issue(user) -> str:
+    """A reset token for ``user``; nothing is stored."""
+    payload = {"u": user.pk, "t": user.tenant, "f": _fingerprint(user)}
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def _load(token: str):
+    """The user a valid, unexpired token was issued to, else None."""
+    try:
+        payload = signing.loads(token, salt=SALT, max_age=RESET.ttl)
+    except signing.BadSignature:  # includes SignatureExpired
+        return None
+    if payload.get("t") != current_tenant():
+        return None
+    with read_your_writes(f"user:{payload.get('u')}"):
+        user = get_user_model().objects.filter(pk=payload.get("u"), tenant=payload["t"]).first()
+    if user is None or not hmac.compare_digest(_fingerprint(user), str(payload.get("f"))):
+        return None
+    return user
+
+
+def consume(token: str):
+    """Return the token's user and mark the token used; None if invalid or used."""
+    user = _load(token)
+    if user is None:
+        return None
+    try:
+        if not get_store().add(_used_key(token), "1", ttl=RESET.ttl):
+            return None
+    except Exception as e:
+        # The fingerprint still invalidates the token once the password changes
+        logger.error(f"Failed to record used reset token: {e}")
+    return user
+
+
+def exists(token: str) -> bool:
+    """Check a token without consuming it."""
+    if _load(token) is None:
+        return False
+    try:
+        return not get_store().exists(_used_key(token))
+    except Exception as e:
+        logger.error(f"Failed to check used reset token: {e}")
+        return True
@@ -1,20 +1,42 @@
-from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiResponse
+from drf_spectacular.utils import extend_schema, OpenApiExample, OpenApiParameter, OpenApiResponse
 from rest_framework import status
 from .serializers import (
     RegisterSerializer, 
     LoginSerializer, 
     ForgotPasswordSerializer, 
     ResetPasswordSerializer, 
+    RefreshTokenSerializer,
+    MagicLinkRequestSerializer,
+    MagicLinkLoginSerializer,
+    OTPRequestSerializer,
+    OTPLoginSerializer,
+    VerifyEmailSerializer,
+    ResendVerificationSerializer,
+    SessionSerializer,
+    AuditEventQuerySerializer,
+    AuditEventPageSerializer,
+    MeQuerySerializer,
     UserSerializer
 )
 
+# Optional header for safely retrying non-idempotent POSTs
+idempotency_key_parameter = OpenApiParameter(
+    name='Idempotency-Key',
+    type=str,
+    location=OpenApiParameter.HEADER,
+    required=False,
+    description="Client-generated unique key (e.g. a UUID). Retrying with the same key and body "
+                "returns the original response (marked Idempotent-Replayed: true) without re-running it.",
+)
+
 # Register schema
 register_schema = extend_schema(
     tags=['Authentication'],
     request=RegisterSerializer,
+    parameters=[idempotency_key_parameter],
     responses={
         status.HTTP_201_CREATED: OpenApiResponse(
-            description="User created successfully",
+            description="User created successfully; a verification link is mailed",
             response=UserSerializer,
             examples=[
                 OpenApiExample(
@@ -24,6 +46,7 @@ register_schema = extend_schema(
                         'email': 'user@example.com',
                         'full_name': 'John Doe',
                         'is_active': True,
+                        'is_verified': False,
                         'date_joined': '2023-01-01T00:00:00Z'
                     }
                 )
@@ -73,6 +96,7 @@ login_schema = extend_schema(
                             'email': 'user@example.com',
                             'full_name': 'John Doe',
                             'is_active': True,
+                            'is_verified': True,
                             'date_joined': '2023-01-01T00:00:00Z'
                         }
                     }
@@ -87,6 +111,29 @@ login_schema = extend_schema(
                     value={'detail': 'Invalid credentials'}
                 )
             ]
+        ),
+        status.HTTP_403_FORBIDDEN: OpenApiResponse(
+            description="Email address not verified yet (only with EMAIL_VERIFICATION_REQUIRED), "
+                        "or a suspicious earlier login requires signing in with a code or link first",
+            examples=[
+                OpenApiExample(
+                    'Unverified Response',
+                    value={'detail': 'Email address not verified'}
+                ),
+                OpenApiExample(
+                    'Step-up Response',
+                    value={'detail': 'Additional verification required', 'step_up': ['otp', 'magic_link']}
+                )
+            ]
+        ),
+        status.HTTP_429_TOO_MANY_REQUESTS: OpenApiResponse(
+            description="Email or IP temporarily locked after repeated failures (see Retry-After)",
+            examples=[
+                OpenApiExample(
+                    'Locked Out Response',
+                    value={'detail': 'Too many failed login attempts. Try again later.'}
+                )
+            ]
         )
     },
     examples=[
@@ -100,10 +147,46 @@ login_schema = extend_schema(
     ]
 )
 
+# Token refresh schema
+refresh_token_schema = extend_schema(
+    tags=['Authentication'],
+    request=RefreshTokenSerializer,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Token rotated; the previous refresh token is no longer valid",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={
+                        'access': 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...',
+                        'refresh': 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...'
+                    }
+                )
+            ]
+        ),
+        status.HTTP_401_UNAUTHORIZED: OpenApiResponse(
+            description="Invalid, expired or revoked refresh token (reuse revokes the whole session)",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'detail': 'Refresh token reuse detected; session revoked'}
+                )
+            ]
+        )
+    },
+    examples=[
+        OpenApiExample(
+            'Refresh Example',
+            value={'refresh': 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...'}
+        )
+    ]
+)
+
 # Forgot password schema
 forgot_password_schema = extend_schema(
     tags=['Password Management'],
     request=ForgotPasswordSerializer,
+    parameters=[idempotency_key_parameter],
     responses={
         status.HTTP_200_OK: OpenApiResponse(
             description="Password reset email sent",
@@ -175,6 +258,16 @@ reset_password_schema = extend_schema(
 # User profile schema
 me_schema = extend_schema(
     tags=['User Profile'],
+    parameters=[
+        MeQuerySerializer,
+        OpenApiParameter(
+            name='If-None-Match',
+            type=str,
+            location=OpenApiParameter.HEADER,
+            required=False,
+            description="ETag of a previous response for the same fields; answered with 304 while unchanged.",
+        ),
+    ],
     responses={
         status.HTTP_200_OK: OpenApiResponse(
             description="User profile retrieved successfully",
@@ -187,8 +280,26 @@ me_schema = extend_schema(
                         'email': 'user@example.com',
                         'full_name': 'John Doe',
                         'is_active': True,
+                        'is_verified': True,
                         'date_joined': '2023-01-01T00:00:00Z'
                     }
+                ),
+                OpenApiExample(
+                    'Sparse Fieldset',
+                    description="GET /api/auth/me/?fields=email,is_verified",
+                    value={'email': 'user@example.com', 'is_verified': True}
+                )
+            ]
+        ),
+        status.HTTP_304_NOT_MODIFIED: OpenApiResponse(
+            description="Profile unchanged since the ETag sent in If-None-Match (empty body)"
+        ),
+        status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+            description="Unknown field requested",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'fields': ['Unknown fields: password']}
                 )
             ]
         ),
@@ -202,4 +313,247 @@ me_schema = extend_schema(
             ]
         )
     }
-)
\ No newline at end of file
+)
+
+# Sessions list schema
+sessions_schema = extend_schema(
+    tags=['User Profile'],
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Active sessions, most recently seen first",
+            response=SessionSerializer(many=True),
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value=[{
+                        'id': '3f1c2a9e8b7d4c6a9e0f1b2c3d4e5f60',
+                        'device': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0)',
+                        'ip': '203.0.113.7',
+                        'created': 1700000000,
+                        'last_seen': 1700003600,
+                        'current': True
+                    }]
+                )
+            ]
+        ),
+        status.HTTP_401_UNAUTHORIZED: OpenApiResponse(description="Unauthorized")
+    }
+)
+
+# Audit events schema
+audit_events_schema = extend_schema(
+    tags=['User Profile'],
+    parameters=[AuditEventQuerySerializer],
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Security events, newest first; pass next_cursor back as cursor for the next page",
+            response=AuditEventPageSerializer,
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={
+                        'events': [{
+                            'id': 1042,
+                            'created_at': '2024-01-01T12:00:00Z',
+                            'event': 'login_succeeded',
+                            'user_id': 1,
+                            'email': 'user@example.com',
+                            'ip': '203.0.113.7',
+                            'metadata': {'method': 'password'}
+                        }],
+                        'next_cursor': 'MjAyNC0wMS0wMVQxMjowMDowMCswMDowMHwxMDQy'
+                    }
+                )
+            ]
+        ),
+        status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+            description="Invalid filter or cursor",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'cursor': ['Invalid cursor']}
+                )
+            ]
+        ),
+        status.HTTP_401_UNAUTHORIZED: OpenApiResponse(description="Unauthorized")
+    }
+)
+
+# Revoke session schema
+revoke_session_schema = extend_schema(
+    tags=['User Profile'],
+    responses={
+        status.HTTP_204_NO_CONTENT: OpenApiResponse(
+            description="Session revoked; its refresh and access tokens stop working immediately"
+        ),
+        status.HTTP_404_NOT_FOUND: OpenApiResponse(
+            description="No such session for this user",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'detail': 'Session not found'}
+                )
+            ]
+        ),
+        status.HTTP_401_UNAUTHORIZED: OpenApiResponse(description="Unauthorized")
+    }
+)
+
+# Revoke all sessions schema
+revoke_all_sessions_schema = extend_schema(
+    tags=['User Profile'],
+    request=None,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Every session of the user revoked, including the current one",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={'revoked': 3}
+                )
+            ]
+        ),
+        status.HTTP_401_UNAUTHORIZED: OpenApiResponse(description="Unauthorized")
+    }
+)
+
+# Shared 200 response for passwordless logins (same shape as login)
+_passwordless_login_success = OpenApiResponse(
+    description="Login successful",
+    examples=[
+        OpenApiExample(
+            'Success Response',
+            value={
+                'access': 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...',
+                'refresh': 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9...',
+                'user': {
+                    'id': 1,
+                    'email': 'user@example.com',
+                    'full_name': 'John Doe',
+                    'is_active': True,
+                    'is_verified': True,
+                    'date_joined': '2023-01-01T00:00:00Z'
+                }
+            }
+        )
+    ]
+)
+
+# Verify email schema
+verify_email_schema = extend_schema(
+    tags=['Email Verification'],
+    request=VerifyEmailSerializer,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Email address verified",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={'message': 'Email address verified'}
+                )
+            ]
+        ),
+        status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+            description="Invalid, used or expired token",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'detail': 'Invalid or expired token'}
+                )
+            ]
+        )
+    }
+)
+
+# Resend verification schema
+resend_verification_schema = extend_schema(
+    tags=['Email Verification'],
+    request=ResendVerificationSerializer,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Verification link sent if the account exists and is unverified",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={'message': 'If the account needs verification, a link has been sent'}
+                )
+            ]
+        )
+    }
+)
+
+# Magic link request schema
+magic_link_request_schema = extend_schema(
+    tags=['Passwordless Login'],
+    request=MagicLinkRequestSerializer,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="Sign-in link sent if the account exists",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={'message': 'If the email exists, a sign-in link has been sent'}
+                )
+            ]
+        )
+    }
+)
+
+# Magic link login schema
+magic_link_login_schema = extend_schema(
+    tags=['Passwordless Login'],
+    request=MagicLinkLoginSerializer,
+    responses={
+        status.HTTP_200_OK: _passwordless_login_success,
+        status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+            description="Invalid, used or expired link",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'detail': 'Invalid or expired link'}
+                )
+            ]
+        )
+    }
+)
+
+# OTP request schema
+otp_request_schema = extend_schema(
+    tags=['Passwordless Login'],
+    request=OTPRequestSerializer,
+    responses={
+        status.HTTP_200_OK: OpenApiResponse(
+            description="6-digit sign-in code sent if the account exists",
+            examples=[
+                OpenApiExample(
+                    'Success Response',
+                    value={'message': 'If the email exists, a sign-in code has been sent'}
+                )
+            ]
+        )
+    }
+)
+
+# OTP login schema
+otp_login_schema = extend_schema(
+    tags=['Passwordless Login'],
+    request=OTPLoginSerializer,
+    responses={
+        status.HTTP_200_OK: _passwordless_login_success,
+        status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+            description="Wrong or expired code (the code is discarded after too many attempts)",
+            examples=[
+                OpenApiExample(
+                    'Error Response',
+                    value={'detail': 'Invalid or expired code'}
+                )
+            ]
+        )
+    },
+    examples=[
+        OpenApiExample(
+            'OTP Login Example',
+            value={'email': 'user@example.com', 'code': '123456'}
+        )
+    ]
+)
@@ -1,10 +1,20 @@
 from rest_framework import serializers
-from django.contrib.auth import authenticate, get_user_model
-from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .validators import validate_password
+
 User = get_user_model()
 
+def _validate_password_field(field, password, user=None):
+    """Run the password pipeline, reporting errors under ``field``."""
+    try:
+        validate_password(password, user)
+    except DjangoValidationError as e:
+        raise serializers.ValidationError({field: list(e.messages)})
+
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
     password_confirm = serializers.CharField(write_only=True, min_length=8)
@@ -12,16 +22,26 @@ class RegisterSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('email', 'password', 'password_confirm', 'full_name')
+        # Uniqueness is checked in validate_email through the partition-aware manager
+        extra_kwargs = {'email': {'validators': []}}
+    
+    def validate_email(self, value):
+        if User.objects.for_email(value).exists():
+            raise serializers.ValidationError(
+                User._meta.get_field('email').error_messages['unique'], code='unique'
+            )
+        return value
     
     def validate(self, data):
+        # Runs only after the field checks (incl. email uniqueness) passed, and
+        # the password validators only after the cheap confirm check
         if data['password'] != data['password_confirm']:
             raise serializers.ValidationError(_("Passwords don't match"))
+        # Unsaved user so the similarity check can compare against email/name
+        candidate = User(email=data['email'], full_name=data.get('full_name', ''))
+        _validate_password_field('password', data['password'], candidate)
         return data
     
-    def validate_password(self, value):
-        validate_password(value)
-        return value
-    
     def create(self, validated_data):
         validated_data.pop('password_confirm')
         password = validated_data.pop('password')
@@ -33,24 +53,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
-    
-    def validate(self, data):
-        email = data.get('email')
-        password = data.get('password')
-        
-        if email and password:
-            user = authenticate(username=email, password=password)
-            if user:
-                if user.is_active:
-                    data['user'] = user
-                else:
-                    raise serializers.ValidationError(_('User account is disabled.'))
-            else:
-                raise serializers.ValidationError(_('Unable to log in with provided credentials.'))
-        else:
-            raise serializers.ValidationError(_('Must include "email" and "password".'))
-        
-        return data
+    # Credentials are checked once, in views.login, after the lockout check
 
 class ForgotPasswordSerializer(serializers.Serializer):
     email = serializers.EmailField()
@@ -63,13 +66,105 @@ class ResetPasswordSerializer(serializers.Serializer):
     def validate(self, data):
         if data['new_password'] != data['new_password_confirm']:
             raise serializers.ValidationError(_("Passwords don't match"))
+        _validate_password_field('new_password', data['new_password'])
         return data
-    
-    def validate_new_password(self, value):
-        validate_password(value)
-        return value
+
+class MagicLinkRequestSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
+class MagicLinkLoginSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+class VerifyEmailSerializer(serializers.Serializer):
+    token = serializers.CharField()
+
+class ResendVerificationSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
+class OTPRequestSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+
+class OTPLoginSerializer(serializers.Serializer):
+    email = serializers.EmailField()
+    code = serializers.RegexField(r'^\d{6}$', max_length=6)
+
+class RefreshTokenSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+class SessionSerializer(serializers.Serializer):
+    id = serializers.CharField()
+    device = serializers.CharField()
+    ip = serializers.CharField()
+    created = serializers.IntegerField(help_text="Unix timestamp of the login")
+    last_seen = serializers.IntegerField(help_text="Unix timestamp, updated in batches")
+    current = serializers.BooleanField()
+
+class AuditEventQuerySerializer(serializers.Serializer):
+    user_id = serializers.IntegerField(required=False, help_text="Staff only; others always see their own events")
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    cursor = serializers.CharField(required=False, help_text="next_cursor from the previous page")
+    limit = serializers.IntegerField(required=False, default=50, min_value=1, max_value=200)
+
+class AuditEventSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+    event = serializers.CharField()
+    user_id = serializers.IntegerField(allow_null=True)
+    email = serializers.EmailField()
+    ip = serializers.CharField(allow_null=True)
+    metadata = serializers.DictField()
+
+class AuditEventPageSerializer(serializers.Serializer):
+    events = AuditEventSerializer(many=True)
+    next_cursor = serializers.CharField(allow_null=True)
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ('id', 'email', 'full_name', 'is_active', 'date_joined')
\ No newline at end of file
+        fields = ('id', 'email', 'full_name', 'is_active', 'is_verified', 'date_joined')
+
+class MeQuerySerializer(serializers.Serializer):
+    fields = serializers.CharField(
+        required=False, help_text="Comma-separated subset of the profile fields to return (default: all)"
+    )
+
+    def validate_fields(self, value):
+        requested = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = requested - set(UserSerializer.Meta.fields)
+        if unknown:
+            raise serializers.ValidationError(f"Unknown fields: {', '.join(sorted(unknown))}")
+        # Canonical order, so equivalent selections share one ETag
+        return tuple(name for name in UserSerializer.Meta.fields if name in requested)
+
+
+def _iso_datetime(value):
+    """Format a datetime exactly like DRF's ``DateTimeField`` does by default."""
+    if value is None:
+        return None
+    if timezone.is_aware(value):
+        value = value.astimezone(timezone.get_current_timezone())
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def serialize_user(user, fields=None):
+    """Fast path equivalent of ``UserSerializer(user).data`` for hot endpoints.
+
+    Skips ModelSerializer field introspection and per-field objects; the keys
+    and value formats must stay in lockstep with ``UserSerializer.Meta.fields``.
+    ``fields`` narrows the payload to a sparse fieldset.
+    """
+    data = {
+        'id': user.id,
+        'email': user.email,
+        'full_name': user.full_name,
+        'is_active': user.is_active,
+        'is_verified': user.is_verified,
+        'date_joined': _iso_datetime(user.date_joined),
+    }
+    if fields:
+        return {name: data[name] for name in fields}
+    return data
@@ -0,0 +1,252 @@
+import time
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.settings import api_settings
+
+from auth_service.metrics import track
+from .buffers import WriteBehindBuffer
+from .token_families import (
+    FAMILY_CLAIM, issue_token_pair, rotate_refresh_token, revoke_family,
+    family_key, family_ttl,
+)
+from .kvstore import batch, get_store, in_batch, writer
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# Session registry
+# ----------------------
+# A session is a refresh-token family: its hash (rtfam:<id>) holds device, IP
+# and creation time. Each user has one sorted set sessions:<uid> of family ids
+# scored by last-seen time, so listing is a ZREVRANGE plus one HGETALL per
+# session and revoking is a ZSCORE ownership check. Families that expired or
+# were killed by reuse detection are pruned lazily when the set is read.
+SESSION_INDEX_PREFIX = "sessions:"
+DEVICE_MAX_LENGTH = 200
+
+
+def _index_key(user_id) -> str:
+    return f"{SESSION_INDEX_PREFIX}{user_id}"
+
+
+def client_ip(request) -> str:
+    meta_key = getattr(settings, "RATELIMIT_IP_META_KEY", None)
+    if isinstance(meta_key, str) and request.META.get(meta_key):
+        return request.META[meta_key].split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "")
+
+
+def client_meta(request) -> dict:
+    return {
+        "device": request.META.get("HTTP_USER_AGENT", "")[:DEVICE_MAX_LENGTH],
+        "ip": client_ip(request),
+    }
+
+
+def _index_session(user_id, family_id: str, seen_at: float):
+    key = _index_key(user_id)
+    ttl = family_ttl()
+    try:
+        redis_client = get_redis_client()
+        if redis_client:
+            with track("redis"):
+                pipe = redis_client.pipeline()
+                pipe.zadd(key, {family_id: seen_at})
+                # Entries older than a refresh lifetime can no longer be live
+                pipe.zremrangebyscore(key, "-inf", seen_at - ttl)
+                pipe.expire(key, ttl)
+                pipe.execute()
+        else:
+            with track("cache"):
+                index = cache.get(key) or {}
+                index = {fid: ts for fid, ts in index.items() if ts > seen_at - ttl}
+                index[family_id] = seen_at
+                cache.set(key, index, timeout=ttl)
+    except Exception as e:
+        logger.error(f"Failed to index session {family_id} for user {user_id}: {e}")
+
+
+def start_session(user, request):
+    """Issue the token pair for a login and register it as a session."""
+    refresh = issue_token_pair(user, **client_meta(request))
+    _index_session(user.pk, refresh[FAMILY_CLAIM], time.time())
+    return refresh
+
+
+def refresh_session(raw_token: str, user_model, request):
+    """Rotate a refresh token, recording the client and bumping last-seen."""
+    refresh = rotate_refresh_token(raw_token, user_model, ip=client_ip(request))
+    _index_session(refresh[api_settings.USER_ID_CLAIM], refresh[FAMILY_CLAIM], time.time())
+    return refresh
+
+
+# ----------------------
+# Last-seen batching
+# ----------------------
+def _flush_last_seen(batch: dict):
+    """Write coalesced ``{(user_id, family_id): timestamp}`` entries."""
+    redis_client = get_redis_client()
+    if redis_client:
+        with track("redis"):
+            pipe = redis_client.pipeline(transaction=False)
+            for (user_id, family_id), seen_at in batch.items():
+                # XX: never resurrect a session that was revoked meanwhile
+                pipe.zadd(_index_key(user_id), {family_id: seen_at}, xx=True)
+            pipe.execute()
+        return
+
+    by_user = {}
+    for (user_id, family_id), seen_at in batch.items():
+        by_user.setdefault(user_id, {})[family_id] = seen_at
+    with track("cache"):
+        indexes = cache.get_many([_index_key(user_id) for user_id in by_user])
+        updated = {}
+        for user_id, seen in by_user.items():
+            key = _index_key(user_id)
+            index = indexes.get(key)
+            if not index:
+                continue
+            for family_id, seen_at in seen.items():
+                if family_id in index:
+                    index[family_id] = seen_at
+            updated[key] = index
+        if updated:
+            cache.set_many(updated, timeout=family_ttl())
+
+
+last_seen_buffer = WriteBehindBuffer(
+    "session_last_seen",
+    _flush_last_seen,
+    interval=getattr(settings, "SESSION_LAST_SEEN_FLUSH_SECONDS", 30),
+)
+
+
+def touch(user_id, family_id: str):
+    """Note activity on a session; written in batches, not per request."""
+    last_seen_buffer.add((user_id, family_id), time.time())
+
+
+# ----------------------
+# Listing and revocation
+# ----------------------
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def list_sessions(user_id) -> list[dict]:
+    """Live sessions of a user, most recently seen first."""
+    last_seen_buffer.flush()  # include this worker's pending activity
+    key = _index_key(user_id)
+    redis_client = get_redis_client()
+    if redis_client:
+        with track("redis"):
+            entries = [
+                (_decode(fid), ts) for fid, ts in redis_client.zrevrange(key, 0, -1, withscores=True)
+            ]
+            pipe = redis_client.pipeline(transaction=False)
+            for family_id, _ in entries:
+                pipe.hgetall(family_key(family_id))
+            families = [
+                {_decode(k): _decode(v) for k, v in family.items()} for family in pipe.execute()
+            ]
+    else:
+        with track("cache"):
+            index = cache.get(key) or {}
+            entries = sorted(index.items(), key=lambda item: item[1], reverse=True)
+            found = cache.get_many([family_key(family_id) for family_id, _ in entries])
+            families = [found.get(family_key(family_id)) or {} for family_id, _ in entries]
+
+    sessions, dead = [], []
+    for (family_id, seen_at), family in zip(entries, families):
+        if not family or str(family.get("uid")) != str(user_id):
+            dead.append(family_id)
+            continue
+        sessions.append({
+            "id": family_id,
+            "device": family.get("device", ""),
+            "ip": family.get("ip", ""),
+            "created": int(family.get("created", 0)),
+            "last_seen": int(seen_at),
+        })
+    if dead:
+        _unindex(user_id, *dead)
+    return sessions
+
+
+def _unindex(user_id, *family_ids):
+    key = _index_key(user_id)
+    try:
+        redis_client = get_redis_client()
+        if redis_client:
+            with track("redis"):
+                redis_client.zrem(key, *family_ids)
+        else:
+            with track("cache"):
+                index = cache.get(key) or {}
+                for family_id in family_ids:
+                    index.pop(family_id, None)
+                cache.set(key, index, timeout=family_ttl())
+    except Exception as e:
+        logger.error(f"Failed to prune sessions of user {user_id}: {e}")
+
+
+def revoke_session(user_id, family_id: str) -> bool:
+    """Revoke one of the user's sessions; False if it is not theirs."""
+    key = _index_key(user_id)
+    redis_client = get_redis_client()
+    if redis_client:
+        with track("redis"):
+            owned = redis_client.zscore(key, family_id) is not None
+    else:
+        with track("cache"):
+            owned = family_id in (cache.get(key) or {})
+    if not owned:
+        return False
+    revoke_family(family_id)
+    _unindex(user_id, family_id)
+    logger.info(f"Session {family_id} revoked for user {user_id}")
+    return True
+
+
+def _session_ids(user_ids) -> dict:
+    """Indexed family ids per user, read in one round trip."""
+    keys = [_index_key(user_id) for user_id in user_ids]
+    redis_client = get_redis_client()
+    if redis_client:
+        with track("redis"):
+            pipe = redis_client.pipeline(transaction=False)
+            for key in keys:
+                pipe.zrange(key, 0, -1)
+            found = [[_decode(family_id) for family_id in ids] for ids in pipe.execute()]
+    else:
+        with track("cache"):
+            indexes = cache.get_many(keys)
+        found = [list(indexes.get(key) or {}) for key in keys]
+    return dict(zip(user_ids, found))
+
+
+def revoke_all_sessions(*user_ids) -> int:
+    """Log the users out everywhere; returns the number of sessions revoked.
+
+    One read of the session indexes, then every family and index is deleted
+    in a single batch (two round trips however many sessions there are).
+    Inside a caller's ``batch()`` the deletes are only queued: the count is
+    of sessions to revoke, and store errors surface when that block exits.
+    """
+    queued = in_batch()
+    try:
+        sessions = _session_ids(user_ids)
+        with batch():
+            for user_id, family_ids in sessions.items():
+                for family_id in family_ids:
+                    revoke_family(family_id)
+                writer(get_store()).delete(_index_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to revoke all sessions of users {list(user_ids)}: {e}")
+        return 0
+    revoked = sum(len(family_ids) for family_ids in sessions.values())
+    logger.info(f"{'Queued revocation of' if queued else 'Revoked'} {revoked} sessions of {len(user_ids)} users")
+    return revoked
@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from auth_service.db_router import mark_recent_write
+from . import user_versions
+from .last_login import record_login
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User, dispatch_uid="users_mark_recent_write")
+def user_saved(sender, instance, **kwargs):
+    """Keep reads about a just-written user on the primary (see db_router)."""
+    mark_recent_write(f"user:{instance.pk}", f"email:{instance.email.lower()}")
+    # Only once the row is visible: bumped earlier, a concurrent /me could
+    # read the old row and send it under the new version's ETag
+    pk = instance.pk
+    transaction.on_commit(lambda: user_versions.bump(pk), using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=User, dispatch_uid="users_forget_version")
+def user_deleted(sender, instance, **kwargs):
+    """A deleted user's cached /me must never revalidate."""
+    pk = instance.pk
+    transaction.on_commit(lambda: user_versions.forget(pk), using=kwargs.get("using"))
+
+
+if getattr(settings, "LAST_LOGIN_BUFFER", True):
+    # Replace Django's per-login UPDATE with the batched writer (see last_login.py)
+    user_logged_in.disconnect(dispatch_uid="update_last_login")
+
+    @receiver(user_logged_in, dispatch_uid="users_buffered_last_login")
+    def buffered_update_last_login(sender, user, **kwargs):
+        """Queue last_login; the row is updated by the next batch flush."""
+        user.last_login = timezone.now()
+        record_login(user.pk, user.last_login.timestamp())
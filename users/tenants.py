@@ -0,0 +1,104 @@
+"""Tenant resolution and tenant-scoped keys.
+
+One deployment serves several products ("tenants"). Every request runs in a
+tenant picked from the ``TENANT_HEADER`` header, else from the Host matched
+against ``Tenant.domain``, else ``DEFAULT_TENANT``. Users are unique per
+(tenant, email), and keys that hold tenant data (reset and one-time tokens,
+lockout counters, idempotency records) are prefixed with ``t:<slug>:``. The
+default tenant keeps unprefixed keys, so single-tenant deployments and data
+written before tenants existed are unaffected.
+
+Resolution is served from a per-process LRU for ``TENANT_CACHE_SECONDS``;
+only a miss queries the ``users_tenant`` table.
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+
+from .kvstore import LocalLRUStore
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "t:"
+TENANT_CLAIM = "tenant"
+
+_current = ContextVar("current_tenant", default=None)
+_resolved = LocalLRUStore(max_entries=1024)
+
+
+@dataclass(frozen=True)
+class TenantInfo:
+    slug: str
+    is_active: bool
+    rate_limit_per_minute: int
+
+
+def default_tenant() -> str:
+    return getattr(settings, "DEFAULT_TENANT", "default")
+
+
+def current_tenant() -> str:
+    """Slug of the tenant the current request (or block) runs in."""
+    return _current.get() or default_tenant()
+
+
+@contextmanager
+def use_tenant(slug: str):
+    """Run the block as ``slug`` (management commands, tests)."""
+    token = _current.set(slug)
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+
+def scoped(key: str) -> str:
+    """``key`` in the current tenant's keyspace."""
+    slug = current_tenant()
+    if slug == default_tenant():
+        return key
+    return f"{KEY_PREFIX}{slug}:{key}"
+
+
+def _lookup(field: str, value: str) -> TenantInfo | None:
+    cache_key = f"{field}:{value}"
+    cached = _resolved.get(cache_key)
+    if cached is not None:
+        return cached or None  # False caches "no such tenant"
+
+    from .models import Tenant
+
+    tenant = Tenant.objects.filter(**{field: value}).only("slug", "is_active", "rate_limit_per_minute").first()
+    info = TenantInfo(tenant.slug, tenant.is_active, tenant.rate_limit_per_minute) if tenant else False
+    _resolved.set(cache_key, info, ttl=getattr(settings, "TENANT_CACHE_SECONDS", 60))
+    return info or None
+
+
+def resolve(request) -> TenantInfo | None:
+    """The tenant a request addresses; None if it names an unknown one."""
+    slug = request.headers.get(getattr(settings, "TENANT_HEADER", "X-Tenant"))
+    if slug:
+        return _lookup("slug", slug.strip().lower())
+    host = request.META.get("HTTP_HOST", "").split(":")[0].lower()
+    if host:
+        tenant = _lookup("domain", host)
+        if tenant is not None:
+            return tenant
+    # The default tenant works even before its row exists
+    return _lookup("slug", default_tenant()) or TenantInfo(default_tenant(), True, 0)
+
+
+def clear_cache(**kwargs):
+    """Drop this process's resolved tenants (Tenant save/delete receiver).
+
+    Other workers pick up the change within ``TENANT_CACHE_SECONDS``.
+    """
+    _resolved.clear()
+
+
+post_save.connect(clear_cache, sender="users.Tenant", dispatch_uid="tenants_clear_cache_save")
+post_delete.connect(clear_cache, sender="users.Tenant", dispatch_uid="tenants_clear_cache_delete")
@@ -0,0 +1,106 @@
+import pytest
+from django.test import override_settings
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+HOME = {'REMOTE_ADDR': '203.0.113.7', 'HTTP_USER_AGENT': 'Mozilla/5.0 Firefox/126.0',
+        'HTTP_CF_IPCOUNTRY': 'DE', 'HTTP_CLOUDFRONT_VIEWER_LATITUDE': '52.52',
+        'HTTP_CLOUDFRONT_VIEWER_LONGITUDE': '13.40'}
+AWAY = {'REMOTE_ADDR': '198.51.100.20', 'HTTP_USER_AGENT': 'curl/8.5.0',
+        'HTTP_CF_IPCOUNTRY': 'BR', 'HTTP_CLOUDFRONT_VIEWER_LATITUDE': '-23.55',
+        'HTTP_CLOUDFRONT_VIEWER_LONGITUDE': '-46.63'}
+
+def _login(client, meta):
+    return client.post('/api/auth/login/', {
+        'email': 'anomaly@example.com',
+        'password': 'StrongPass!123'
+    }, format='json', **meta)
+
+def test_profile_is_fixed_size_and_keeps_most_recent_slots():
+    """Test that profiles pack to a constant size and evict the oldest entries"""
+    from users import anomaly
+    profile = anomaly.Profile()
+    sizes = set()
+    for n in range(20):
+        login = anomaly.Login(user_id=1, email='a@example.com', tenant='default', at=1000.0 + n,
+                              network=anomaly.network_hash(f'10.0.{n}.1'), device=n + 1, country='DE')
+        anomaly.learn(profile, login)
+        sizes.add(len(profile.pack()))
+    restored = anomaly.Profile.unpack(profile.pack())
+    assert len(sizes) == 1
+    assert restored.logins == 20 and restored.countries[0] == 'DE'
+    assert restored.networks[0] == anomaly.network_hash('10.0.19.200')
+    assert anomaly.network_hash('10.0.0.1') not in restored.networks
+    assert restored.devices == [20, 19, 18, 17]
+    assert anomaly.device_hash('Mozilla/5.0 Firefox/126.0') == anomaly.device_hash('Mozilla/5.0 Firefox/127.1')
+
+@pytest.mark.django_db
+@override_settings(MAIL_QUEUE_BACKGROUND=False)
+def test_suspicious_login_alerts_and_requires_step_up():
+    """Test that a login from a new device across the globe forces a sign-in code next time"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from django.core import mail
+    from users import anomaly, audit, mail_queue
+    get_user_model().objects.create_user(email='anomaly@example.com', password='StrongPass!123', full_name='A')
+    client = APIClient()
+
+    for _ in range(3):
+        assert _login(client, HOME).status_code == 200
+    assert anomaly.drain() == 3
+    assert not [e for e in audit._get_buffer() if e['event'] == audit.LOGIN_ANOMALY]
+
+    # Served normally: the check runs after the response
+    tokens = _login(client, AWAY).json()
+    assert 'access' in tokens
+    assert anomaly.drain() == 1
+    alert = [e for e in audit._get_buffer() if e['event'] == audit.LOGIN_ANOMALY][-1]
+    assert set(alert['metadata']['rules']) == {'new_network', 'new_device', 'new_country', 'impossible_travel'}
+    assert alert['metadata']['step_up'] is True
+    mail_queue.flush()  # wherever the queue lives (process or Redis list)
+    assert any(m.to == ['anomaly@example.com'] for m in mail.outbox)
+
+    refresh = client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json')
+    assert refresh.status_code == 401
+    # The access token already handed out stops working too
+    assert client.get('/api/auth/me/', HTTP_AUTHORIZATION=f"Bearer {tokens['access']}").status_code == 401
+    response = _login(client, HOME)
+    assert response.status_code == 403 and response.json()['step_up'] == ['otp', 'magic_link']
+
+    with override_settings(DEBUG=True):
+        code = client.post('/api/auth/otp/', {'email': 'anomaly@example.com'}, format='json').json()['code']
+    assert client.post('/api/auth/otp/login/', {'email': 'anomaly@example.com', 'code': code},
+                       format='json').status_code == 200
+    assert _login(client, HOME).status_code == 200
+
+@pytest.mark.django_db
+def test_known_device_from_new_network_only_trains():
+    """Test that a single weak signal below the alert score is learnt, not flagged"""
+    from django.contrib.auth import get_user_model
+    from users import anomaly
+    user = get_user_model().objects.create_user(email='anomaly@example.com', password='StrongPass!123', full_name='A')
+
+    def login(ip, at):
+        return anomaly.Login(user_id=user.pk, email=user.email, tenant='default', at=at,
+                             network=anomaly.network_hash(ip), device=anomaly.device_hash('Safari/17.0'))
+
+    for n in range(3):
+        anomaly.process(login('203.0.113.7', 1000.0 + n))
+    assert anomaly.process(login('192.0.2.1', 2000.0)) == (['new_network'], 1)
+    assert anomaly.process(login('192.0.2.99', 3000.0)) == ([], 0)
+    assert not anomaly.step_up_required(user.pk)
+
+def test_full_queue_drops_oldest_logins(monkeypatch):
+    """Test that a stalled worker cannot grow the queue past ANOMALY_QUEUE_SIZE"""
+    from collections import deque
+    from users import anomaly
+    monkeypatch.setattr(anomaly, '_queue', deque(maxlen=2))
+    monkeypatch.setattr(anomaly, 'dropped', 0)
+    for n in range(5):
+        anomaly.observe(anomaly.Login(user_id=n, email='a@example.com', tenant='default', at=1000.0 + n,
+                                      network=1, device=1))
+    assert [login.user_id for login in anomaly._queue] == [3, 4]
+    assert anomaly.dropped == 3
@@ -0,0 +1,126 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+def _login(client, password):
+    return client.post('/api/auth/login/', {
+        'email': 'audit@example.com',
+        'password': password
+    }, format='json')
+
+@pytest.mark.django_db
+def test_logins_are_buffered_then_written_in_one_batch():
+    """Test that requests only buffer events and a flush writes them with one insert"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from users import audit
+    from users.models import AuditEvent
+    user = get_user_model().objects.create_user(email='audit@example.com', password='StrongPass!123', full_name='Audit')
+    client = APIClient()
+
+    assert _login(client, 'WrongPass!123').status_code == 400
+    assert _login(client, 'StrongPass!123').status_code == 200
+    assert not AuditEvent.objects.exists()
+
+    with CaptureQueriesContext(connection) as queries:
+        assert audit.flush() == 2
+    assert len(queries) == 1
+    failed, succeeded = AuditEvent.objects.order_by('id')
+    assert (failed.event, failed.email, failed.user_id) == (audit.LOGIN_FAILED, 'audit@example.com', None)
+    assert failed.metadata == {'reason': 'invalid_credentials'}
+    assert (succeeded.event, succeeded.user_id, succeeded.tenant) == (audit.LOGIN_SUCCEEDED, user.pk, 'default')
+    assert succeeded.metadata == {'method': 'password'}
+    assert succeeded.ip == '127.0.0.1'
+
+@pytest.mark.django_db
+def test_failed_flush_keeps_events_and_full_buffer_drops_oldest(monkeypatch):
+    """Test that a database error keeps the batch buffered and the ring buffer stays bounded"""
+    from collections import deque
+    from django.test import override_settings
+    from users import audit
+    from users.models import AuditEvent
+    monkeypatch.setattr(audit, '_buffer', deque(maxlen=4))
+    bulk_create = AuditEvent.objects.bulk_create
+    database_up = False
+
+    def flaky_bulk_create(objs, **kwargs):
+        if not database_up:
+            raise RuntimeError('database down')
+        return bulk_create(objs, **kwargs)
+
+    monkeypatch.setattr(AuditEvent.objects, 'bulk_create', flaky_bulk_create)
+    with override_settings(AUDIT_BATCH_SIZE=2):
+        for n in range(3):
+            audit.record(audit.LOGIN_FAILED, email=f'{n}@example.com')
+        with pytest.raises(RuntimeError):
+            audit.flush()
+        assert [entry['email'] for entry in audit._buffer] == ['0@example.com', '1@example.com', '2@example.com']
+
+        for n in range(3, 5):
+            audit.record(audit.LOGIN_FAILED, email=f'{n}@example.com')
+        database_up = True
+        assert audit.flush() == 4
+    emails = list(AuditEvent.objects.order_by('id').values_list('email', flat=True))
+    assert emails == ['1@example.com', '2@example.com', '3@example.com', '4@example.com']
+
+@pytest.mark.django_db
+def test_audit_events_pages_with_cursor():
+    """Test that users page through their own events and staff can pick a user"""
+    from datetime import timedelta
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from users.models import AuditEvent
+    User = get_user_model()
+    user = User.objects.create_user(email='audit@example.com', password='StrongPass!123', full_name='Audit')
+    staff = User.objects.create_user(email='staff@example.com', password='StrongPass!123', full_name='Staff',
+                                     is_staff=True)
+    now = timezone.now()
+    AuditEvent.objects.bulk_create(
+        [AuditEvent(created_at=now - timedelta(minutes=n), event='login_succeeded', tenant='default',
+                    user_id=user.pk, email=user.email) for n in range(5)]
+        + [AuditEvent(created_at=now, event='login_succeeded', tenant='default', user_id=staff.pk)]
+    )
+    client = APIClient()
+
+    client.force_authenticate(user)
+    first = client.get('/api/auth/audit-events/', {'limit': 3, 'user_id': staff.pk}).json()
+    assert [e['user_id'] for e in first['events']] == [user.pk] * 3
+    second = client.get('/api/auth/audit-events/', {'limit': 3, 'cursor': first['next_cursor']}).json()
+    assert len(second['events']) == 2 and second['next_cursor'] is None
+    times = [e['created_at'] for e in first['events'] + second['events']]
+    assert times == sorted(times, reverse=True) and len(set(times)) == 5
+    assert client.get('/api/auth/audit-events/', {'cursor': 'bogus'}).status_code == 400
+
+    client.force_authenticate(staff)
+    response = client.get('/api/auth/audit-events/', {'user_id': staff.pk}).json()
+    assert [e['user_id'] for e in response['events']] == [staff.pk]
+    assert len(client.get('/api/auth/audit-events/').json()['events']) == 6
+
+@pytest.mark.django_db
+@pytest.mark.skipif(connection.vendor != 'postgresql', reason='partitioned audit table is PostgreSQL only')
+def test_missed_month_is_moved_out_of_default_partition():
+    """Test that maintenance creates a month whose events already landed in the default partition"""
+    from datetime import timedelta
+    from django.utils import timezone
+    from users import audit
+    from users.models import AuditEvent
+    later = timezone.now() + timedelta(days=400)  # beyond the partitions created so far
+    event = AuditEvent.objects.create(created_at=later, event='login_succeeded', tenant='default')
+
+    def partition_of(pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM {audit.TABLE} WHERE id = %s', [pk])
+            return cursor.fetchone()[0]
+
+    assert partition_of(event.pk) == audit.DEFAULT_PARTITION
+    created = audit.ensure_partitions(connection, 14)
+    name = audit.partition_name(audit._month(later.date()))
+    assert name in created
+    assert partition_of(event.pk) == name
+    assert AuditEvent.objects.filter(pk=event.pk).exists()
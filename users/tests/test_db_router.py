@@ -0,0 +1,55 @@
+import pytest
+from django.test import override_settings
+
+REPLICA_SETTINGS = dict(DATABASE_REPLICAS=['replica_0'], REPLICA_MAX_LAG_SECONDS=5)
+
+@pytest.fixture
+def router(monkeypatch):
+    from auth_service import db_router
+    lags = {'replica_0': 0.0}
+    monkeypatch.setattr(db_router, 'replica_lag', lambda alias: lags[alias])
+    db_router.reset_pin()
+    router = db_router.PrimaryReplicaRouter()
+    router.lags = lags
+    yield router
+    db_router.reset_pin()
+
+@override_settings(**REPLICA_SETTINGS)
+def test_reads_go_to_replica_until_request_writes(router):
+    """Test that reads use the replica and stick to the primary after a write"""
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    assert router.db_for_read(User) == 'replica_0'
+    assert router.db_for_write(User) == 'default'
+    assert router.db_for_read(User) == 'default'
+
+@override_settings(**REPLICA_SETTINGS)
+def test_lagging_replica_falls_back_to_primary(router):
+    """Test that a replica beyond the lag threshold is skipped"""
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    router.lags['replica_0'] = 30.0
+    assert router.db_for_read(User) == 'default'
+
+@override_settings(**REPLICA_SETTINGS)
+def test_recent_write_pins_lookups_to_primary(router):
+    """Test read-your-writes stickiness across requests"""
+    from django.contrib.auth import get_user_model
+    from auth_service.db_router import mark_recent_write, read_your_writes
+    User = get_user_model()
+
+    with read_your_writes('email:sticky@example.com'):
+        assert router.db_for_read(User) == 'replica_0'
+
+    mark_recent_write('email:sticky@example.com')
+    with read_your_writes('email:sticky@example.com'):
+        assert router.db_for_read(User) == 'default'
+    assert router.db_for_read(User) == 'replica_0'
+
+@override_settings(**REPLICA_SETTINGS)
+def test_unreachable_replica_counts_as_lagging():
+    """Test that a replica whose lag check fails is never used"""
+    from auth_service.db_router import replica_lag
+    assert replica_lag('replica_0') == float('inf')
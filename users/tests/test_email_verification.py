@@ -0,0 +1,81 @@
+import pytest
+from django.core import mail
+from django.test import override_settings
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+@pytest.mark.django_db
+@override_settings(DEBUG=True, MAIL_QUEUE_BACKGROUND=False, MAIL_QUEUE_BATCH_SIZE=2)
+def test_register_queues_verification_mail_and_verifies(monkeypatch):
+    """Test that signup mail is sent in batches over one connection per batch"""
+    from rest_framework.test import APIClient
+    from django.core.mail.backends.locmem import EmailBackend
+    from users import mail_queue
+    client = APIClient()
+
+    connections = []
+    original_init = EmailBackend.__init__
+    def tracking_init(self, *args, **kwargs):
+        connections.append(self)
+        original_init(self, *args, **kwargs)
+    monkeypatch.setattr(EmailBackend, '__init__', tracking_init)
+
+    tokens = []
+    for n in range(3):
+        response = client.post('/api/auth/register/', {
+            'email': f'verify{n}@example.com', 'full_name': 'Verify Me',
+            'password': 'StrongPass!123', 'password_confirm': 'StrongPass!123',
+        }, format='json')
+        assert response.status_code == 201
+        assert response.json()['is_verified'] is False
+        tokens.append(response.json()['verification_token'])
+    assert mail.outbox == []
+
+    assert mail_queue.flush() == 3
+    assert len(mail.outbox) == 3
+    assert len(connections) == 2  # batches of 2 and 1
+    assert tokens[0] in mail.outbox[0].body
+
+    assert client.post('/api/auth/verify-email/', {'token': tokens[0]}, format='json').status_code == 200
+    assert client.post('/api/auth/verify-email/', {'token': tokens[0]}, format='json').status_code == 400
+    login = client.post('/api/auth/login/', {'email': 'verify0@example.com', 'password': 'StrongPass!123'}, format='json')
+    assert login.json()['user']['is_verified'] is True
+
+@pytest.mark.django_db
+@override_settings(EMAIL_VERIFICATION_REQUIRED=True, MAIL_QUEUE_BACKGROUND=False)
+def test_unverified_user_cannot_log_in_when_required():
+    """Test that password login is refused until the email is verified"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    User.objects.create_user(email='pending@example.com', password='StrongPass!123', full_name='Pending')
+    client = APIClient()
+
+    credentials = {'email': 'pending@example.com', 'password': 'StrongPass!123'}
+    assert client.post('/api/auth/login/', credentials, format='json').status_code == 403
+    User.objects.filter(email='pending@example.com').update(is_verified=True)
+    assert client.post('/api/auth/login/', credentials, format='json').status_code == 200
+
+@pytest.mark.django_db
+def test_purge_unverified_deletes_in_batches():
+    """Test that only old unverified accounts are purged, batch by batch"""
+    from datetime import timedelta
+    from io import StringIO
+    from django.core.management import call_command
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+    User = get_user_model()
+    old = timezone.now() - timedelta(days=10)
+    for n in range(5):
+        User.objects.create_user(email=f'stale{n}@example.com', full_name='Stale', date_joined=old)
+    User.objects.create_user(email='fresh@example.com', full_name='Fresh')
+    User.objects.create_user(email='kept@example.com', full_name='Kept', date_joined=old, is_verified=True)
+
+    out = StringIO()
+    call_command('purge_unverified', batch_size=2, pause=0, skip_checks=True, stdout=out)
+    assert 'Purged 5 unverified accounts' in out.getvalue()
+    assert out.getvalue().count('so far') == 3
+    assert set(User.objects.values_list('email', flat=True)) == {'fresh@example.com', 'kept@example.com'}
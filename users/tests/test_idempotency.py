@@ -0,0 +1,71 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+REGISTER = {
+    'full_name': 'Retry User',
+    'email': 'retry@example.com',
+    'password': 'StrongPass!123',
+    'password_confirm': 'StrongPass!123'
+}
+
+@pytest.mark.django_db
+def test_register_retry_replays_original_response(monkeypatch):
+    """Test that a retried register returns the first response without re-running"""
+    from rest_framework.test import APIClient
+    from users.serializers import RegisterSerializer
+    client = APIClient()
+
+    first = client.post('/api/auth/register/', REGISTER, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+    assert first.status_code == 201
+
+    def fail(*args, **kwargs):
+        raise AssertionError('validation ran again')
+    monkeypatch.setattr(RegisterSerializer, 'is_valid', fail)
+    retry = client.post('/api/auth/register/', REGISTER, format='json', HTTP_IDEMPOTENCY_KEY='abc-123')
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry['Idempotent-Replayed'] == 'true'
+
+@pytest.mark.django_db
+def test_idempotency_key_reuse_with_other_body_is_rejected():
+    """Test that the same key with a different payload gets 422"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+
+    client.post('/api/auth/register/', REGISTER, format='json', HTTP_IDEMPOTENCY_KEY='abc-456')
+    other = {**REGISTER, 'email': 'other@example.com'}
+    response = client.post('/api/auth/register/', other, format='json', HTTP_IDEMPOTENCY_KEY='abc-456')
+    assert response.status_code == 422
+
+    # Without a key, requests run normally (and hit the unique email check)
+    response = client.post('/api/auth/register/', REGISTER, format='json')
+    assert response.status_code == 400
+
+@pytest.mark.django_db
+def test_stored_fingerprint_is_keyed():
+    """Test that the stored record holds no unkeyed digest of the body (and its password)"""
+    import json
+    import hashlib
+    from types import SimpleNamespace
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+    from users import idempotency
+    from users.kvstore import get_store
+    client = APIClient()
+
+    client.post('/api/auth/register/', REGISTER, format='json', HTTP_IDEMPOTENCY_KEY='abc-789')
+    raw = get_store().get(idempotency._store_key('register', 'abc-789'))
+    assert REGISTER['password'] not in raw
+    body = json.dumps(REGISTER, sort_keys=True)
+    assert hashlib.sha256(f"POST:/api/auth/register/:{body}".encode()).hexdigest() not in raw
+
+    # The digest depends on SECRET_KEY, so a leaked store alone is not enough
+    request = SimpleNamespace(method='POST', path='/api/auth/register/', data=REGISTER)
+    stored = json.loads(raw)['fingerprint']
+    assert idempotency._fingerprint(request) == stored
+    with override_settings(SECRET_KEY='another-secret-key'):
+        assert idempotency._fingerprint(request) != stored
@@ -0,0 +1,140 @@
+import pytest
+
+@pytest.fixture(params=['redis', 'cache', 'local'])
+def store(request):
+    from django.core.cache import cache
+    from users import kvstore
+    cache.clear()
+    if request.param == 'redis':
+        import fakeredis
+        return kvstore.RedisStore(fakeredis.FakeRedis())
+    if request.param == 'cache':
+        return kvstore.CacheStore()
+    return kvstore.LocalLRUStore()
+
+def test_store_primitives(store):
+    """Test the operations every backend provides"""
+    assert store.get('k') is None
+    store.set('k', 'v', ttl=60)
+    assert store.get('k') == 'v'
+    assert store.get_many(['k', 'missing']) == ['v', None]
+    assert store.exists('k')
+    assert not store.add('k', 'other', ttl=60)
+    assert store.getdel('k') == 'v'
+    assert store.getdel('k') is None
+    assert store.add('k', 'new', ttl=60)
+    store.delete('k')
+    assert not store.exists('k')
+
+    assert store.incr('counter', ttl=60) == 1
+    assert store.incr('counter', ttl=60) == 2
+
+def test_store_pipeline(store):
+    """Test that a pipeline returns results in queue order"""
+    pipe = store.pipeline()
+    first = pipe.incr('a', ttl=60)
+    pipe.incr('a', ttl=60)
+    pipe.set('b', 'x', ttl=60)
+    pipe.get('b')
+    pipe.exists('c')
+    assert pipe.execute() == [1, 2, None, 'x', False]
+    assert first.value == 1
+
+def test_redis_pipeline_is_one_round_trip():
+    """Test that queued Redis operations go out in a single execute"""
+    import fakeredis
+    from users.kvstore import RedisStore
+    client = fakeredis.FakeRedis()
+    calls = []
+    original = client.pipeline
+    def pipeline(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+    client.pipeline = pipeline
+
+    store = RedisStore(client)
+    pipe = store.pipeline()
+    for n in range(10):
+        pipe.incr(f'c{n}', ttl=30)
+    assert pipe.execute() == [1] * 10
+    assert len(calls) == 1
+    assert 0 < client.ttl('c0') <= 30
+
+def test_local_lru_evicts_oldest():
+    """Test the LRU bound and expiry"""
+    from users.kvstore import LocalLRUStore
+    store = LocalLRUStore(max_entries=2)
+    store.set('a', 1)
+    store.set('b', 2)
+    store.get('a')
+    store.set('c', 3)
+    assert store.get('b') is None
+    assert store.get('a') == 1
+    store.set('gone', 1, ttl=-1)
+    assert store.get('gone') is None
+
+def test_layered_store_backfills_and_writes_through():
+    """Test that reads fill the local layer and atomic ops hit the bottom"""
+    from users.kvstore import LayeredStore, LocalLRUStore
+    local, shared = LocalLRUStore(), LocalLRUStore()
+    store = LayeredStore(local, shared, upper_ttl=5)
+
+    shared.set('k', 'v')
+    assert store.get('k') == 'v'
+    assert local.get('k') == 'v'
+    shared.delete('k')
+    assert store.get('k') == 'v'  # served locally until upper_ttl
+
+    store.set('w', 'x', ttl=60)
+    assert shared.get('w') == 'x' and local.get('w') == 'x'
+    assert store.getdel('w') == 'x'
+    assert local.get('w') is None and shared.get('w') is None
+    assert store.incr('n') == 1 and local.get('n') is None
+
+def test_batch_sends_helper_writes_in_one_round_trip():
+    """Test that helpers called inside utils.batch() share one pipeline"""
+    import fakeredis
+    from unittest import mock
+    from users import kvstore, utils
+    client = fakeredis.FakeRedis()
+    pipelines = []
+    original = client.pipeline
+    def pipeline(*args, **kwargs):
+        pipelines.append(kwargs.get('transaction', args[0] if args else True))
+        return original(*args, **kwargs)
+    client.pipeline = pipeline
+
+    with mock.patch.object(utils, 'get_redis_client', return_value=client):
+        client.set('pwdreset:abc', 'user@example.com')
+        with utils.batch(transaction=True):
+            allowed = utils.check_rate_limit('rl:user', 1, 60)
+            assert utils.validate_reset_token('abc') is True
+            assert utils.validate_reset_token('unknown') is False
+            # Token reads are answered at once, not queued as (truthy) Deferreds
+            assert utils.consume_reset_token('abc') == 'user@example.com'
+            assert utils.consume_reset_token('abc') is None
+            utils.check_rate_limit('rl:user', 1, 60)
+            assert isinstance(allowed, kvstore.Deferred) and not allowed.ready
+        assert allowed.value is True
+        # Reads are never queued: an unknown token is not blacklisted in a batch either
+        with utils.batch():
+            assert utils.is_token_blacklisted('not-blacklisted') is False
+        assert pipelines == [True]
+        assert client.get('rl:user') == b'2'
+
+        with pytest.raises(RuntimeError):
+            with utils.batch():
+                utils.check_rate_limit('rl:other', 1, 60)
+                raise RuntimeError('abort')
+        assert client.get('rl:other') is None
+
+def test_incomplete_store_fails_on_creation():
+    """Test that a backend missing an operation cannot be instantiated"""
+    from users.kvstore import KVStore
+
+    class GetOnlyStore(KVStore):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnlyStore()
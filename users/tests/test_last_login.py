@@ -0,0 +1,64 @@
+import pytest
+
+@pytest.fixture(params=['buffer', 'redis'])
+def backend(request, monkeypatch):
+    """Run with the in-process buffer and with a (fake) shared Redis hash."""
+    from users import last_login
+    client = None
+    if request.param == 'redis':
+        import fakeredis
+        client = fakeredis.FakeRedis()
+    monkeypatch.setattr(last_login, 'get_redis_client', lambda: client)
+    return client
+
+def _pending(client):
+    from users import last_login
+    return len(client.hgetall(last_login.PENDING_KEY)) if client else len(last_login.buffer)
+
+@pytest.mark.django_db
+def test_login_last_login_is_written_on_flush(backend):
+    """Test that login only queues last_login and a flush writes it in bulk"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+    from users import last_login
+    User = get_user_model()
+    user = User.objects.create_user(
+        email='seen@example.com', password='StrongPass!123', full_name='Seen User'
+    )
+
+    with CaptureQueriesContext(connection) as queries:
+        last_login.record_login(user.pk)
+    assert len(queries) == 0
+    assert _pending(backend) == 1
+
+    response = APIClient().post('/api/auth/login/', {
+        'email': 'seen@example.com',
+        'password': 'StrongPass!123'
+    }, format='json')
+    assert response.status_code == 200
+    assert _pending(backend) == 1  # coalesced per user
+
+    assert last_login.flush_due() == 1
+    assert _pending(backend) == 0
+    user.refresh_from_db()
+    assert user.last_login is not None
+    # Another worker in the same interval finds the Redis flush lock taken
+    last_login.record_login(user.pk)
+    assert last_login.flush_due() == (0 if backend else 1)
+
+@pytest.mark.django_db
+def test_write_last_logins_bulk_updates_rows():
+    """Test the bulk writer with several users at once"""
+    from django.contrib.auth import get_user_model
+    from users.last_login import write_last_logins
+    User = get_user_model()
+    users = [
+        User.objects.create_user(email=f'bulk{n}@example.com', password='x', full_name='Bulk')
+        for n in range(3)
+    ]
+
+    assert write_last_logins({user.pk: 1700000000 + n for n, user in enumerate(users)}) == 3
+    stamps = sorted(int(u.last_login.timestamp()) for u in User.objects.filter(email__startswith='bulk'))
+    assert stamps == [1700000000, 1700000001, 1700000002]
@@ -0,0 +1,48 @@
+import pytest
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+@pytest.mark.django_db
+def test_email_locked_out_without_hashing(monkeypatch):
+    """Test that repeated failures lock the email and later attempts skip the hasher"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from users import views
+    User = get_user_model()
+    client = APIClient()
+    User.objects.create_user(email='locked@example.com', password='CorrectPass!123', full_name='Locked')
+
+    for _ in range(5):
+        response = client.post('/api/auth/login/', {
+            'email': 'locked@example.com', 'password': 'WrongPassword!'
+        }, format='json')
+        assert response.status_code == 400
+
+    calls = []
+    monkeypatch.setattr(views, 'authenticate', lambda *a, **kw: calls.append(1))
+    response = client.post('/api/auth/login/', {
+        'email': 'LOCKED@example.com', 'password': 'CorrectPass!123'
+    }, format='json')
+    assert response.status_code == 429
+    assert int(response['Retry-After']) > 0
+    assert calls == []
+
+def test_lockout_grows_exponentially_and_attack_mode_tightens():
+    """Test lockout durations and the under-attack thresholds"""
+    from django.test import override_settings
+    from users import lockout
+
+    with override_settings(LOGIN_EMAIL_FAILURE_THRESHOLD=3, LOGIN_LOCKOUT_BASE_SECONDS=10,
+                           LOGIN_LOCKOUT_MAX_SECONDS=60, LOGIN_ATTACK_THRESHOLD=1000):
+        locks = [lockout.record_failure('a@example.com', '10.0.0.1') for _ in range(6)]
+        assert locks == [0, 0, 10, 20, 40, 60]
+        assert lockout.check('a@example.com', '10.0.0.2') > 0
+        assert lockout.check('b@example.com', '10.0.0.2') == 0
+
+    with override_settings(LOGIN_EMAIL_FAILURE_THRESHOLD=4, LOGIN_ATTACK_THRESHOLD=1):
+        # The first failure trips attack mode, halving the email threshold to 2
+        assert lockout.record_failure('c@example.com', '10.0.0.3') == 0
+        assert lockout.record_failure('c@example.com', '10.0.0.3') > 0
@@ -0,0 +1,81 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+def _client(user):
+    from rest_framework.test import APIClient
+    from rest_framework_simplejwt.tokens import RefreshToken
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    return client
+
+@pytest.mark.django_db
+def test_unchanged_profile_revalidates_without_queries(django_capture_on_commit_callbacks):
+    """Test that a matching If-None-Match gets a 304 without touching the database"""
+    from django.contrib.auth import get_user_model
+    user = get_user_model().objects.create_user(email='me@example.com', password='StrongPass!123', full_name='Me')
+    client = _client(user)
+
+    first = client.get('/api/auth/me/')
+    assert first.status_code == 200 and first.json()['email'] == 'me@example.com'
+    etag = first['ETag']
+    assert first['Cache-Control'] == 'private, no-cache'
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=f'W/{etag}')
+    assert response.status_code == 304 and response['ETag'] == etag
+    assert len(queries) == 0
+
+    user.full_name = 'Renamed'
+    with django_capture_on_commit_callbacks() as callbacks:
+        user.save()
+    # Not bumped before the commit: /me could still read the old row
+    assert client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+    for callback in callbacks:
+        callback()
+    changed = client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=etag)
+    assert changed.status_code == 200 and changed.json()['full_name'] == 'Renamed'
+    assert changed['ETag'] != etag
+
+@pytest.mark.django_db
+def test_sparse_fieldset_has_its_own_etag():
+    """Test that fields= narrows the payload, keys its ETag by selection and rejects unknown fields"""
+    from django.contrib.auth import get_user_model
+    user = get_user_model().objects.create_user(email='me@example.com', password='StrongPass!123', full_name='Me')
+    client = _client(user)
+
+    full = client.get('/api/auth/me/')
+    sparse = client.get('/api/auth/me/', {'fields': 'is_verified, email'})
+    assert sparse.json() == {'email': 'me@example.com', 'is_verified': False}
+    assert sparse['ETag'] != full['ETag']
+    same = client.get('/api/auth/me/', {'fields': 'email,is_verified'}, HTTP_IF_NONE_MATCH=sparse['ETag'])
+    assert same.status_code == 304
+    assert client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=sparse['ETag']).status_code == 200
+
+    invalid = client.get('/api/auth/me/', {'fields': 'email,password'})
+    assert invalid.status_code == 400 and invalid.json() == {'fields': ['Unknown fields: password']}
+
+@pytest.mark.django_db
+def test_bulk_deactivation_and_deletion_stop_revalidation(django_capture_on_commit_callbacks):
+    """Test that deactivate_users and deletes invalidate ETags, so the token is rejected"""
+    from django.core.management import call_command
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    user = User.objects.create_user(email='me@example.com', password='StrongPass!123', full_name='Me')
+    client = _client(user)
+    etag = client.get('/api/auth/me/')['ETag']
+
+    call_command('deactivate_users', 'me@example.com')
+    assert client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=etag).status_code == 401
+
+    other = User.objects.create_user(email='other@example.com', password='StrongPass!123', full_name='Other')
+    other_client = _client(other)
+    etag = other_client.get('/api/auth/me/')['ETag']
+    with django_capture_on_commit_callbacks(execute=True):
+        other.delete()
+    assert other_client.get('/api/auth/me/', HTTP_IF_NONE_MATCH=etag).status_code == 401
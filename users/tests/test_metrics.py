@@ -0,0 +1,39 @@
+import pytest
+from django.test import override_settings
+
+@pytest.mark.django_db
+@override_settings(METRICS_TOKEN='scrape-secret')
+def test_metrics_endpoint_reports_route_breakdown():
+    """Test that /metrics exposes per-route latency and component timings"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+    client = APIClient()
+
+    User.objects.create_user(
+        email='metrics@example.com',
+        password='MetricsPass!123',
+        full_name='Metrics User'
+    )
+    response = client.post('/api/auth/login/', {
+        'email': 'metrics@example.com',
+        'password': 'MetricsPass!123'
+    }, format='json')
+    assert response.status_code == 200
+
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == 403
+    response = client.get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+    assert response.status_code == 200
+    body = response.content.decode()
+    assert 'auth_request_latency_seconds_count{method="POST",route="api/auth/login/",status="200"}' in body
+    assert 'auth_request_component_seconds_count{component="hasher",route="api/auth/login/"}' in body
+    assert 'auth_request_db_queries_count{route="api/auth/login/"}' in body
+
+def test_metrics_without_token_is_hidden_in_production():
+    """Test that /metrics is 404 without METRICS_TOKEN unless explicitly made public"""
+    from django.test import Client
+    with override_settings(METRICS_TOKEN='', DEBUG=False):
+        assert Client().get('/metrics').status_code == 404
+        with override_settings(METRICS_PUBLIC=True):
+            assert Client().get('/metrics').status_code == 200
@@ -0,0 +1,44 @@
+import pytest
+
+@pytest.mark.django_db
+def test_api_routes_skip_session_and_csrf_middleware():
+    """Test that API requests use the lean pipeline and admin keeps the full one"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+
+    response = client.post('/api/auth/login/', {
+        'email': 'nobody@example.com',
+        'password': 'WrongPassword!'
+    }, format='json')
+    assert response.status_code == 400
+    assert response.headers['X-Frame-Options'] == 'DENY'
+    assert not response.cookies
+
+    response = client.get('/admin/login/')
+    assert response.status_code == 200
+    assert response.headers['X-Frame-Options'] == 'DENY'
+    assert 'csrftoken' in response.cookies
+
+@pytest.mark.django_db
+def test_admin_login_still_uses_sessions():
+    """Test that the admin can log in through the full middleware stack"""
+    from django.contrib.auth import get_user_model
+    from django.test import Client
+    User = get_user_model()
+    User.objects.create_superuser(
+        email='admin@example.com',
+        password='AdminPass!123',
+        full_name='Admin User'
+    )
+    client = Client(enforce_csrf_checks=True)
+
+    response = client.get('/admin/login/')
+    csrf_token = response.cookies['csrftoken'].value
+    response = client.post('/admin/login/?next=/admin/', {
+        'username': 'admin@example.com',
+        'password': 'AdminPass!123',
+        'csrfmiddlewaretoken': csrf_token,
+    })
+    assert response.status_code == 302
+    assert 'sessionid' in response.cookies
+    assert client.get('/admin/').status_code == 200
@@ -0,0 +1,79 @@
+import pytest
+from django.test import override_settings
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+def test_link_tokens_are_single_use_and_namespaced():
+    """Test that a link token is consumed once and only within its type"""
+    from users import one_time_tokens as ott
+
+    token = ott.issue(ott.MAGIC_LINK, 'user@example.com')
+    assert ott.consume(ott.RESET, token) is None
+    assert ott.exists(ott.MAGIC_LINK, token)
+    assert ott.consume(ott.MAGIC_LINK, token) == 'user@example.com'
+    assert ott.consume(ott.MAGIC_LINK, token) is None
+
+@override_settings(OTP_MAX_ATTEMPTS=3)
+def test_otp_code_is_discarded_after_max_attempts():
+    """Test that wrong guesses burn the code"""
+    from users import one_time_tokens as ott
+
+    code = ott.issue(ott.OTP, 'user@example.com')
+    wrong = f"{(int(code) + 1) % 10 ** 6:06d}"
+    assert not ott.verify_code(ott.OTP, 'user@example.com', wrong)
+    assert not ott.verify_code(ott.OTP, 'user@example.com', wrong)
+    assert not ott.verify_code(ott.OTP, 'user@example.com', wrong)
+    assert not ott.verify_code(ott.OTP, 'user@example.com', code)
+
+    code = ott.issue(ott.OTP, 'user@example.com')
+    assert ott.verify_code(ott.OTP, 'user@example.com', code)
+    assert not ott.verify_code(ott.OTP, 'user@example.com', code)
+
+@pytest.mark.django_db
+@override_settings(DEBUG=True)
+def test_passwordless_login_skips_password_hashing(monkeypatch):
+    """Test magic-link and OTP login without touching the password hasher"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import PBKDF2PasswordHasher
+    User = get_user_model()
+    User.objects.create_user(email='nopass@example.com', password='StrongPass!123', full_name='No Pass')
+    client = APIClient()
+
+    def fail(*args, **kwargs):
+        raise AssertionError('password hashed')
+    monkeypatch.setattr(PBKDF2PasswordHasher, 'encode', fail)
+
+    token = client.post('/api/auth/magic-link/', {'email': 'nopass@example.com'}, format='json').json()['token']
+    response = client.post('/api/auth/magic-link/login/', {'token': token}, format='json')
+    assert response.status_code == 200
+    assert response.json()['user']['email'] == 'nopass@example.com'
+    assert client.post('/api/auth/magic-link/login/', {'token': token}, format='json').status_code == 400
+
+    code = client.post('/api/auth/otp/', {'email': 'nopass@example.com'}, format='json').json()['code']
+    response = client.post('/api/auth/otp/login/', {'email': 'nopass@example.com', 'code': code}, format='json')
+    assert response.status_code == 200
+    assert 'access' in response.json()
+
+@pytest.mark.django_db
+@override_settings(MAIL_QUEUE_BACKGROUND=False)
+def test_unstored_token_is_not_mailed(monkeypatch):
+    """Test that a link token the store rejected is neither returned nor mailed"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from django.core import mail
+    from users import mail_queue, one_time_tokens
+    get_user_model().objects.create_user(email='down@example.com', password='StrongPass!123', full_name='Down')
+
+    class DownStore:
+        def set(self, *args, **kwargs):
+            raise ConnectionError('store down')
+    monkeypatch.setattr(one_time_tokens, 'get_store', lambda: DownStore())
+    assert one_time_tokens.issue(one_time_tokens.MAGIC_LINK, 'down@example.com') is None
+
+    response = APIClient().post('/api/auth/magic-link/', {'email': 'down@example.com'}, format='json')
+    assert response.status_code == 200
+    assert mail_queue.flush() == 0 and not mail.outbox  # nothing queued, locally or in Redis
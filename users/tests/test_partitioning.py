@@ -0,0 +1,50 @@
+import pytest
+from django.test import override_settings
+
+def test_partition_ranges_cover_every_shard():
+    """Test that physical partitions tile the shard id space without gaps"""
+    from users import partitioning
+
+    ranges = list(partitioning.partition_ranges(16))
+    assert len(ranges) == 16
+    assert ranges[0][1] == partitioning.LEGACY_ID_LIMIT
+    for (_, _, high), (_, low, _) in zip(ranges, ranges[1:]):
+        assert high == low
+    for shard in (0, 1, 255):
+        low, high = partitioning.shard_id_range(shard)
+        assert partitioning.shard_for_id(low) == shard
+        assert partitioning.shard_for_id(high - 1) == shard
+    with pytest.raises(ValueError):
+        list(partitioning.partition_ranges(10))
+
+def test_shard_uses_canonical_email():
+    """Test that case and whitespace variants of an email share a shard"""
+    from users.partitioning import shard_for_email
+    assert shard_for_email(' User@Example.com') == shard_for_email('user@example.com')
+
+@pytest.mark.django_db
+def test_email_lookup_only_searches_owning_shard():
+    """Test that UserManager.for_email restricts lookups to the email's id range"""
+    from django.contrib.auth import get_user_model
+    from django.db import IntegrityError
+    from users import partitioning
+    User = get_user_model()
+
+    legacy = User.objects.create_user(email='legacy@example.com', password='x', full_name='Legacy')
+    with override_settings(USERS_PARTITIONS=16):
+        email = 'sharded@example.com'
+        shard = partitioning.shard_for_email(email)
+        low, _ = partitioning.shard_id_range(shard)
+        User(id=low + 1, email=email, full_name='Sharded User').save()
+        assert User.objects.get_by_natural_key(email).id == low + 1
+        assert User.objects.for_email('legacy@example.com').get() == legacy
+
+        # The shard's unique index cannot see the legacy partition; save() does
+        legacy_low, _ = partitioning.shard_id_range(partitioning.shard_for_email(legacy.email))
+        with pytest.raises(IntegrityError):
+            User(id=legacy_low + 1, email=legacy.email, full_name='Duplicate').save()
+
+        # A row outside its email's shard range is invisible to lookups
+        wrong_low, _ = partitioning.shard_id_range((shard + 1) % partitioning.VIRTUAL_SHARDS)
+        User.objects.filter(id=low + 1).update(id=wrong_low + 1)
+        assert not User.objects.for_email(email).exists()
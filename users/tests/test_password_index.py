@@ -0,0 +1,44 @@
+import hashlib
+import pytest
+
+def test_build_index_merges_runs_and_dedupes(tmp_path):
+    """Test that the external sort builds a deduplicated, searchable index"""
+    from users.password_index import PasswordIndex, build_index
+    source = tmp_path / 'passwords.txt'
+    passwords = [f'password{n}' for n in range(1000)] + ['password1', 'letmein']
+    source.write_text('\n'.join(passwords) + '\n')
+    hibp = tmp_path / 'hibp.txt'
+    hibp.write_text(hashlib.sha1(b'Tr0ub4dor&3').hexdigest().upper() + ':42\n')
+
+    output = tmp_path / 'index.bin'
+    assert build_index([str(source), str(hibp)], output, chunk_size=64) == 1002
+
+    index = PasswordIndex(output)
+    assert 'password999' in index
+    assert 'letmein' in index
+    assert 'Tr0ub4dor&3' in index
+    assert 'correct horse battery staple' not in index
+    index.close()
+
+def test_breached_password_validator(tmp_path):
+    """Test that the validator rejects indexed passwords, case-insensitively for common ones"""
+    from django.core.exceptions import ValidationError
+    from users.password_index import build_index
+    from users.validators import BreachedPasswordValidator
+    source = tmp_path / 'common.txt'
+    source.write_text('qwertyuiop\n')
+    output = tmp_path / 'index.bin'
+    build_index([str(source)], output)
+
+    validator = BreachedPasswordValidator(path=str(output))
+    with pytest.raises(ValidationError) as excinfo:
+        validator.validate('QwertyUIOP')
+    assert excinfo.value.code == 'password_breached'
+    validator.validate('StrongPass!123')
+
+    # Missing index: Django's common password list still applies
+    missing = BreachedPasswordValidator(path=str(tmp_path / 'missing.bin'))
+    with pytest.raises(ValidationError) as excinfo:
+        missing.validate('qwertyuiop')
+    assert excinfo.value.code == 'password_too_common'
+    missing.validate('StrongPass!123')
@@ -0,0 +1,54 @@
+import runpy
+
+import pytest
+from django.conf import settings
+
+def test_after_fork_drops_inherited_clients_and_buffers(monkeypatch):
+    """Test that a forked worker starts without the master's Redis client or pending writes"""
+    import fakeredis
+    from django.db import connections
+    from auth_service.prefork import after_fork
+    from users import buffers, kvstore, mail_queue, utils
+
+    utils._redis_client = fakeredis.FakeRedis()
+    inherited_store = kvstore.get_store()
+    flushed = []
+    buffer = buffers.WriteBehindBuffer('prefork-test', flushed.append, interval=3600)
+    buffer.add('key', 'value')
+    mail_queue._local_queue.append({'to': ['a@example.com']})
+    # Keep the test database connection; it is not inherited here
+    monkeypatch.setattr(connections, 'all', lambda initialized_only=False: [])
+    try:
+        after_fork()
+        assert utils._redis_client is None
+        assert kvstore._redis_store is None
+        assert len(buffer) == 0
+        assert not mail_queue._local_queue
+        assert kvstore.get_store() is not inherited_store
+    finally:
+        utils._redis_client = None
+    buffer.flush()
+    assert flushed == []
+
+@pytest.mark.parametrize('profile,worker_class', [
+    ('cpu', 'sync'),
+    ('io', 'gthread'),
+    ('mixed', 'gthread'),
+    ('asgi', 'uvicorn.workers.UvicornWorker'),
+])
+def test_gunicorn_profiles(monkeypatch, profile, worker_class):
+    """Test that each gunicorn profile loads with recycling and preload on"""
+    monkeypatch.setenv('GUNICORN_PROFILE', profile)
+    monkeypatch.delenv('WEB_CONCURRENCY', raising=False)
+    config = runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
+    assert config['worker_class'] == worker_class
+    assert config['workers'] >= 1
+    assert config['preload_app'] is True
+    assert config['max_requests'] > 0 and config['max_requests_jitter'] > 0
+    assert config['wsgi_app'].endswith(':application')
+
+def test_gunicorn_rejects_unknown_profile(monkeypatch):
+    """Test that a typo in GUNICORN_PROFILE fails at startup"""
+    monkeypatch.setenv('GUNICORN_PROFILE', 'fast')
+    with pytest.raises(RuntimeError):
+        runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))
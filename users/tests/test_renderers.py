@@ -0,0 +1,39 @@
+import pytest
+
+@pytest.mark.django_db
+def test_serialize_user_matches_user_serializer():
+    """Test that the fast user payload is identical to UserSerializer output"""
+    from django.contrib.auth import get_user_model
+    from users.serializers import UserSerializer, serialize_user
+    User = get_user_model()
+
+    user = User.objects.create_user(
+        email='fast@example.com',
+        password='FastPass!123',
+        full_name='Zoë Fast'
+    )
+    user.refresh_from_db()
+    assert serialize_user(user) == UserSerializer(user).data
+
+def test_orjson_renderer_is_byte_compatible():
+    """Test that ORJSONRenderer produces the same bytes as DRF's JSONRenderer"""
+    import datetime
+    import decimal
+    import uuid
+    from django.utils.translation import gettext_lazy as _
+    from rest_framework.exceptions import ErrorDetail
+    from rest_framework.renderers import JSONRenderer
+    from users.renderers import ORJSONRenderer
+
+    payloads = [
+        {'id': 1, 'email': 'a@example.com', 'is_active': True,
+         'date_joined': datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc)},
+        {'detail': _('Invalid credentials')},
+        {'email': [ErrorDetail('Enter a valid email address.', code='invalid')]},
+        {'name': 'Zoë\u2028line\u2029', 'token': uuid.UUID(int=7), 'amount': decimal.Decimal('1.5')},
+        [1, None, 'x', {'nested': []}],
+    ]
+    for payload in payloads:
+        assert ORJSONRenderer().render(payload) == JSONRenderer().render(payload)
+    assert ORJSONRenderer().render(None) == b''
+    assert ORJSONRenderer().render({'n': 2 ** 70}) == JSONRenderer().render({'n': 2 ** 70})
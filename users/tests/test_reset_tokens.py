@@ -0,0 +1,73 @@
+import pytest
+from django.test import override_settings
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+def _user():
+    from django.contrib.auth import get_user_model
+    return get_user_model().objects.create_user(
+        email='signed@example.com', password='Initial!234', full_name='Signed User'
+    )
+
+@pytest.mark.django_db
+@override_settings(RESET_TOKEN_MODE='signed', DEBUG=True)
+def test_signed_reset_flow_stores_nothing_until_used(monkeypatch):
+    """Test that a signed reset token works once without being stored on issue"""
+    from rest_framework.test import APIClient
+    from users import kvstore
+    _user()
+    client = APIClient()
+
+    writes = []
+    store_class = type(kvstore.get_store())
+    original_set = store_class.set
+    def recording_set(self, key, *args, **kwargs):
+        writes.append(key)
+        return original_set(self, key, *args, **kwargs)
+    monkeypatch.setattr(store_class, 'set', recording_set)
+
+    response = client.post('/api/auth/forgot-password/', {'email': 'signed@example.com'}, format='json')
+    assert response.status_code == 200
+    token = response.json()['token']
+    assert not [key for key in writes if key.startswith('pwdreset')]
+
+    payload = {'token': token, 'new_password': 'NewPass!456', 'new_password_confirm': 'NewPass!456'}
+    assert client.post('/api/auth/reset-password/', payload, format='json').status_code == 200
+    assert client.post('/api/auth/reset-password/', payload, format='json').status_code == 400
+    response = client.post('/api/auth/login/', {
+        'email': 'signed@example.com', 'password': 'NewPass!456'
+    }, format='json')
+    assert response.status_code == 200
+
+@pytest.mark.django_db
+@override_settings(RESET_TOKEN_MODE='signed')
+def test_signed_reset_token_dies_with_the_password():
+    """Test that changing the password invalidates outstanding signed tokens"""
+    from users import utils
+    user = _user()
+    token = utils.generate_reset_token(user.email)
+    assert utils.validate_reset_token(token)
+
+    user.set_password('Changed!789')
+    user.save()
+    assert not utils.validate_reset_token(token)
+    assert utils.consume_reset_token(token) is None
+
+@pytest.mark.django_db
+@override_settings(RESET_TOKEN_MODE='signed')
+def test_signed_reset_token_rejects_tampering_expiry_and_other_tenants():
+    """Test that altered, expired or cross-tenant signed tokens are refused"""
+    from users import utils
+    from users.tenants import use_tenant
+    user = _user()
+    token = utils.generate_reset_token(user.email)
+
+    assert utils.consume_reset_token(token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB')) is None
+    with use_tenant('acme'):
+        assert utils.consume_reset_token(token) is None
+    with override_settings(RESET_TOKEN_TTL_SECONDS=-1):
+        assert utils.consume_reset_token(token) is None
+    assert utils.consume_reset_token(token) == user.email
@@ -0,0 +1,74 @@
+import time
+import multiprocessing
+
+import pytest
+
+def _cache(path, **options):
+    from auth_service.shm_cache import SharedMemoryCache
+    options = {'STRIPES': 4, 'SLOTS_PER_STRIPE': 8, 'SLOT_SIZE': 256, **options}
+    return SharedMemoryCache(str(path), {'OPTIONS': options})
+
+def _count(path, times):
+    cache = _cache(path)
+    for _ in range(times):
+        cache.incr('hits')
+
+def test_basic_operations_and_expiry(tmp_path):
+    """Test get/set/add/incr/delete/touch and TTLs"""
+    cache = _cache(tmp_path / 'cache')
+    cache.set('a', {'x': 1})
+    assert cache.get('a') == {'x': 1}
+    assert not cache.add('a', 'other')
+    assert cache.add('b', 5, timeout=60)
+    assert cache.incr('b', 2) == 7
+    assert cache.get_many(['a', 'b', 'c']) == {'a': {'x': 1}, 'b': 7}
+    with pytest.raises(ValueError):
+        cache.incr('missing')
+
+    assert cache.delete('a')
+    assert not cache.delete('a')
+    assert cache.get('a', 'gone') == 'gone'
+
+    cache.set('short', 1, timeout=0.05)
+    assert cache.touch('b', timeout=None)
+    time.sleep(0.1)
+    assert cache.get('short') is None
+    assert cache.add('short', 2)
+    assert cache.get('b') == 7
+
+    cache.clear()
+    assert cache.get('b') is None
+
+def test_instances_share_one_mapping(tmp_path):
+    """Test that separate instances (threads, workers) see the same entries"""
+    first, second = _cache(tmp_path / 'cache'), _cache(tmp_path / 'cache')
+    first.set('token', 'user@example.com')
+    assert second.get('token') == 'user@example.com'
+    assert second.delete('token')
+    assert first.get('token') is None
+
+def test_counters_are_atomic_across_processes(tmp_path):
+    """Test that concurrent increments from several processes are never lost"""
+    path = tmp_path / 'cache'
+    _cache(path).set('hits', 0)
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=_count, args=(path, 200)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+    assert _cache(path).get('hits') == 800
+
+def test_full_stripes_evict_and_oversized_values_are_skipped(tmp_path):
+    """Test that a full table keeps accepting writes and large values are not cached"""
+    cache = _cache(tmp_path / 'cache', STRIPES=1, SLOTS_PER_STRIPE=4)
+    cache.set('keep', 'forever', timeout=None)
+    for n in range(10):
+        cache.set(f'key{n}', n, timeout=60 + n)
+    assert cache.get('key9') == 9
+    assert cache.get('keep') == 'forever'
+
+    cache.set('big', 'small')
+    cache.set('big', 'x' * 1000)
+    assert cache.get('big') is None
@@ -0,0 +1,111 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    from users import tenants
+    cache.clear()
+    tenants.clear_cache()
+
+def _tenant(slug, **fields):
+    from users.models import Tenant
+    return Tenant.objects.create(slug=slug, name=slug.title(), **fields)
+
+def _login(client, tenant, password='StrongPass!123'):
+    return client.post('/api/auth/login/', {
+        'email': 'shared@example.com',
+        'password': password
+    }, format='json', HTTP_X_TENANT=tenant)
+
+@pytest.mark.django_db
+def test_same_email_in_two_tenants():
+    """Test that an email can register once per tenant and logins stay apart"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from users.tenants import use_tenant
+    User = get_user_model()
+    _tenant('acme')
+    client = APIClient()
+
+    User.objects.create_user(email='shared@example.com', password='StrongPass!123', full_name='Default')
+    with use_tenant('acme'):
+        User.objects.create_user(email='shared@example.com', password='OtherPass!456', full_name='Acme')
+
+    assert _login(client, 'default').status_code == 200
+    assert _login(client, 'acme').status_code == 400
+    response = _login(client, 'acme', password='OtherPass!456')
+    assert response.status_code == 200
+    assert response.json()['user']['full_name'] == 'Acme'
+
+@pytest.mark.django_db
+def test_token_is_rejected_in_other_tenant():
+    """Test that access and refresh tokens only work in the issuing tenant"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    _tenant('acme')
+    get_user_model().objects.create_user(email='shared@example.com', password='StrongPass!123', full_name='Default')
+    client = APIClient()
+    tokens = _login(client, 'default').json()
+
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+    assert client.get('/api/auth/me/', HTTP_X_TENANT='default').status_code == 200
+    assert client.get('/api/auth/me/', HTTP_X_TENANT='acme').status_code == 401
+
+    client.credentials()
+    response = client.post('/api/auth/token/refresh/', {'refresh': tokens['refresh']}, format='json',
+                           HTTP_X_TENANT='acme')
+    assert response.status_code == 401
+
+@pytest.mark.django_db
+def test_one_time_tokens_are_tenant_scoped():
+    """Test that a reset token issued in one tenant cannot be used in another"""
+    from users import one_time_tokens
+    from users.tenants import use_tenant
+    with use_tenant('acme'):
+        token = one_time_tokens.issue(one_time_tokens.RESET, 'shared@example.com')
+    with use_tenant('other'):
+        assert one_time_tokens.consume(one_time_tokens.RESET, token) is None
+    assert one_time_tokens.consume(one_time_tokens.RESET, token) is None
+    with use_tenant('acme'):
+        assert one_time_tokens.consume(one_time_tokens.RESET, token) == 'shared@example.com'
+
+@pytest.mark.django_db
+def test_unknown_or_inactive_tenant_is_rejected():
+    """Test that requests naming an unknown or disabled tenant get a 400"""
+    from rest_framework.test import APIClient
+    _tenant('closed', is_active=False)
+    client = APIClient()
+    assert _login(client, 'nope').status_code == 400
+    assert _login(client, 'closed').status_code == 400
+
+@pytest.mark.django_db
+def test_tenant_resolution_is_cached():
+    """Test that resolving a tenant again (by header or domain) runs no query"""
+    from django.test import RequestFactory
+    from users import tenants
+    _tenant('acme', domain='acme.example.com')
+    factory = RequestFactory()
+    by_header = factory.get('/', HTTP_X_TENANT='acme')
+    by_host = factory.get('/', HTTP_HOST='acme.example.com')
+
+    assert tenants.resolve(by_header).slug == 'acme'
+    assert tenants.resolve(by_host).slug == 'acme'
+    with CaptureQueriesContext(connection) as queries:
+        assert tenants.resolve(by_header).slug == 'acme'
+        assert tenants.resolve(by_host).slug == 'acme'
+    assert len(queries) == 0
+
+@pytest.mark.django_db
+def test_tenant_rate_limit_budget():
+    """Test that a tenant's per-minute budget is shared and enforced with a 429"""
+    from rest_framework.test import APIClient
+    _tenant('small', rate_limit_per_minute=2)
+    client = APIClient()
+    assert client.get('/health/', HTTP_X_TENANT='small').status_code != 429
+    assert client.get('/health/', HTTP_X_TENANT='small').status_code != 429
+    response = client.get('/health/', HTTP_X_TENANT='small')
+    assert response.status_code == 429
+    # Other tenants have their own budget
+    assert client.get('/health/').status_code != 429
@@ -0,0 +1,143 @@
+import pytest
+from django.test import override_settings
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    from django.core.cache import cache
+    cache.clear()
+
+def _login(client):
+    from django.contrib.auth import get_user_model
+    get_user_model().objects.create_user(
+        email='family@example.com', password='StrongPass!123', full_name='Family User'
+    )
+    response = client.post('/api/auth/login/', {
+        'email': 'family@example.com',
+        'password': 'StrongPass!123'
+    }, format='json')
+    assert response.status_code == 200
+    return response.json()['refresh']
+
+@pytest.mark.django_db
+def test_refresh_rotates_within_family():
+    """Test that refresh returns a new pair and the new refresh token works"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+    first = _login(client)
+
+    response = client.post('/api/auth/token/refresh/', {'refresh': first}, format='json')
+    assert response.status_code == 200
+    second = response.json()['refresh']
+    assert 'access' in response.json()
+    assert second != first
+
+    response = client.post('/api/auth/token/refresh/', {'refresh': second}, format='json')
+    assert response.status_code == 200
+
+@pytest.mark.django_db
+def test_refresh_token_reuse_revokes_family():
+    """Test that replaying a rotated refresh token kills the whole session"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+    first = _login(client)
+
+    second = client.post('/api/auth/token/refresh/', {'refresh': first}, format='json').json()['refresh']
+
+    # Replay of the already-rotated token
+    response = client.post('/api/auth/token/refresh/', {'refresh': first}, format='json')
+    assert response.status_code == 401
+
+    # The legitimate latest token is revoked along with it
+    response = client.post('/api/auth/token/refresh/', {'refresh': second}, format='json')
+    assert response.status_code == 401
+
+@pytest.mark.django_db
+def test_sessions_list_and_revoke():
+    """Test that logins show up as sessions and can be revoked"""
+    from rest_framework.test import APIClient
+    from users.sessions import last_seen_buffer
+    client = APIClient()
+    refresh = _login(client)
+    response = client.post('/api/auth/login/', {
+        'email': 'family@example.com',
+        'password': 'StrongPass!123'
+    }, format='json', HTTP_USER_AGENT='Phone')
+    access = response.json()['access']
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    response = client.get('/api/auth/sessions/')
+    assert response.status_code == 200
+    sessions = response.json()
+    assert len(sessions) == 2
+    current = [s for s in sessions if s['current']]
+    assert len(current) == 1 and current[0]['device'] == 'Phone'
+    assert len(last_seen_buffer) == 0  # listing flushed the pending touch
+
+    other = [s for s in sessions if not s['current']][0]
+    assert client.delete(f"/api/auth/sessions/{other['id']}/").status_code == 204
+    assert client.delete(f"/api/auth/sessions/{other['id']}/").status_code == 404
+    assert len(client.get('/api/auth/sessions/').json()) == 1
+
+    # The revoked session's refresh token no longer works
+    response = client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+    assert response.status_code == 401
+
+    # Revoking the current session cuts off its access token right away
+    assert client.delete(f"/api/auth/sessions/{current[0]['id']}/").status_code == 204
+    response = client.get('/api/auth/sessions/')
+    assert response.status_code == 401 and response.json()['code'] == 'session_revoked'
+
+@pytest.mark.django_db
+@override_settings(DEBUG=True)
+def test_password_reset_logs_out_everywhere():
+    """Test that a password reset revokes every refresh-token family"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+    refresh = _login(client)
+    second = client.post('/api/auth/login/', {'email': 'family@example.com', 'password': 'StrongPass!123'},
+                         format='json').json()['refresh']
+
+    token = client.post('/api/auth/forgot-password/', {'email': 'family@example.com'}, format='json').json()['token']
+    response = client.post('/api/auth/reset-password/', {
+        'token': token, 'new_password': 'OtherPass!456', 'new_password_confirm': 'OtherPass!456',
+    }, format='json')
+    assert response.status_code == 200
+    for old in (refresh, second):
+        assert client.post('/api/auth/token/refresh/', {'refresh': old}, format='json').status_code == 401
+
+@pytest.mark.django_db
+@override_settings(DEBUG=True)
+def test_password_reset_survives_store_error_after_save(monkeypatch):
+    """Test that a failing revocation batch is logged, not turned into a 500 for a done reset"""
+    from rest_framework.test import APIClient
+    from django.contrib.auth import get_user_model
+    from users import kvstore
+    client = APIClient()
+    _login(client)
+    token = client.post('/api/auth/forgot-password/', {'email': 'family@example.com'}, format='json').json()['token']
+
+    def fail(self):
+        raise ConnectionError('store down')
+    monkeypatch.setattr(kvstore.Batch, 'execute', fail)
+    response = client.post('/api/auth/reset-password/', {
+        'token': token, 'new_password': 'OtherPass!456', 'new_password_confirm': 'OtherPass!456',
+    }, format='json')
+    assert response.status_code == 200
+    assert get_user_model().objects.get(email='family@example.com').check_password('OtherPass!456')
+
+@pytest.mark.django_db
+def test_revoke_all_sessions_endpoint():
+    """Test logging out of every session at once"""
+    from rest_framework.test import APIClient
+    client = APIClient()
+    refresh = _login(client)
+    access = client.post('/api/auth/login/', {'email': 'family@example.com', 'password': 'StrongPass!123'},
+                         format='json').json()['access']
+
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    response = client.post('/api/auth/sessions/revoke-all/')
+    assert response.status_code == 200
+    assert response.json() == {'revoked': 2}
+    # The access token used for the request belonged to a revoked session too
+    assert client.get('/api/auth/sessions/').status_code == 401
+    assert client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json').status_code == 401
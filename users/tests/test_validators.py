@@ -0,0 +1,48 @@
+import pytest
+
+def test_pipeline_stops_before_expensive_stages(monkeypatch):
+    """Test that a failing cheap stage skips the similarity validator"""
+    from django.contrib.auth.password_validation import UserAttributeSimilarityValidator
+    from django.core.exceptions import ValidationError
+    from users.validators import password_validator_stages, validate_password
+
+    stages = password_validator_stages()
+    assert type(stages[0][0]).__name__ == 'MinimumLengthValidator'
+    assert isinstance(stages[-1][0], UserAttributeSimilarityValidator)
+
+    calls = []
+    monkeypatch.setattr(UserAttributeSimilarityValidator, 'validate', lambda *a, **kw: calls.append(1))
+    with pytest.raises(ValidationError):
+        validate_password('short')
+    assert calls == []
+    with pytest.raises(ValidationError) as excinfo:
+        validate_password('1234')
+    assert {error.code for error in excinfo.value.error_list} == {'password_too_short', 'password_entirely_numeric'}
+    validate_password('Unusual!Pass-9041')
+    assert calls == [1]
+
+@pytest.mark.django_db
+def test_register_checks_similarity_and_mismatch_first():
+    """Test register reports mismatch before validators and now checks similarity"""
+    from users.serializers import RegisterSerializer
+
+    serializer = RegisterSerializer(data={
+        'email': 'jonathan.smithers@example.com', 'full_name': 'Jonathan Smithers',
+        'password': '123', 'password_confirm': '1234',
+    })
+    assert not serializer.is_valid()
+    assert 'password' in serializer.errors  # min_length on the field itself
+
+    serializer = RegisterSerializer(data={
+        'email': 'jonathan.smithers@example.com', 'full_name': 'Jonathan Smithers',
+        'password': 'Password!123', 'password_confirm': 'Password!124',
+    })
+    assert not serializer.is_valid()
+    assert serializer.errors['non_field_errors'] == ["Passwords don't match"]
+
+    serializer = RegisterSerializer(data={
+        'email': 'jonathan.smithers@example.com', 'full_name': 'Jonathan Smithers',
+        'password': 'jonathansmithers', 'password_confirm': 'jonathansmithers',
+    })
+    assert not serializer.is_valid()
+    assert 'password' in serializer.errors
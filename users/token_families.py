@@ -0,0 +1,180 @@
+import time
+import uuid
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from auth_service.metrics import track
+from .kvstore import get_store, writer
+from .tenants import TENANT_CLAIM, current_tenant, default_tenant
+from .utils import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# ----------------------
+# Refresh-token families
+# ----------------------
+# Every login starts a family: one small hash {uid, gen, created} that lives as
+# long as the newest refresh token. Refresh tokens carry the family id and the
+# generation they were issued at. Rotating checks the generation in O(1) and
+# bumps it; presenting an older generation means a refresh token was replayed,
+# so the whole family is deleted. Expiry is left to the key TTL. Access tokens
+# carry the family id too and are rejected once their family is gone, so
+# revoking a session also cuts off the access tokens already handed out.
+FAMILY_PREFIX = "rtfam:"
+FAMILY_CLAIM = "fam"
+GENERATION_CLAIM = "gen"
+
+# KEYS[1] family hash; ARGV[1] presented generation, ARGV[2] ttl seconds,
+# ARGV[3..] field/value pairs to store alongside (e.g. the client IP).
+# Returns the new generation, -1 for an unknown family, -2 on reuse.
+_ROTATE_SCRIPT = """
+local gen = redis.call('HGET', KEYS[1], 'gen')
+if not gen then return -1 end
+if tonumber(gen) ~= tonumber(ARGV[1]) then
+    redis.call('DEL', KEYS[1])
+    return -2
+end
+local new_gen = redis.call('HINCRBY', KEYS[1], 'gen', 1)
+if #ARGV > 2 then redis.call('HSET', KEYS[1], unpack(ARGV, 3)) end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return new_gen
+"""
+
+
+class TokenReuseDetected(InvalidToken):
+    default_detail = _("Refresh token reuse detected; session revoked")
+    default_code = "token_reused"
+
+
+def family_key(family_id: str) -> str:
+    return f"{FAMILY_PREFIX}{family_id}"
+
+
+def family_ttl() -> int:
+    return int(settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds())
+
+
+def _with_family(refresh: RefreshToken, family_id: str, generation: int) -> RefreshToken:
+    # Copied into the access token too; authentication rejects other tenants
+    refresh[TENANT_CLAIM] = current_tenant()
+    refresh[FAMILY_CLAIM] = family_id
+    refresh[GENERATION_CLAIM] = generation
+    return refresh
+
+
+def issue_token_pair(user, **meta) -> RefreshToken:
+    """Start a new family for a login and return its first refresh token.
+
+    ``meta`` (strings) is stored in the family hash. ``str(refresh.access_token)``
+    carries the family id too.
+    """
+    family_id = uuid.uuid4().hex
+    key = family_key(family_id)
+    family = {**meta, "uid": str(user.pk), "gen": 0, "created": int(time.time())}
+    ttl = family_ttl()
+
+    try:
+        redis_client = get_redis_client()
+        if redis_client:
+            with track("redis"):
+                pipe = redis_client.pipeline()
+                pipe.hset(key, mapping=family)
+                pipe.expire(key, ttl)
+                pipe.execute()
+        else:
+            with track("cache"):
+                cache.set(key, family, timeout=ttl)
+    except Exception as e:
+        # The tokens are rejected on first use, as if the session were revoked
+        logger.error(f"Failed to store refresh-token family for user {user.pk}: {e}")
+
+    return _with_family(RefreshToken.for_user(user), family_id, 0)
+
+
+def _advance_generation(family_id: str, generation: int, meta: dict) -> int:
+    """Check-and-bump the family generation; same return codes as the script."""
+    key = family_key(family_id)
+    ttl = family_ttl()
+
+    redis_client = get_redis_client()
+    if redis_client:
+        pairs = [item for field_value in meta.items() for item in field_value]
+        with track("redis"):
+            return int(redis_client.eval(_ROTATE_SCRIPT, 1, key, generation, ttl, *pairs))
+
+    # Django cache fallback: not atomic across workers, reuse detection is best effort
+    with track("cache"):
+        family = cache.get(key)
+        if family is None:
+            return -1
+        if int(family["gen"]) != generation:
+            cache.delete(key)
+            return -2
+        family.update(meta)
+        family["gen"] = generation + 1
+        cache.set(key, family, timeout=ttl)
+        return family["gen"]
+
+
+def rotate_refresh_token(raw_token: str, user_model, **meta) -> RefreshToken:
+    """Exchange a refresh token for the next one in its family.
+
+    ``meta`` overwrites the matching fields of the family hash.
+
+    Raises ``InvalidToken`` for bad, expired, unknown or revoked tokens and
+    ``TokenReuseDetected`` (after revoking the family) on replay.
+    """
+    try:
+        refresh = RefreshToken(raw_token)
+    except TokenError as e:
+        raise InvalidToken(str(e))
+
+    family_id = refresh.get(FAMILY_CLAIM)
+    generation = refresh.get(GENERATION_CLAIM)
+    if family_id is None or generation is None:
+        raise InvalidToken(_("Refresh token has no session"))
+    if refresh.get(TENANT_CLAIM, default_tenant()) != current_tenant():
+        raise InvalidToken(_("Token belongs to another tenant"))
+
+    try:
+        new_generation = _advance_generation(family_id, int(generation), meta)
+    except Exception as e:
+        logger.error(f"Refresh-token family check failed for {family_id}: {e}")
+        raise InvalidToken(_("Unable to verify refresh token"))
+
+    if new_generation == -2:
+        logger.warning(f"Refresh token reuse detected, family revoked: {family_id}")
+        raise TokenReuseDetected()
+    if new_generation < 0:
+        raise InvalidToken(_("Session expired or revoked"))
+
+    user_id = refresh.get(api_settings.USER_ID_CLAIM)
+    user = user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+    if user is None or not user.is_active or user.tenant != current_tenant():
+        revoke_family(family_id)
+        raise InvalidToken(_("User not found or inactive"))
+
+    return _with_family(RefreshToken.for_user(user), family_id, new_generation)
+
+
+def family_active(family_id: str) -> bool:
+    """Whether a session still exists (fails open if the store is unreachable)."""
+    try:
+        return get_store().exists(family_key(family_id))
+    except Exception as e:
+        logger.error(f"Failed to check refresh-token family {family_id}: {e}")
+        return True
+
+
+def revoke_family(family_id: str):
+    """Kill every refresh token of a login session."""
+    try:
+        writer(get_store()).delete(family_key(family_id))
+    except Exception as e:
+        logger.error(f"Failed to revoke refresh-token family {family_id}: {e}")
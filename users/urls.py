@@ -4,7 +4,18 @@ from . import views
 urlpatterns = [
     path("register/", views.register, name="register"),
     path("login/", views.login, name="login"),
+    path("token/refresh/", views.refresh_token, name="token_refresh"),
+    path("verify-email/", views.verify_email, name="verify_email"),
+    path("verify-email/resend/", views.resend_verification, name="resend_verification"),
+    path("magic-link/", views.magic_link, name="magic_link"),
+    path("magic-link/login/", views.magic_link_login, name="magic_link_login"),
+    path("otp/", views.otp, name="otp"),
+    path("otp/login/", views.otp_login, name="otp_login"),
     path("forgot-password/", views.forgot_password, name="forgot_password"),
     path("reset-password/", views.reset_password, name="reset_password"),
     path("me/", views.me, name="me"),
+    path("sessions/", views.sessions, name="sessions"),
+    path("sessions/revoke-all/", views.revoke_all_user_sessions, name="revoke_all_sessions"),
+    path("sessions/<str:session_id>/", views.revoke_user_session, name="revoke_session"),
+    path("audit-events/", views.audit_events, name="audit_events"),
 ]
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""Per-user version counters for conditional GETs of ``/me``.
+
+Every write to a user bumps ``userver:<id>`` in the shared store
+(``post_save`` and ``post_delete`` receivers in ``signals.py``, plus explicit
+bumps after bulk ``update()`` calls, which send no signal). The ETag of a
+``/me`` response is derived from that counter and the requested fields, so a
+revalidation is answered from the token and one store read: no database
+query and no serialization.
+
+A missing counter (new user, evicted or expired key) is seeded from the
+clock in milliseconds rather than from zero, so a re-created counter never
+repeats a version an old ETag was built from. Keys are not tenant-scoped:
+user ids are global, and writes happen outside the owner's tenant (admin,
+management commands).
+"""
+import time
+import logging
+
+from django.conf import settings
+
+from .kvstore import batch, get_store, writer
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "userver:"
+# Bump when the /me representation changes, so cached copies are refetched
+REPRESENTATION = 1
+
+
+def _key(user_id) -> str:
+    return f"{PREFIX}{user_id}"
+
+
+def _ttl() -> int:
+    return getattr(settings, "USER_VERSION_TTL_SECONDS", 30 * 86400)
+
+
+def _seed() -> int:
+    return int(time.time() * 1000)
+
+
+def get(user_id) -> int | None:
+    """Current version, or None if unknown (or the store is unreachable)."""
+    try:
+        value = get_store().get(_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to read version of user {user_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+def ensure(user_id) -> int | None:
+    """Current version, creating the counter if needed.
+
+    Call it before reading the user row: a write that lands in between then
+    bumps past the returned version, never the other way round.
+    """
+    key = _key(user_id)
+    try:
+        pipe = get_store().pipeline()
+        pipe.add(key, _seed(), ttl=_ttl())
+        pipe.get(key)
+        _, value = pipe.execute()
+    except Exception as e:
+        logger.error(f"Failed to create version of user {user_id}: {e}")
+        return None
+    return int(value) if value is not None else None
+
+
+def bump(*user_ids):
+    """Invalidate every ETag issued for these users, in one round trip
+    (or as part of the caller's ``batch()``)."""
+    if not user_ids:
+        return
+    try:
+        with batch():
+            store = writer(get_store())
+            for user_id in user_ids:
+                store.add(_key(user_id), _seed(), ttl=_ttl())
+                store.incr(_key(user_id))
+    except Exception as e:
+        logger.error(f"Failed to bump version of users {user_ids}: {e}")
+
+
+def forget(*user_ids):
+    """Drop the counters of deleted users (their ETags can never match again)."""
+    if not user_ids:
+        return
+    try:
+        writer(get_store()).delete(*(_key(user_id) for user_id in user_ids))
+    except Exception as e:
+        logger.error(f"Failed to drop version of users {user_ids}: {e}")
+
+
+def etag(user_id, version: int, fields: tuple[str, ...] | None = None) -> str:
+    """Strong ETag for one user's representation at ``version``."""
+    selection = ".".join(fields) if fields else "all"
+    return f'"{REPRESENTATION}-{user_id}-{version}-{selection}"'
@@ -1,25 +1,19 @@
-import os
-import secrets
 import logging
+from contextlib import contextmanager
+
 import redis
-from django.core.cache import cache
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
 
 logger = logging.getLogger(__name__)
 
-# ----------------------
-# Password reset tokens
-# ----------------------
-RESET_PREFIX = "pwdreset:"
-RESET_TTL = int(os.getenv("RESET_TOKEN_TTL_SECONDS", 600))  # 10 minutes
-
 # Redis connection (if available)
 _redis_client = None
+_redis_url_missing_logged = False
 
 def get_redis_client():
     """Get Redis client with connection pooling and error handling"""
-    global _redis_client
+    global _redis_client, _redis_url_missing_logged
     if _redis_client is None:
         try:
             redis_url = getattr(settings, 'REDIS_URL', None)
@@ -28,80 +22,80 @@ def get_redis_client():
                 # Test connection
                 _redis_client.ping()
                 logger.info("Redis connection established successfully")
-            else:
+            elif not _redis_url_missing_logged:
                 logger.info("Redis URL not configured, using Django cache")
+                _redis_url_missing_logged = True
         except (redis.ConnectionError, ImproperlyConfigured) as e:
             logger.warning(f"Redis connection failed: {e}. Falling back to Django cache")
             _redis_client = None
     return _redis_client
 
-def generate_reset_token(email: str) -> str:
-    """Create a password reset token and store in cache/redis; failsafe."""
-    token = secrets.token_urlsafe(32)
-    key = f"{RESET_PREFIX}{token}"
-    
-    try:
-        redis_client = get_redis_client()
-        if redis_client:
-            # Use Redis if available
-            redis_client.setex(key, RESET_TTL, email)
-        else:
-            # Fallback to Django cache
-            cache.set(key, email, timeout=RESET_TTL)
-            
-        logger.info(f"Reset token generated for: {email}")
-        return token
-        
-    except Exception as e:
-        logger.error(f"Failed to store reset token for {email}: {e}")
-        # Still return token even if storage fails (for graceful degradation)
-        return token
+# ----------------------
+# Batching
+# ----------------------
+@contextmanager
+def batch(transaction: bool = False):
+    """Send the store writes of the helpers called inside in one round trip.
+
+    Token writes, revocations and counter updates made by these helpers (and
+    by one_time_tokens, token_families, sessions and lockout) are queued and
+    pipelined when the block exits, in MULTI/EXEC if ``transaction``. Helpers
+    that return data return a ``kvstore.Deferred`` inside the block; read its
+    ``.value`` afterwards. Store errors are raised on exit.
+    """
+    from .kvstore import batch as kv_batch
+    with kv_batch(transaction) as current:
+        yield current
+
+# ----------------------
+# Password reset tokens
+# ----------------------
+# RESET_TOKEN_MODE=stored keeps random tokens in one_time_tokens.py;
+# RESET_TOKEN_MODE=signed issues self-contained tokens (reset_tokens.py)
+def _signed_reset_tokens() -> bool:
+    mode = getattr(settings, "RESET_TOKEN_MODE", "stored")
+    if mode not in ("stored", "signed"):
+        raise ImproperlyConfigured(f"RESET_TOKEN_MODE must be 'stored' or 'signed', not {mode!r}")
+    return mode == "signed"
+
+def generate_reset_token(email: str, user=None) -> str:
+    """Create a password reset token for ``email``; failsafe.
+
+    Signed tokens are built from the user row, passed as ``user`` or looked up.
+    Stored tokens are None if they could not be stored.
+    """
+    if _signed_reset_tokens():
+        from django.contrib.auth import get_user_model
+        from . import reset_tokens
+        if user is None:
+            user = get_user_model().objects.for_email(email).get()
+        return reset_tokens.issue(user)
+    from . import one_time_tokens
+    return one_time_tokens.issue(one_time_tokens.RESET, email)
 
 def consume_reset_token(token: str) -> str | None:
-    """Retrieve and delete a password reset token; safe fallback."""
-    key = f"{RESET_PREFIX}{token}"
-    
-    try:
-        redis_client = get_redis_client()
-        if redis_client:
-            # Use Redis if available
-            email = redis_client.get(key)
-            if email:
-                redis_client.delete(key)
-                return email.decode('utf-8') if isinstance(email, bytes) else email
-        else:
-            # Fallback to Django cache
-            email = cache.get(key)
-            if email:
-                cache.delete(key)
-                return email
-                
-        return None
-        
-    except Exception as e:
-        logger.error(f"Failed to consume reset token: {e}")
-        return None
+    """Validate and use up a password reset token; returns its email or None."""
+    if _signed_reset_tokens():
+        from . import reset_tokens
+        user = reset_tokens.consume(token)
+        return user.email if user else None
+    from . import one_time_tokens
+    return one_time_tokens.consume(one_time_tokens.RESET, token)
 
 def validate_reset_token(token: str) -> bool:
-    """Check if a reset token exists without consuming it."""
-    key = f"{RESET_PREFIX}{token}"
-    
-    try:
-        redis_client = get_redis_client()
-        if redis_client:
-            return redis_client.exists(key) == 1
-        else:
-            return cache.get(key) is not None
-            
-    except Exception as e:
-        logger.error(f"Failed to validate reset token: {e}")
-        return False
+    """Check if a reset token is usable without consuming it."""
+    if _signed_reset_tokens():
+        from . import reset_tokens
+        return reset_tokens.exists(token)
+    from . import one_time_tokens
+    return one_time_tokens.exists(one_time_tokens.RESET, token)
 
 # ----------------------
 # JWT Token Utilities
 # ----------------------
 def add_token_to_blacklist(token):
     """Add JWT token to blacklist (for logout functionality)"""
+    from .kvstore import get_layered_store, writer
     try:
         from rest_framework_simplejwt.tokens import RefreshToken
         
@@ -110,26 +104,20 @@ def add_token_to_blacklist(token):
         expiry = refresh.access_token.payload['exp'] - refresh.current_time
         
         key = f"token_blacklist:{token}"
-        
-        redis_client = get_redis_client()
-        if redis_client:
-            redis_client.setex(key, int(expiry), "blacklisted")
-        else:
-            cache.set(key, "blacklisted", timeout=int(expiry))
+        # Blacklisting is permanent, so a per-process copy is never stale
+        writer(get_layered_store()).set(key, "blacklisted", ttl=int(expiry))
             
     except Exception as e:
         logger.error(f"Failed to blacklist token: {e}")
 
 def is_token_blacklisted(token):
     """Check if a JWT token is blacklisted"""
+    from .kvstore import get_layered_store
     key = f"token_blacklist:{token}"
     
     try:
-        redis_client = get_redis_client()
-        if redis_client:
-            return redis_client.exists(key) == 1
-        else:
-            return cache.get(key) is not None
+        # A read: through writer() it would be a (truthy) Deferred in a batch()
+        return get_layered_store().exists(key)
             
     except Exception as e:
         logger.error(f"Failed to check token blacklist: {e}")
@@ -140,20 +128,11 @@ def is_token_blacklisted(token):
 # ----------------------
 def check_rate_limit(key: str, limit: int, period: int) -> bool:
     """Check if rate limit is exceeded for a given key"""
+    from .kvstore import get_store, writer, resolve
     try:
-        current_count = 0
-        
-        redis_client = get_redis_client()
-        if redis_client:
-            current_count = redis_client.incr(key)
-            if current_count == 1:  # First request, set expiry
-                redis_client.expire(key, period)
-        else:
-            current_count = cache.get(key, 0) + 1
-            cache.set(key, current_count, timeout=period)
-            
-        return current_count <= limit
+        # Fixed window: the counter expires ``period`` seconds after its first hit
+        return resolve(writer(get_store()).incr(key, ttl=period), lambda count: count <= limit)
         
     except Exception as e:
         logger.error(f"Rate limit check failed for key {key}: {e}")
-        return True  # Fail open - don't block requests if rate limiting fails
\ No newline at end of file
+        return True  # Fail open - don't block requests if rate limiting fails
@@ -0,0 +1,95 @@
+import functools
+
+from django.conf import settings
+from django.contrib.auth.password_validation import CommonPasswordValidator, get_default_password_validators
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext as _
+
+from .password_index import get_index
+
+
+class BreachedPasswordValidator:
+    """Reject passwords found in the memory-mapped breach index.
+
+    The index (see ``users/password_index.py`` and ``manage.py
+    build_password_index``) is mapped once per worker and shared through the
+    page cache. If the file is missing or corrupt it falls back to Django's
+    ``CommonPasswordValidator``, which it replaces in the settings, so common
+    passwords are never let through unchecked.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._fallback = None
+
+    def validate(self, password, user=None):
+        index = get_index(self.path or getattr(settings, "PASSWORD_INDEX_PATH", ""))
+        if index is None:
+            if self._fallback is None:
+                self._fallback = CommonPasswordValidator()
+            self._fallback.validate(password, user)
+            return
+        # The lowercased form covers Django's common list, which is stored lowercased
+        if password in index or password.lower().strip() in index:
+            raise ValidationError(
+                _("This password has appeared in a data breach and can't be used."),
+                code="password_breached",
+            )
+
+    def get_help_text(self):
+        return _("Your password can't be one that has appeared in a known data breach.")
+
+
+# ----------------------
+# Ordered validation pipeline
+# ----------------------
+# Relative cost of the validators we know; anything else runs with the
+# index/list lookups. Validators may also declare their own ``cost``.
+VALIDATOR_COSTS = {
+    # Same stage, so a too-short all-digit password reports both problems
+    "MinimumLengthValidator": 0,
+    "NumericPasswordValidator": 0,
+    "BreachedPasswordValidator": 2,
+    "CommonPasswordValidator": 2,
+    "UserAttributeSimilarityValidator": 3,  # SequenceMatcher over every attribute part
+}
+DEFAULT_COST = 2
+
+
+def _cost(validator) -> int:
+    return getattr(validator, "cost", VALIDATOR_COSTS.get(type(validator).__name__, DEFAULT_COST))
+
+
+@functools.cache
+def password_validator_stages():
+    """AUTH_PASSWORD_VALIDATORS built once and grouped by cost, cheapest first."""
+    stages = {}
+    for validator in get_default_password_validators():
+        stages.setdefault(_cost(validator), []).append(validator)
+    return [stages[cost] for cost in sorted(stages)]
+
+
+@receiver(setting_changed)
+def _reset_validator_stages(setting, **kwargs):
+    if setting == "AUTH_PASSWORD_VALIDATORS":
+        password_validator_stages.cache_clear()
+
+
+def validate_password(password, user=None):
+    """Like Django's ``validate_password`` but stops after the first failing stage.
+
+    All validators of one cost stage still run, so a too-short all-digit
+    password reports both problems; the expensive similarity check only runs
+    for passwords that passed everything cheaper.
+    """
+    for stage in password_validator_stages():
+        errors = []
+        for validator in stage:
+            try:
+                validator.validate(password, user)
+            except ValidationError as error:
+                errors.append(error)
+        if errors:
+            raise ValidationError(errors)
@@ -1,26 +1,48 @@
 import logging
 from django.conf import settings
-from django.core.mail import send_mail
+from django.utils.http import parse_etags
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth.signals import user_logged_in
 
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from django_ratelimit.decorators import ratelimit
 
 from .serializers import (
     RegisterSerializer, LoginSerializer,
     ForgotPasswordSerializer, ResetPasswordSerializer,
-    UserSerializer
+    RefreshTokenSerializer, MagicLinkRequestSerializer, MagicLinkLoginSerializer,
+    OTPRequestSerializer, OTPLoginSerializer, VerifyEmailSerializer,
+    ResendVerificationSerializer, AuditEventQuerySerializer, AuditEventSerializer, MeQuerySerializer,
+    serialize_user
 )
-from .utils import generate_reset_token, consume_reset_token
+from .utils import generate_reset_token, consume_reset_token, batch
+from .token_families import FAMILY_CLAIM
+from .authentication import LazyUserJWTAuthentication
+from .permissions import HasValidToken
+from .sessions import (
+    start_session, refresh_session, list_sessions, revoke_session, revoke_all_sessions, client_ip,
+)
+from . import lockout
+from .idempotency import idempotent
+from . import one_time_tokens
+from . import mail_queue
+from . import audit
+from . import anomaly
+from . import user_versions
 from auth_service.health import run_healthcheck
+from auth_service.db_router import use_primary, read_your_writes
 from .schemas import (  # Import the schemas
     register_schema, login_schema, forgot_password_schema,
-    reset_password_schema, me_schema
+    reset_password_schema, me_schema, refresh_token_schema,
+    sessions_schema, revoke_session_schema, revoke_all_sessions_schema, magic_link_request_schema,
+    magic_link_login_schema, otp_request_schema, otp_login_schema,
+    verify_email_schema, resend_verification_schema, audit_events_schema
 )
 
 
@@ -32,16 +54,72 @@ User = get_user_model()
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @ratelimit(key='ip', rate='10/m', block=True)
+@idempotent('register')
 def register(request):
     serializer = RegisterSerializer(data=request.data)
-    if serializer.is_valid():
+    # The email uniqueness check must not race a lagging replica
+    with use_primary():
+        valid = serializer.is_valid()
+    if valid:
         user = serializer.save()
         logger.info(f"New user registered: {user.email}")
-        return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+        audit.record(audit.REGISTERED, request, user)
+        token = _send_verification(user)
+        data = serialize_user(user)
+        if settings.DEBUG:
+            data['verification_token'] = token  # Only return token in debug mode
+        return Response(data, status=status.HTTP_201_CREATED)
     logger.warning(f"Registration failed: {serializer.errors}")
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def _login_response(user, request, method):
+    """Start a session for an authenticated user and return the token pair."""
+    refresh = start_session(user, request)
+    user_logged_in.send(sender=user.__class__, request=request, user=user)
+    audit.record(audit.LOGIN_SUCCEEDED, request, user, method=method)
+    # Evaluated off the request path; only feature extraction happens here
+    anomaly.observe(anomaly.login_from_request(user, request, method, refresh[FAMILY_CLAIM]))
+    return Response({
+        'access': str(refresh.access_token),
+        'refresh': str(refresh),
+        'user': serialize_user(user)
+    })
+
+
+def _active_user(email):
+    with read_your_writes(f"email:{email}"):
+        return User.objects.for_email(email).filter(is_active=True).first()
+
+
+def _send_email(subject, message, email):
+    """Queue a mail for batched delivery; never blocks the request on SMTP."""
+    try:
+        mail_queue.enqueue(subject, message, [email])
+        return True
+    except Exception as e:
+        logger.error(f"Failed to queue email to {email}: {e}")
+        return False
+
+
+def _send_verification(user):
+    token = one_time_tokens.issue(one_time_tokens.VERIFY_EMAIL, user.email)
+    if not token:
+        return None  # a link that can never be used is worse than no mail
+    frontend = getattr(settings, 'FRONTEND_URL', '')
+    link = f"{frontend}/verify-email?token={token}"
+    if _send_email(_('Verify your email address'), _('Use this link to verify your email address: {}').format(link), user.email):
+        logger.info(f"Verification email queued for: {user.email}")
+    return token
+
+
+def _mark_verified(user):
+    """Record that the user proved they own the mailbox (link, code or reset)."""
+    if not user.is_verified:
+        user.is_verified = True
+        user.save(update_fields=['is_verified'])
+
+
 @login_schema  # Use the schema from schemas.py
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -51,25 +129,70 @@ def login(request):
     if serializer.is_valid():
         email = serializer.validated_data['email']
         password = serializer.validated_data['password']
+        ip = client_ip(request)
+
+        # Reject locked emails/IPs before spending a password hash on them
+        retry_after = lockout.check(email, ip)
+        if retry_after:
+            logger.warning(f"Login locked out: {email} from {ip}")
+            audit.record(audit.LOGIN_LOCKED, request, email=email)
+            return Response(
+                {'detail': _('Too many failed login attempts. Try again later.')},
+                status=status.HTTP_429_TOO_MANY_REQUESTS,
+                headers={'Retry-After': str(retry_after)},
+            )
+
         user = authenticate(request, username=email, password=password)
         
         if not user:
             logger.warning(f"Failed login attempt: {email}")
+            audit.record(audit.LOGIN_FAILED, request, email=email, reason='invalid_credentials')
+            lockout.record_failure(email, ip)
             return Response({'detail': _('Invalid credentials')}, status=status.HTTP_400_BAD_REQUEST)
         
         if not user.is_active:
             logger.warning(f"Login attempt for inactive user: {email}")
+            audit.record(audit.LOGIN_FAILED, request, user, reason='inactive')
             return Response({'detail': _('User account is disabled.')}, status=status.HTTP_400_BAD_REQUEST)
         
-        refresh = RefreshToken.for_user(user)
+        lockout.record_success(email, ip)
+        if getattr(settings, 'EMAIL_VERIFICATION_REQUIRED', False) and not user.is_verified:
+            logger.warning(f"Login attempt for unverified user: {email}")
+            audit.record(audit.LOGIN_FAILED, request, user, reason='unverified')
+            return Response({'detail': _('Email address not verified')}, status=status.HTTP_403_FORBIDDEN)
+
+        if anomaly.step_up_required(user.pk):
+            logger.warning(f"Login needs step-up after an anomaly: {email}")
+            audit.record(audit.LOGIN_FAILED, request, user, reason='step_up')
+            return Response(
+                {'detail': _('Additional verification required'), 'step_up': ['otp', 'magic_link']},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
         logger.info(f"User logged in: {email}")
+        return _login_response(user, request, 'password')
+    
+    logger.warning(f"Login validation failed: {serializer.errors}")
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@refresh_token_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='30/m', block=True)
+def refresh_token(request):
+    serializer = RefreshTokenSerializer(data=request.data)
+    if serializer.is_valid():
+        try:
+            refresh = refresh_session(serializer.validated_data['refresh'], User, request)
+        except InvalidToken as e:
+            logger.warning(f"Token refresh rejected: {e.detail}")
+            return Response({'detail': e.detail}, status=status.HTTP_401_UNAUTHORIZED)
         return Response({
             'access': str(refresh.access_token),
             'refresh': str(refresh),
-            'user': UserSerializer(user).data
         })
-    
-    logger.warning(f"Login validation failed: {serializer.errors}")
+
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -77,32 +200,28 @@ def login(request):
 @api_view(["POST"])
 @permission_classes([AllowAny])
 @ratelimit(key='ip', rate='5/m', block=True)
+@idempotent('forgot_password')
 def forgot_password(request):
     serializer = ForgotPasswordSerializer(data=request.data)
     if serializer.is_valid():
         email = serializer.validated_data['email'].lower()
         
         # Check if user exists (without revealing existence)
-        if User.objects.filter(email=email).exists():
+        with read_your_writes(f"email:{email}"):
+            user = User.objects.for_email(email).first()
+        if user is not None:
             # Use the utility function to generate token
-            token = generate_reset_token(email)
+            token = generate_reset_token(email, user=user)
+            audit.record(audit.RESET_REQUESTED, request, user)
             
             # Send email with reset link
             frontend = getattr(settings, 'FRONTEND_URL', '')
             reset_link = f"{frontend}/reset?token={token}" if frontend else f"/reset?token={token}"
             
-            try:
-                send_mail(
-                    subject=_('Password reset for your account'),
-                    message=_('Use this link to reset your password: {}').format(reset_link),
-                    from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@example.com'),
-                    recipient_list=[email],
-                    fail_silently=False,
-                )
-                logger.info(f"Password reset email sent to: {email}")
-            except Exception as e:
-                logger.error(f"Failed to send password reset email to {email}: {e}")
-                # Still return success to avoid revealing email existence
+            # A failure is logged and still answered with success to avoid revealing email existence
+            if token and _send_email(_('Password reset for your account'),
+                                     _('Use this link to reset your password: {}').format(reset_link), email):
+                logger.info(f"Password reset email queued for: {email}")
             
             if settings.DEBUG:
                 return Response({
@@ -134,11 +253,27 @@ def reset_password(request):
             return Response({'detail': _('Invalid or expired token')}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            user = User.objects.get(email=email)
+            with use_primary():
+                user = User.objects.for_email(email).get()
             user.set_password(new_password)
+            # The reset link was delivered to the mailbox, so that proves ownership too
+            user.is_verified = True
             user.save()
+
+            # Whoever knew the old password is logged out everywhere; the
+            # revocations and the lockout reset go out in one round trip.
+            # The password is already changed and the token used up, so a
+            # store error must not turn the reset into a 500.
+            try:
+                with batch():
+                    revoke_all_sessions(user.pk)
+                    lockout.record_success(user.email, client_ip(request))
+                    anomaly.clear_step_up(user.pk)
+            except Exception as e:
+                logger.error(f"Failed to revoke sessions after password reset of user {user.pk}: {e}")
             
             logger.info(f"Password updated for user: {user.email}")
+            audit.record(audit.RESET_COMPLETED, request, user)
             return Response({'message': _('Password updated successfully')})
             
         except User.DoesNotExist:
@@ -148,9 +283,228 @@ def reset_password(request):
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@verify_email_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='10/m', block=True)
+def verify_email(request):
+    serializer = VerifyEmailSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = one_time_tokens.consume(one_time_tokens.VERIFY_EMAIL, serializer.validated_data['token'])
+    user = None
+    if email:
+        with use_primary():
+            user = User.objects.for_email(email).first()
+    if not user:
+        logger.warning("Invalid or expired verification token used")
+        return Response({'detail': _('Invalid or expired token')}, status=status.HTTP_400_BAD_REQUEST)
+    _mark_verified(user)
+    logger.info(f"Email verified for: {email}")
+    audit.record(audit.EMAIL_VERIFIED, request, user)
+    return Response({'message': _('Email address verified')})
+
+
+@resend_verification_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='3/m', block=True)
+def resend_verification(request):
+    serializer = ResendVerificationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = serializer.validated_data['email'].lower()
+    message = {'message': _('If the account needs verification, a link has been sent')}
+    user = _active_user(email)
+    if user and not user.is_verified:
+        token = _send_verification(user)
+        if settings.DEBUG:
+            return Response({**message, 'token': token})  # Only return token in debug mode
+    return Response(message)
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    # Weak comparison, as RFC 9110 prescribes for If-None-Match
+    candidates = {tag.removeprefix('W/') for tag in parse_etags(header)}
+    return '*' in candidates or etag in candidates
+
+
+def _cacheable(response, etag):
+    response['ETag'] = etag
+    # Revalidate on every poll; the body differs per token
+    response['Cache-Control'] = 'private, no-cache'
+    response['Vary'] = 'Authorization'
+    return response
+
+
 @me_schema  # Use the schema from schemas.py
 @api_view(["GET"])
-@permission_classes([IsAuthenticated])
+@authentication_classes([LazyUserJWTAuthentication])
+@permission_classes([HasValidToken])
 def me(request):
-    user = request.user
-    return Response(UserSerializer(user).data)
\ No newline at end of file
+    serializer = MeQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    fields = serializer.validated_data.get('fields')
+
+    # Answered from the token and the version counter while nothing changed:
+    # request.user is lazy, so the 304 path never loads the user row
+    user_id = request.auth[api_settings.USER_ID_CLAIM]
+    version = user_versions.get(user_id)
+    if version is not None:
+        etag = user_versions.etag(user_id, version, fields)
+        if _etag_matches(request, etag):
+            return _cacheable(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+    else:
+        # Seed the counter before reading the row, never after
+        version = user_versions.ensure(user_id)
+
+    response = Response(serialize_user(request.user, fields))
+    if version is None:  # store unreachable: serve uncached
+        return response
+    return _cacheable(response, user_versions.etag(user_id, version, fields))
+
+
+@sessions_schema  # Use the schema from schemas.py
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def sessions(request):
+    current = request.auth.get(FAMILY_CLAIM) if request.auth else None
+    items = list_sessions(request.user.pk)
+    for item in items:
+        item['current'] = item['id'] == current
+    return Response(items)
+
+
+@revoke_session_schema  # Use the schema from schemas.py
+@api_view(["DELETE"])
+@permission_classes([IsAuthenticated])
+def revoke_user_session(request, session_id):
+    if not revoke_session(request.user.pk, session_id):
+        return Response({'detail': _('Session not found')}, status=status.HTTP_404_NOT_FOUND)
+    return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+
+@revoke_all_sessions_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def revoke_all_user_sessions(request):
+    revoked = revoke_all_sessions(request.user.pk)
+    logger.info(f"User {request.user.pk} logged out of {revoked} sessions")
+    audit.record(audit.SESSIONS_REVOKED, request, request.user, revoked=revoked)
+    return Response({'revoked': revoked})
+
+
+@audit_events_schema  # Use the schema from schemas.py
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def audit_events(request):
+    serializer = AuditEventQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    params = serializer.validated_data
+    # Staff may look at anyone in their tenant (or everyone); users only at themselves
+    user_id = params.get('user_id') if request.user.is_staff else request.user.pk
+    try:
+        events, next_cursor = audit.query(
+            user_id=user_id, since=params.get('since'), until=params.get('until'),
+            cursor=params.get('cursor'), limit=params['limit'],
+        )
+    except ValueError as e:
+        return Response({'cursor': [str(e)]}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({
+        'events': AuditEventSerializer(events, many=True).data,
+        'next_cursor': next_cursor,
+    })
+
+
+@magic_link_request_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='5/m', block=True)
+def magic_link(request):
+    serializer = MagicLinkRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = serializer.validated_data['email'].lower()
+    message = {'message': _('If the email exists, a sign-in link has been sent')}
+    if _active_user(email):
+        token = one_time_tokens.issue(one_time_tokens.MAGIC_LINK, email)
+        frontend = getattr(settings, 'FRONTEND_URL', '')
+        link = f"{frontend}/magic?token={token}"
+        if token and _send_email(_('Your sign-in link'), _('Use this link to sign in: {}').format(link), email):
+            logger.info(f"Magic link sent to: {email}")
+        if settings.DEBUG:
+            return Response({**message, 'token': token})  # Only return token in debug mode
+    return Response(message)
+
+
+@magic_link_login_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='20/m', block=True)
+def magic_link_login(request):
+    serializer = MagicLinkLoginSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = one_time_tokens.consume(one_time_tokens.MAGIC_LINK, serializer.validated_data['token'])
+    user = _active_user(email) if email else None
+    if not user:
+        logger.warning("Invalid or expired magic link used")
+        return Response({'detail': _('Invalid or expired link')}, status=status.HTTP_400_BAD_REQUEST)
+    _mark_verified(user)
+    anomaly.clear_step_up(user.pk)
+    logger.info(f"User logged in with magic link: {email}")
+    return _login_response(user, request, 'magic_link')
+
+
+@otp_request_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='5/m', block=True)
+def otp(request):
+    serializer = OTPRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = serializer.validated_data['email'].lower()
+    message = {'message': _('If the email exists, a sign-in code has been sent')}
+    if _active_user(email):
+        code = one_time_tokens.issue(one_time_tokens.OTP, email)
+        if code:
+            if _send_email(_('Your sign-in code'), _('Your sign-in code is {}').format(code), email):
+                logger.info(f"Sign-in code sent to: {email}")
+            if settings.DEBUG:
+                return Response({**message, 'code': code})  # Only return code in debug mode
+    return Response(message)
+
+
+@otp_login_schema  # Use the schema from schemas.py
+@api_view(["POST"])
+@permission_classes([AllowAny])
+@ratelimit(key='ip', rate='20/m', block=True)
+def otp_login(request):
+    serializer = OTPLoginSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    email = serializer.validated_data['email'].lower()
+    if not one_time_tokens.verify_code(one_time_tokens.OTP, email, serializer.validated_data['code']):
+        logger.warning(f"Invalid sign-in code for: {email}")
+        return Response({'detail': _('Invalid or expired code')}, status=status.HTTP_400_BAD_REQUEST)
+    user = _active_user(email)
+    if not user:
+        return Response({'detail': _('Invalid or expired code')}, status=status.HTTP_400_BAD_REQUEST)
+    _mark_verified(user)
+    anomaly.clear_step_up(user.pk)
+    logger.info(f"User logged in with sign-in code: {email}")
+    return _login_response(user, request, 'otp')